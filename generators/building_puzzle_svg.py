@@ -8,6 +8,7 @@
   - YYYYMMDD_building_ans.svg : 解答（外周ヒント＋解答入りグリッド）
 
 必要モジュール: Python3標準ライブラリのみ（追加インストール不要）
+              ※PDF用のDrawing出力にはreportlabが必要
 """
 
 import random
@@ -15,6 +16,16 @@ import sys
 import os
 from datetime import datetime
 from copy import deepcopy
+from collections import Counter
+
+from render_backend import create_backend
+from seeding import date_seed
+
+# 乱数・カウンター・バージョンの約束は seeding.py を参照
+PUZZLE_TYPE = 'building'
+GENERATOR_VERSION = 1
+rng = random.Random()
+stats = Counter()
 
 
 # ============================================================
@@ -49,7 +60,7 @@ def get_date_prefix():
 def shuffle(arr):
     """配列をシャッフルして返す"""
     result = arr[:]
-    random.shuffle(result)
+    rng.shuffle(result)
     return result
 
 
@@ -237,6 +248,7 @@ def solve_skyscrapers_complete(n, clues, max_solutions=2):
 def generate_unique_puzzle(n, max_attempts=300):
     """一意解を保証するパズルを生成"""
     for attempt in range(max_attempts):
+        stats['attempts'] += 1
         solution = make_latin(n)
         full_clues = compute_clues(solution)
         
@@ -247,7 +259,7 @@ def generate_unique_puzzle(n, max_attempts=300):
         for i in range(n):
             positions.extend([('top', i), ('bottom', i), ('left', i), ('right', i)])
         
-        random.shuffle(positions)
+        rng.shuffle(positions)
         
         # 最小ヒント数の設定
         min_clues = max(n + 2, int(n * 1.5) + 1)
@@ -264,6 +276,7 @@ def generate_unique_puzzle(n, max_attempts=300):
             clues[side][idx] = 0
             
             # 完全探索で解の数を確認
+            stats['uniqueness_checks'] += 1
             solutions = solve_skyscrapers_complete(n, clues, 2)
             
             if len(solutions) != 1:
@@ -284,53 +297,55 @@ def generate_unique_puzzle(n, max_attempts=300):
                 return {'n': n, 'clues': clues, 'solution': final_check[0]}
     
     # フォールバック
+    stats['fallback'] += 1
     solution = make_latin(n)
     clues = compute_clues(solution)
     return {'n': n, 'clues': clues, 'solution': solution}
 
 
 # ============================================================
-# SVG生成
+# 描画
 # ============================================================
 
-def draw_arrow_down(x, y, size=10):
-    """下向き矢印のパスを生成（三角形）"""
+def draw_arrow_down(out, x, y, size=10):
+    """下向き矢印（三角形）を描画"""
     # 頂点が下、底辺が上の三角形
     half = size / 2
-    return f'<path d="M{x},{y + size} L{x - half},{y} L{x + half},{y} Z" fill="black"/>'
+    out.path(f'M{x},{y + size} L{x - half},{y} L{x + half},{y} Z')
 
 
-def draw_arrow_up(x, y, size=10):
-    """上向き矢印のパスを生成（三角形）"""
+def draw_arrow_up(out, x, y, size=10):
+    """上向き矢印（三角形）を描画"""
     # 頂点が上、底辺が下の三角形
     half = size / 2
-    return f'<path d="M{x},{y} L{x - half},{y + size} L{x + half},{y + size} Z" fill="black"/>'
+    out.path(f'M{x},{y} L{x - half},{y + size} L{x + half},{y + size} Z')
 
 
-def draw_arrow_right(x, y, size=10):
-    """右向き矢印のパスを生成（三角形）"""
+def draw_arrow_right(out, x, y, size=10):
+    """右向き矢印（三角形）を描画"""
     # 頂点が右、底辺が左の三角形
     half = size / 2
-    return f'<path d="M{x + size},{y} L{x},{y - half} L{x},{y + half} Z" fill="black"/>'
+    out.path(f'M{x + size},{y} L{x},{y - half} L{x},{y + half} Z')
 
 
-def draw_arrow_left(x, y, size=10):
-    """左向き矢印のパスを生成（三角形）"""
+def draw_arrow_left(out, x, y, size=10):
+    """左向き矢印（三角形）を描画"""
     # 頂点が左、底辺が右の三角形
     half = size / 2
-    return f'<path d="M{x},{y} L{x + size},{y - half} L{x + size},{y + half} Z" fill="black"/>'
+    out.path(f'M{x},{y} L{x + size},{y - half} L{x + size},{y + half} Z')
 
 
-def generate_svg(puzzle, show_solution=False):
+def render(puzzle, show_solution=False, backend='svg'):
     """
-    SVGを生成
+    パズルを描画
     
     Args:
         puzzle: パズルデータ {'n': int, 'clues': dict, 'solution': list}
         show_solution: True=解答表示, False=空グリッド
+        backend: 'svg'=SVG文字列, 'drawing'=ReportLabのDrawing
     
     Returns:
-        SVG文字列
+        SVG文字列 または Drawing
     """
     n = puzzle['n']
     clues = puzzle['clues']
@@ -350,30 +365,18 @@ def generate_svg(puzzle, show_solution=False):
     grid_x = padding + hint_size
     grid_y = padding + hint_size
     
-    font_family = "DejaVu Sans, Liberation Sans, Noto Sans, sans-serif"
-    
-    svg_parts = []
-    
-    # SVGヘッダー
-    svg_parts.append(f'''<?xml version="1.0" encoding="UTF-8"?>
-<svg xmlns="http://www.w3.org/2000/svg" 
-     width="{total_width}" height="{total_height}" 
-     viewBox="0 0 {total_width} {total_height}">
-''')
+    out = create_backend(backend, total_width, total_height)
     
     # グリッド線を描画
-    svg_parts.append('  <!-- グリッド線 -->\n')
     for i in range(n + 1):
         # 横線
         y = grid_y + i * cell_size
-        svg_parts.append(f'  <line x1="{grid_x}" y1="{y}" x2="{grid_x + n * cell_size}" y2="{y}" stroke="black" stroke-width="1.5"/>\n')
+        out.line(grid_x, y, grid_x + n * cell_size, y, 'black', 1.5)
         # 縦線
         x = grid_x + i * cell_size
-        svg_parts.append(f'  <line x1="{x}" y1="{grid_y}" x2="{x}" y2="{grid_y + n * cell_size}" stroke="black" stroke-width="1.5"/>\n')
+        out.line(x, grid_y, x, grid_y + n * cell_size, 'black', 1.5)
     
     # ヒントと矢印を描画
-    svg_parts.append('\n  <!-- ヒント（数字と矢印） -->\n')
-    
     for i in range(n):
         cell_center_x = grid_x + i * cell_size + cell_size / 2
         cell_center_y = grid_y + i * cell_size + cell_size / 2
@@ -383,10 +386,10 @@ def generate_svg(puzzle, show_solution=False):
             hx = cell_center_x
             # 数字（上部）
             text_y = padding + hint_size * 0.35
-            svg_parts.append(f'  <text x="{hx}" y="{text_y}" text-anchor="middle" dominant-baseline="middle" font-family="{font_family}" font-size="18" fill="black">{clues["top"][i]}</text>\n')
+            out.text(hx, text_y, clues['top'][i], 18, anchor='middle', middle_baseline=True)
             # 下向き矢印（下部）
             arrow_y = padding + hint_size * 0.55
-            svg_parts.append(f'  {draw_arrow_down(hx, arrow_y, arrow_size)}\n')
+            draw_arrow_down(out, hx, arrow_y, arrow_size)
         
         # 下側のヒント（bottom）- 上向き矢印が上、数字が下
         if clues['bottom'][i] > 0:
@@ -394,20 +397,20 @@ def generate_svg(puzzle, show_solution=False):
             base_y = grid_y + n * cell_size
             # 上向き矢印（上部）
             arrow_y = base_y + hint_size * 0.12
-            svg_parts.append(f'  {draw_arrow_up(hx, arrow_y, arrow_size)}\n')
+            draw_arrow_up(out, hx, arrow_y, arrow_size)
             # 数字（下部）- 矢印との間隔を少し広げる
             text_y = base_y + hint_size * 0.75
-            svg_parts.append(f'  <text x="{hx}" y="{text_y}" text-anchor="middle" dominant-baseline="middle" font-family="{font_family}" font-size="18" fill="black">{clues["bottom"][i]}</text>\n')
+            out.text(hx, text_y, clues['bottom'][i], 18, anchor='middle', middle_baseline=True)
         
         # 左側のヒント（left）- 数字が左、右向き矢印が右
         if clues['left'][i] > 0:
             hy = cell_center_y
             # 数字（左部）
             text_x = padding + hint_size * 0.3
-            svg_parts.append(f'  <text x="{text_x}" y="{hy}" text-anchor="middle" dominant-baseline="middle" font-family="{font_family}" font-size="18" fill="black">{clues["left"][i]}</text>\n')
+            out.text(text_x, hy, clues['left'][i], 18, anchor='middle', middle_baseline=True)
             # 右向き矢印（右部）
             arrow_x = padding + hint_size * 0.5
-            svg_parts.append(f'  {draw_arrow_right(arrow_x, hy, arrow_size)}\n')
+            draw_arrow_right(out, arrow_x, hy, arrow_size)
         
         # 右側のヒント（right）- 左向き矢印が左、数字が右
         if clues['right'][i] > 0:
@@ -415,36 +418,48 @@ def generate_svg(puzzle, show_solution=False):
             base_x = grid_x + n * cell_size
             # 左向き矢印（左部）
             arrow_x = base_x + hint_size * 0.1
-            svg_parts.append(f'  {draw_arrow_left(arrow_x, hy, arrow_size)}\n')
+            draw_arrow_left(out, arrow_x, hy, arrow_size)
             # 数字（右部）
             text_x = base_x + hint_size * 0.7
-            svg_parts.append(f'  <text x="{text_x}" y="{hy}" text-anchor="middle" dominant-baseline="middle" font-family="{font_family}" font-size="18" fill="black">{clues["right"][i]}</text>\n')
+            out.text(text_x, hy, clues['right'][i], 18, anchor='middle', middle_baseline=True)
     
     # 解答を描画（show_solution=Trueの場合）
     if show_solution:
-        svg_parts.append('\n  <!-- 解答数字 -->\n')
         for r in range(n):
             for c in range(n):
                 cx = grid_x + c * cell_size + cell_size / 2
                 cy = grid_y + r * cell_size + cell_size / 2
-                val = solution[r][c]
-                svg_parts.append(f'  <text x="{cx}" y="{cy}" text-anchor="middle" dominant-baseline="middle" font-family="{font_family}" font-size="24" fill="black">{val}</text>\n')
-    
-    svg_parts.append('</svg>\n')
+                out.text(cx, cy, solution[r][c], 24, anchor='middle', middle_baseline=True)
     
-    return ''.join(svg_parts)
+    return out.result()
 
 
-def main():
-    """メイン処理"""
+def generate_svg(puzzle, show_solution=False):
+    """SVG文字列を生成"""
+    return render(puzzle, show_solution, backend='svg')
+
+
+def generate(date_prefix, seed=None, backend='svg'):
+    """
+    パズルを生成して問題・解答を返す（puzzle_layout.pyから直接呼び出す）
+    
+    Args:
+        date_prefix: 日付（YYYYMMDD）
+        seed: 乱数シード（Noneの場合は日付・パズル種別・生成器バージョンから決める）
+        backend: 'svg'=SVG文字列, 'drawing'=ReportLabのDrawing
+    
+    Returns:
+        {'problem': 問題, 'answer': 解答, 'stats': 試行回数などのカウンター}
+    """
+    # 日付・パズル種別・生成器バージョンから乱数を初期化（同じ日付なら同じ問題になる）
+    if seed is None:
+        seed = date_seed(date_prefix, PUZZLE_TYPE, GENERATOR_VERSION)
+    rng.seed(seed)
+    stats.clear()
+    
     # パズルサイズ（4×4固定）
     n = 4
     
-    # 日付からファイル名を生成
-    today = get_date_prefix()
-    problem_filename = f'{today}_building.svg'
-    answer_filename = f'{today}_building_ans.svg'
-    
     print(f'ビルディングパズル {n}×{n} を生成中...')
     
     # パズル生成
@@ -473,16 +488,30 @@ def main():
     print(f'  Right:  {puzzle["clues"]["right"]}')
     print()
     
-    # 問題SVG生成
-    problem_svg = generate_svg(puzzle, show_solution=False)
+    return {
+        'problem': render(puzzle, show_solution=False, backend=backend),
+        'answer': render(puzzle, show_solution=True, backend=backend),
+        'stats': dict(stats),
+    }
+
+
+def main():
+    """メイン処理"""
+    # 日付からファイル名を生成
+    today = get_date_prefix()
+    problem_filename = f'{today}_building.svg'
+    answer_filename = f'{today}_building_ans.svg'
+    
+    svgs = generate(today)
+    
+    # 問題SVG保存
     with open(problem_filename, 'w', encoding='utf-8') as f:
-        f.write(problem_svg)
+        f.write(svgs['problem'])
     print(f'問題ファイル保存: {problem_filename}')
     
-    # 解答SVG生成
-    answer_svg = generate_svg(puzzle, show_solution=True)
+    # 解答SVG保存
     with open(answer_filename, 'w', encoding='utf-8') as f:
-        f.write(answer_svg)
+        f.write(svgs['answer'])
     print(f'解答ファイル保存: {answer_filename}')
     
     print()
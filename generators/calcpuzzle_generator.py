@@ -5,11 +5,34 @@ Calc Puzzle SVG Generator
 問題と解答のSVGファイルを生成するスクリプト
 
 必要なモジュール: なし（Python3標準ライブラリのみ使用）
+※PDF用のDrawing出力にはreportlabが必要
 """
 
 import random
 import os
+import sys
 from datetime import datetime
+from collections import Counter
+
+from render_backend import create_backend
+from seeding import date_seed
+
+# 乱数・カウンター・バージョンの約束は seeding.py を参照
+PUZZLE_TYPE = 'calcpuzzle'
+GENERATOR_VERSION = 1
+rng = random.Random()
+stats = Counter()
+
+
+def get_date_prefix():
+    """日付プレフィックスを取得（引数 > 環境変数 > 今日）"""
+    if len(sys.argv) > 1:
+        arg = sys.argv[1]
+        if len(arg) == 8 and arg.isdigit():
+            return arg
+    if 'PUZZLE_DATE' in os.environ:
+        return os.environ['PUZZLE_DATE']
+    return datetime.now().strftime('%Y%m%d')
 
 
 class PuzzleGenerator:
@@ -21,20 +44,20 @@ class PuzzleGenerator:
     
     def rand_int(self, min_val, max_val):
         """min_val以上max_val以下のランダムな整数を返す"""
-        return random.randint(min_val, max_val)
+        return rng.randint(min_val, max_val)
     
     def rand_op(self):
         """ランダムな演算子を返す"""
-        return random.choice(self.ops)
+        return rng.choice(self.ops)
     
     def rand_vals(self, k):
         """1〜9の中からk個の異なる値を返す"""
-        return random.sample(range(1, 10), k)
+        return rng.sample(range(1, 10), k)
     
     def shuffle(self, arr):
         """配列をシャッフルして返す"""
         result = arr.copy()
-        random.shuffle(result)
+        rng.shuffle(result)
         return result
     
     def calc_with_precedence(self, a, b, c, op1, op2):
@@ -222,11 +245,13 @@ class PuzzleGenerator:
     def generate(self):
         """パズルを生成（最大3000回試行）"""
         for _ in range(3000):
+            stats['attempts'] += 1
             puzzle = self.attempt()
             if puzzle:
                 return puzzle
         
         # フォールバック（通常は呼ばれない）
+        stats['fallback'] += 1
         return self.fallback_simple()
     
     def fallback_simple(self):
@@ -358,7 +383,7 @@ class SVGGenerator:
         
         # 使用するシンボルをランダムに選択
         all_symbol_types = list(range(6))
-        random.shuffle(all_symbol_types)
+        rng.shuffle(all_symbol_types)
         self.used_symbols = all_symbol_types[:puzzle['num_symbols']]
     
     def get_x_position(self, col_type, col_index):
@@ -405,16 +430,16 @@ class SVGGenerator:
         
         return y
     
-    def draw_symbol(self, symbol_type, cx, cy, size):
-        """シンボルをSVG要素として返す（ライトグレー線で中空描画）"""
+    def draw_symbol(self, out, symbol_type, cx, cy, size):
+        """シンボルを描画（ライトグレー線で中空描画）"""
         stroke_color = "#B0B0B0"  # ライトグレー
-        stroke_width = "2.5"
-        fill = "none"  # 中空
+        stroke_width = 2.5
+        fill = None  # 中空
         half = size // 2
         
         if symbol_type == 0:
             # 円
-            return f'<circle cx="{cx}" cy="{cy}" r="{half - 2}" fill="{fill}" stroke="{stroke_color}" stroke-width="{stroke_width}"/>'
+            out.circle(cx, cy, half - 2, fill=fill, stroke=stroke_color, stroke_width=stroke_width)
         
         elif symbol_type == 1:
             # 六角形
@@ -423,15 +448,15 @@ class SVGGenerator:
                 angle = (i * 60 - 90) * 3.14159 / 180
                 px = cx + (half - 2) * 0.95 * round(cos_approx(angle), 4)
                 py = cy + (half - 2) * 0.95 * round(sin_approx(angle), 4)
-                points.append(f"{px},{py}")
-            return f'<polygon points="{" ".join(points)}" fill="{fill}" stroke="{stroke_color}" stroke-width="{stroke_width}"/>'
+                points.append((px, py))
+            out.polygon(points, fill=fill, stroke=stroke_color, stroke_width=stroke_width)
         
         elif symbol_type == 2:
             # 三角形
-            p1 = f"{cx},{cy - half + 3}"
-            p2 = f"{cx + half - 3},{cy + half - 5}"
-            p3 = f"{cx - half + 3},{cy + half - 5}"
-            return f'<polygon points="{p1} {p2} {p3}" fill="{fill}" stroke="{stroke_color}" stroke-width="{stroke_width}"/>'
+            p1 = (cx, cy - half + 3)
+            p2 = (cx + half - 3, cy + half - 5)
+            p3 = (cx - half + 3, cy + half - 5)
+            out.polygon([p1, p2, p3], fill=fill, stroke=stroke_color, stroke_width=stroke_width)
         
         elif symbol_type == 3:
             # 星（五芒星）
@@ -443,8 +468,8 @@ class SVGGenerator:
                 r = outer_r if i % 2 == 0 else inner_r
                 px = cx + r * round(cos_approx(angle), 4)
                 py = cy + r * round(sin_approx(angle), 4)
-                points.append(f"{px},{py}")
-            return f'<polygon points="{" ".join(points)}" fill="{fill}" stroke="{stroke_color}" stroke-width="{stroke_width}"/>'
+                points.append((px, py))
+            out.polygon(points, fill=fill, stroke=stroke_color, stroke_width=stroke_width)
         
         elif symbol_type == 4:
             # 五角形
@@ -453,17 +478,15 @@ class SVGGenerator:
                 angle = (i * 72 - 90) * 3.14159 / 180
                 px = cx + (half - 3) * round(cos_approx(angle), 4)
                 py = cy + (half - 3) * round(sin_approx(angle), 4)
-                points.append(f"{px},{py}")
-            return f'<polygon points="{" ".join(points)}" fill="{fill}" stroke="{stroke_color}" stroke-width="{stroke_width}"/>'
+                points.append((px, py))
+            out.polygon(points, fill=fill, stroke=stroke_color, stroke_width=stroke_width)
         
         elif symbol_type == 5:
             # カプセル形（横長の角丸長方形）
             w = size - 6
             h = size * 0.55
             rx = h / 2
-            return f'<rect x="{cx - w//2}" y="{cy - h//2}" width="{w}" height="{h}" rx="{rx}" fill="{fill}" stroke="{stroke_color}" stroke-width="{stroke_width}"/>'
-        
-        return ""
+            out.rect(cx - w//2, cy - h//2, w, h, fill=fill, stroke=stroke_color, stroke_width=stroke_width, rx=rx)
     
     def disp_op(self, op):
         """演算子を表示用に変換"""
@@ -473,10 +496,10 @@ class SVGGenerator:
             return '÷'
         return op
     
-    def draw_glyph(self, char, cx, cy, font_size):
+    def draw_glyph(self, out, char, cx, cy, font_size):
         """DejaVu Sansのグリフをパスとして描画（フォントサイズベース）"""
         if char not in self.GLYPH_DATA:
-            return ''
+            return
         
         data = self.GLYPH_DATA[char]
         bounds = data['bounds']
@@ -494,14 +517,14 @@ class SVGGenerator:
         glyph_cy = 746  # 数字の視覚的中央
         
         # 変換：TTF座標系からSVG座標系へ
-        transform = f"translate({cx},{cy}) scale({scale},-{scale}) translate({-glyph_cx},{-glyph_cy})"
+        # translate(cx,cy) scale(s,-s) translate(-gcx,-gcy) を1つの行列にまとめたもの
+        transform = (scale, 0, 0, -scale, cx - scale * glyph_cx, cy + scale * glyph_cy)
         
-        return f'<path d="{data["path"]}" transform="{transform}" fill="black"/>'
+        out.path(data['path'], fill='black', transform=transform)
     
-    def draw_number(self, number, cx, cy, font_size=18):
+    def draw_number(self, out, number, cx, cy, font_size=18):
         """数字をパスとして描画（複数桁対応）"""
         num_str = str(number)
-        elements = []
         
         # フォントサイズベースのスケール
         scale = font_size / self.UNITS_PER_EM
@@ -519,26 +542,21 @@ class SVGGenerator:
         
         for i, char in enumerate(num_str):
             char_cx = current_x + char_widths[i] / 2
-            elements.append(self.draw_glyph(char, char_cx, cy, font_size))
+            self.draw_glyph(out, char, char_cx, cy, font_size)
             current_x += char_widths[i]
-        
-        return '\n'.join(elements)
     
-    def draw_operator(self, op, cx, cy, font_size=20):
+    def draw_operator(self, out, op, cx, cy, font_size=20):
         """演算子をパスとして描画"""
         op_char = self.disp_op(op)
-        return self.draw_glyph(op_char, cx, cy, font_size)
+        self.draw_glyph(out, op_char, cx, cy, font_size)
     
-    def draw_equals(self, cx, cy, font_size=20):
+    def draw_equals(self, out, cx, cy, font_size=20):
         """イコールをパスとして描画"""
-        return self.draw_glyph('=', cx, cy, font_size)
+        self.draw_glyph(out, '=', cx, cy, font_size)
     
-    def generate_svg(self, show_answer=False):
-        """SVGを生成"""
-        elements = []
-        
-        # SVGヘッダー
-        elements.append(f'<svg xmlns="http://www.w3.org/2000/svg" width="{self.width}" height="{self.height}" viewBox="0 0 {self.width} {self.height}">')
+    def render(self, show_answer=False, backend='svg'):
+        """描画（backend: 'svg'=SVG文字列, 'drawing'=ReportLabのDrawing）"""
+        out = create_backend(backend, self.width, self.height)
         
         # シンボル描画（3x3グリッド）
         symbol_y_offset = -3  # シンボルを少し上げる調整値
@@ -552,12 +570,12 @@ class SVGGenerator:
                 cy = self.get_y_position('symbol', row) + symbol_y_offset
                 
                 # シンボル描画
-                elements.append(self.draw_symbol(actual_symbol, cx, cy, self.symbol_size))
+                self.draw_symbol(out, actual_symbol, cx, cy, self.symbol_size)
                 
                 if show_answer:
                     # 解答：数字を表示（パスで描画）
                     value = self.puzzle['values'][sym_type]
-                    elements.append(self.draw_number(value, cx, cy, font_size=28))
+                    self.draw_number(out, value, cx, cy, font_size=28)
         
         # 行の演算子（シンボル間）
         for row in range(3):
@@ -565,7 +583,7 @@ class SVGGenerator:
                 op = self.puzzle['row_ops'][row][op_idx]
                 cx = self.get_x_position('op', op_idx)
                 cy = self.get_y_position('symbol', row) + symbol_y_offset
-                elements.append(self.draw_operator(op, cx, cy, font_size=20))
+                self.draw_operator(out, op, cx, cy, font_size=20)
         
         # 列の演算子（シンボル行の間）
         for op_row in range(2):
@@ -573,34 +591,37 @@ class SVGGenerator:
                 op = self.puzzle['col_ops'][col][op_row]
                 cx = self.get_x_position('symbol', col)
                 cy = self.get_y_position('op', op_row)
-                elements.append(self.draw_operator(op, cx, cy, font_size=20))
+                self.draw_operator(out, op, cx, cy, font_size=20)
         
         # 行のイコールと結果
         for row in range(3):
             # イコール
             cx = self.get_x_position('eq', 0)
             cy = self.get_y_position('symbol', row) + symbol_y_offset
-            elements.append(self.draw_equals(cx, cy, font_size=18))
+            self.draw_equals(out, cx, cy, font_size=18)
             
             # 結果
             cx = self.get_x_position('result', 0)
             result = self.puzzle['row_results'][row]
-            elements.append(self.draw_number(result, cx, cy, font_size=20))
+            self.draw_number(out, result, cx, cy, font_size=20)
         
         # 列のイコールと結果
         for col in range(3):
             # イコール
             cx = self.get_x_position('symbol', col)
             cy = self.get_y_position('eq', 0)
-            elements.append(self.draw_equals(cx, cy, font_size=18))
+            self.draw_equals(out, cx, cy, font_size=18)
             
             # 結果
             cy = self.get_y_position('result', 0)
             result = self.puzzle['col_results'][col]
-            elements.append(self.draw_number(result, cx, cy, font_size=20))
+            self.draw_number(out, result, cx, cy, font_size=20)
         
-        elements.append('</svg>')
-        return '\n'.join(elements)
+        return out.result()
+    
+    def generate_svg(self, show_answer=False):
+        """SVGを生成"""
+        return self.render(show_answer, backend='svg')
 
 
 def cos_approx(angle):
@@ -615,18 +636,18 @@ def sin_approx(angle):
     return math.sin(angle)
 
 
-def main():
-    """メイン処理"""
-    # 日付取得
-    today = datetime.now().strftime('%Y%m%d')
-    
-    # 出力ファイル名
-    puzzle_filename = f"{today}_calcpuzzle.svg"
-    answer_filename = f"{today}_calcpuzzle_ans.svg"
-    
-    print("=" * 50)
-    print("Calc Puzzle SVG Generator")
-    print("=" * 50)
+def generate(date_prefix, seed=None, backend='svg'):
+    """
+    パズルを生成して問題・解答を返す（puzzle_layout.pyから直接呼び出す）
+    
+    Returns:
+        {'problem': 問題, 'answer': 解答, 'stats': 試行回数などのカウンター}（backend='svg'ならSVG文字列、'drawing'ならDrawing）
+    """
+    # 日付・パズル種別・生成器バージョンから乱数を初期化（同じ日付なら同じ問題になる）
+    if seed is None:
+        seed = date_seed(date_prefix, PUZZLE_TYPE, GENERATOR_VERSION)
+    rng.seed(seed)
+    stats.clear()
     
     # パズル生成
     print("\nパズルを生成中...")
@@ -636,25 +657,6 @@ def main():
     print(f"  シンボル数: {puzzle['num_symbols']}")
     print(f"  値: {puzzle['values']}")
     
-    # SVG生成
-    print("\nSVGを生成中...")
-    svg_gen = SVGGenerator(puzzle)
-    
-    # 問題SVG
-    puzzle_svg = svg_gen.generate_svg(show_answer=False)
-    with open(puzzle_filename, 'w', encoding='utf-8') as f:
-        f.write(puzzle_svg)
-    print(f"  問題ファイル: {puzzle_filename}")
-    
-    # 解答SVG
-    answer_svg = svg_gen.generate_svg(show_answer=True)
-    with open(answer_filename, 'w', encoding='utf-8') as f:
-        f.write(answer_svg)
-    print(f"  解答ファイル: {answer_filename}")
-    
-    print("\n生成完了!")
-    print("=" * 50)
-    
     # パズル情報表示
     print("\n【パズル情報】")
     print(f"シンボルと値の対応:")
@@ -676,6 +678,44 @@ def main():
         indices = [puzzle['symbol_indices'][c+r*3] for r in range(3)]
         vals = [puzzle['values'][idx] for idx in indices]
         print(f"  {vals[0]} {ops[0]} {vals[1]} {ops[1]} {vals[2]} = {res}")
+    
+    # SVG生成
+    svg_gen = SVGGenerator(puzzle)
+    return {
+        'problem': svg_gen.render(show_answer=False, backend=backend),
+        'answer': svg_gen.render(show_answer=True, backend=backend),
+        'stats': dict(stats),
+    }
+
+
+def main():
+    """メイン処理"""
+    # 日付取得
+    today = get_date_prefix()
+    
+    # 出力ファイル名
+    puzzle_filename = f"{today}_calcpuzzle.svg"
+    answer_filename = f"{today}_calcpuzzle_ans.svg"
+    
+    print("=" * 50)
+    print("Calc Puzzle SVG Generator")
+    print("=" * 50)
+    
+    svgs = generate(today)
+    
+    # 問題SVG
+    print("\nSVGを保存中...")
+    with open(puzzle_filename, 'w', encoding='utf-8') as f:
+        f.write(svgs['problem'])
+    print(f"  問題ファイル: {puzzle_filename}")
+    
+    # 解答SVG
+    with open(answer_filename, 'w', encoding='utf-8') as f:
+        f.write(svgs['answer'])
+    print(f"  解答ファイル: {answer_filename}")
+    
+    print("\n生成完了!")
+    print("=" * 50)
 
 
 if __name__ == "__main__":
@@ -7,6 +7,16 @@ import random
 import sys
 import os
 from datetime import date
+from collections import Counter
+
+from render_backend import create_backend
+from seeding import date_seed
+
+# 乱数・カウンター・バージョンの約束は seeding.py を参照
+PUZZLE_TYPE = 'countdown'
+GENERATOR_VERSION = 1
+rng = random.Random()
+stats = Counter()
 
 def get_date_prefix():
     """日付プレフィックスを取得（引数 > 環境変数 > 今日）"""
@@ -61,7 +71,8 @@ def find_all_solutions(numbers):
         solutions[target] = find_solution(numbers, target)
     return solutions
 
-def generate_svg(numbers, solutions, show_answers=False):
+def render(numbers, solutions, show_answers=False, backend='svg'):
+    """問題・解答を描画（backend: 'svg'=SVG文字列, 'drawing'=ReportLabのDrawing）"""
     row_height = 28
     padding_top = 8
     padding_bottom = 8
@@ -75,48 +86,51 @@ def generate_svg(numbers, solutions, show_answers=False):
     content_width = num_width * 4 + (box_size + gap * 2) * 3 + 20 + 18
     width = start_x * 2 + content_width
     
-    font_family = "DejaVu Sans, Liberation Sans, Noto Sans, sans-serif"
-    
-    svg_parts = []
-    svg_parts.append(f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}">')
-    svg_parts.append(f'''  <style>
-    .number {{ font-family: {font_family}; font-size: 18px; fill: black; }}
-    .operator {{ font-family: {font_family}; font-size: 16px; fill: black; }}
-    .equal {{ font-family: {font_family}; font-size: 18px; fill: black; }}
-    .target {{ font-family: {font_family}; font-size: 18px; fill: black; }}
-    .box {{ fill: none; stroke: lightgray; stroke-width: 1; }}
-  </style>''')
+    out = create_backend(backend, width, height)
     
     for row_idx, target in enumerate(TARGETS):
         y = padding_top + row_idx * row_height + row_height / 2
         x = start_x
         
         for i in range(4):
-            svg_parts.append(f'  <text x="{x + num_width/2}" y="{y + 6}" class="number" text-anchor="middle">{numbers[i]}</text>')
+            out.text(x + num_width/2, y + 6, numbers[i], 18, anchor='middle')
             x += num_width
             
             if i < 3:
                 box_x = x + gap/2
                 box_y = y - box_size/2
-                svg_parts.append(f'  <rect x="{box_x}" y="{box_y}" width="{box_size}" height="{box_size}" class="box" rx="2" ry="2"/>')
+                out.rect(box_x, box_y, box_size, box_size, fill=None, stroke='lightgray', rx=2)
                 
                 if show_answers and solutions[target]:
                     op = solutions[target][i]
-                    svg_parts.append(f'  <text x="{box_x + box_size/2}" y="{y + 5}" class="operator" text-anchor="middle">{op}</text>')
+                    out.text(box_x + box_size/2, y + 5, op, 16, anchor='middle')
                 
                 x += gap + box_size + gap
         
         x += gap
-        svg_parts.append(f'  <text x="{x}" y="{y + 6}" class="equal">=</text>')
+        out.text(x, y + 6, '=', 18)
         x += 15
-        svg_parts.append(f'  <text x="{x}" y="{y + 6}" class="target">{target}</text>')
+        out.text(x, y + 6, target, 18)
     
-    svg_parts.append('</svg>')
-    return '\n'.join(svg_parts)
+    return out.result()
 
-def main():
-    today = get_date_prefix()
-    numbers = random.choice(PROBLEMS)
+def generate_svg(numbers, solutions, show_answers=False):
+    return render(numbers, solutions, show_answers, backend='svg')
+
+def generate(date_prefix, seed=None, backend='svg'):
+    """
+    パズルを生成して問題・解答を返す（puzzle_layout.pyから直接呼び出す）
+
+    Returns:
+        {'problem': 問題, 'answer': 解答, 'stats': 試行回数などのカウンター}（backend='svg'ならSVG文字列、'drawing'ならDrawing）
+    """
+    # 日付・パズル種別・生成器バージョンから乱数を初期化（同じ日付なら同じ問題になる）
+    if seed is None:
+        seed = date_seed(date_prefix, PUZZLE_TYPE, GENERATOR_VERSION)
+    rng.seed(seed)
+    stats.clear()
+    
+    numbers = rng.choice(PROBLEMS)
     
     print(f"選択された数字: {numbers}")
     
@@ -130,16 +144,24 @@ def main():
         else:
             print(f"  目標値 {target}: 解なし")
     
-    problem_svg = generate_svg(numbers, solutions, show_answers=False)
+    return {
+        'problem': render(numbers, solutions, show_answers=False, backend=backend),
+        'answer': render(numbers, solutions, show_answers=True, backend=backend),
+        'stats': dict(stats),
+    }
+
+def main():
+    today = get_date_prefix()
+    svgs = generate(today)
+    
     problem_filename = f"{today}_countdown.svg"
     with open(problem_filename, 'w', encoding='utf-8') as f:
-        f.write(problem_svg)
+        f.write(svgs['problem'])
     print(f"\n問題用紙を生成しました: {problem_filename}")
     
-    answer_svg = generate_svg(numbers, solutions, show_answers=True)
     answer_filename = f"{today}_countdown_ans.svg"
     with open(answer_filename, 'w', encoding='utf-8') as f:
-        f.write(answer_svg)
+        f.write(svgs['answer'])
     print(f"解答用紙を生成しました: {answer_filename}")
 
 if __name__ == '__main__':
@@ -13,6 +13,16 @@ import os
 import sys
 from datetime import datetime
 from itertools import permutations
+from collections import Counter
+
+from render_backend import create_backend
+from seeding import date_seed
+
+# 乱数・カウンター・バージョンの約束は seeding.py を参照
+PUZZLE_TYPE = 'cryptarithm'
+GENERATOR_VERSION = 1
+rng = random.Random()
+stats = Counter()
 
 
 def get_date_prefix():
@@ -41,7 +51,7 @@ def generate_multiplier_without_zero(digits):
     """0を含まない乗数を生成"""
     result = ''
     for _ in range(digits):
-        digit = random.randint(1, 9)
+        digit = rng.randint(1, 9)
         result += str(digit)
     return int(result)
 
@@ -50,7 +60,7 @@ def generate_multiplicand(digits):
     """被乗数を生成（0を含んでよい）"""
     min_val = 10 ** (digits - 1)
     max_val = 10 ** digits - 1
-    return random.randint(min_val, max_val)
+    return rng.randint(min_val, max_val)
 
 
 def calculate_multiplication(a, b):
@@ -260,10 +270,12 @@ def generate_problem():
     max_attempts = 1000
     
     for attempt in range(max_attempts):
+        stats['attempts'] += 1
         candidates = []
         
         # 50題生成（条件が厳しいため多めに生成）
         for _ in range(50):
+            stats['candidates'] += 1
             a = generate_multiplicand(SETTINGS['a_digits'])
             b = generate_multiplier_without_zero(SETTINGS['b_digits'])
             
@@ -292,6 +304,7 @@ def generate_problem():
         
         # 一意解を探す
         for candidate in candidates:
+            stats['uniqueness_checks'] += 1
             check = has_unique_solution(candidate['problem'])
             if check['is_unique']:
                 return {
@@ -304,8 +317,8 @@ def generate_problem():
     raise Exception("条件を満たす問題を生成できませんでした")
 
 
-def draw_symbol_shape(symbol, cx, cy, size, stroke_color="lightgray"):
-    """記号をSVG図形として描画"""
+def draw_symbol_shape(out, symbol, cx, cy, size, stroke_color="lightgray"):
+    """記号を図形として描画"""
     half = size / 2
     stroke_w = 2.5  # 記号の線の太さ
     
@@ -315,17 +328,17 @@ def draw_symbol_shape(symbol, cx, cy, size, stroke_color="lightgray"):
         bottom_y = cy + half * 0.7
         left_x = cx - half * 0.8
         right_x = cx + half * 0.8
-        return f'<polygon points="{cx},{top_y} {left_x},{bottom_y} {right_x},{bottom_y}" fill="none" stroke="{stroke_color}" stroke-width="{stroke_w}"/>'
+        out.polygon([(cx, top_y), (left_x, bottom_y), (right_x, bottom_y)], fill=None, stroke=stroke_color, stroke_width=stroke_w)
     
     elif symbol == '□':
         # 正方形
         s = size * 0.7
-        return f'<rect x="{cx - s/2}" y="{cy - s/2}" width="{s}" height="{s}" fill="none" stroke="{stroke_color}" stroke-width="{stroke_w}"/>'
+        out.rect(cx - s/2, cy - s/2, s, s, fill=None, stroke=stroke_color, stroke_width=stroke_w)
     
     elif symbol == '○':
         # 円
         r = size * 0.35
-        return f'<circle cx="{cx}" cy="{cy}" r="{r}" fill="none" stroke="{stroke_color}" stroke-width="{stroke_w}"/>'
+        out.circle(cx, cy, r, fill=None, stroke=stroke_color, stroke_width=stroke_w)
     
     elif symbol == '☆':
         # 星（5点）
@@ -338,25 +351,24 @@ def draw_symbol_shape(symbol, cx, cy, size, stroke_color="lightgray"):
             r = outer_r if i % 2 == 0 else inner_r
             px = cx + r * math.cos(angle)
             py = cy - r * math.sin(angle)
-            points.append(f"{px},{py}")
-        return f'<polygon points="{" ".join(points)}" fill="none" stroke="{stroke_color}" stroke-width="{stroke_w}"/>'
+            points.append((px, py))
+        out.polygon(points, fill=None, stroke=stroke_color, stroke_width=stroke_w)
     
     elif symbol == '◇':
         # ひし形
         s = size * 0.4
-        return f'<polygon points="{cx},{cy-s} {cx+s},{cy} {cx},{cy+s} {cx-s},{cy}" fill="none" stroke="{stroke_color}" stroke-width="{stroke_w}"/>'
+        out.polygon([(cx, cy-s), (cx+s, cy), (cx, cy+s), (cx-s, cy)], fill=None, stroke=stroke_color, stroke_width=stroke_w)
     
     elif symbol == '◎':
         # 二重丸
         r1 = size * 0.35
         r2 = size * 0.2
-        return f'<circle cx="{cx}" cy="{cy}" r="{r1}" fill="none" stroke="{stroke_color}" stroke-width="{stroke_w}"/><circle cx="{cx}" cy="{cy}" r="{r2}" fill="none" stroke="{stroke_color}" stroke-width="{stroke_w}"/>'
-    
-    return ''
+        out.circle(cx, cy, r1, fill=None, stroke=stroke_color, stroke_width=stroke_w)
+        out.circle(cx, cy, r2, fill=None, stroke=stroke_color, stroke_width=stroke_w)
 
 
-def generate_svg(problem, show_answer=False):
-    """SVG生成"""
+def render(problem, show_answer=False, backend='svg'):
+    """描画（backend: 'svg'=SVG文字列, 'drawing'=ReportLabのDrawing）"""
     masked = problem['masked']
     solution = problem['solution']
     
@@ -380,7 +392,6 @@ def generate_svg(problem, show_answer=False):
     
     # フォント
     font_size = 36           # 数字のフォントサイズ
-    font_family = "DejaVu Sans, Liberation Sans, Noto Sans, sans-serif"  # Linux/Render対応フォント
     
     # 記号
     symbol_size = 44         # 記号図形のサイズ（大きくすると記号が大きくなる）
@@ -405,26 +416,20 @@ def generate_svg(problem, show_answer=False):
     svg_width = padding_left + (max_width + 2) * cell_width + padding_right
     svg_height = padding_top + num_lines * line_height + padding_bottom
     
-    # SVG開始
-    svg_parts = []
-    svg_parts.append(f'<svg xmlns="http://www.w3.org/2000/svg" width="{svg_width}" height="{svg_height}">')
-    svg_parts.append('<style>')
-    svg_parts.append(f'  .digit {{ font-family: {font_family}; font-size: {font_size}px; fill: {digit_color}; }}')
-    svg_parts.append(f'  .operator {{ font-family: {font_family}; font-size: {font_size}px; fill: {digit_color}; font-weight: bold; }}')
-    svg_parts.append('</style>')
+    # 描画開始
+    out = create_backend(backend, svg_width, svg_height)
     
     current_y = padding_top
     
     def draw_row(text, operator='', shift=0):
         """1行を描画"""
         nonlocal current_y
-        row_parts = []
         
         # 演算子（2列目 = 結果の最上位桁と同じ列に配置）
         if operator:
             x = padding_left + cell_width + cell_width / 2  # 2列目の中央
             y = current_y + cell_height * 0.65
-            row_parts.append(f'<text x="{x}" y="{y}" class="operator" text-anchor="middle">{operator}</text>')
+            out.text(x, y, operator, font_size, fill=digit_color, anchor='middle', bold=True)
         
         # 文字列を右寄せで配置（1列目は演算子用なので+1）
         text_len = len(text)
@@ -440,17 +445,16 @@ def generate_svg(problem, show_answer=False):
                 # 正解表示: 記号を数字に置き換え
                 display_char = solution.get(char, char)
                 y = current_y + cell_height * 0.65
-                row_parts.append(f'<text x="{cx}" y="{y}" class="digit" text-anchor="middle">{display_char}</text>')
+                out.text(cx, y, display_char, font_size, fill=digit_color, anchor='middle')
             elif is_symbol:
                 # 記号を図形として描画
-                row_parts.append(draw_symbol_shape(char, cx, cy, symbol_size, symbol_stroke_color))
+                draw_symbol_shape(out, char, cx, cy, symbol_size, symbol_stroke_color)
             else:
                 # 数字
                 y = current_y + cell_height * 0.65
-                row_parts.append(f'<text x="{cx}" y="{y}" class="digit" text-anchor="middle">{char}</text>')
+                out.text(cx, y, char, font_size, fill=digit_color, anchor='middle')
         
         current_y += line_height
-        return '\n'.join(row_parts)
     
     def draw_line():
         """横線を描画"""
@@ -458,42 +462,48 @@ def generate_svg(problem, show_answer=False):
         x1 = padding_left + cell_width  # 2列目から開始
         x2 = padding_left + (max_width + 1) * cell_width
         y = current_y + 5
-        line = f'<line x1="{x1}" y1="{y}" x2="{x2}" y2="{y}" stroke="{separator_color}" stroke-width="{separator_stroke_width}"/>'
+        out.line(x1, y, x2, y, separator_color, separator_stroke_width)
         current_y += line_separator_height
-        return line
     
     # 被乗数
-    svg_parts.append(draw_row(masked['multiplicand']))
+    draw_row(masked['multiplicand'])
     
     # 乗数
-    svg_parts.append(draw_row(masked['multiplier'], operator='×'))
+    draw_row(masked['multiplier'], operator='×')
     
     # 横線
-    svg_parts.append(draw_line())
+    draw_line()
     
     # 部分積
     for idx, partial in enumerate(masked['partials']):
-        svg_parts.append(draw_row(partial, shift=idx))
+        draw_row(partial, shift=idx)
     
     # 横線
-    svg_parts.append(draw_line())
+    draw_line()
     
     # 結果
-    svg_parts.append(draw_row(masked['result']))
-    
-    svg_parts.append('</svg>')
+    draw_row(masked['result'])
     
-    return '\n'.join(svg_parts)
+    return out.result()
 
 
-def main():
-    """メイン処理"""
-    # 日付を取得
-    today = get_date_prefix()
+def generate_svg(problem, show_answer=False):
+    """SVG生成"""
+    return render(problem, show_answer, backend='svg')
+
+
+def generate(date_prefix, seed=None, backend='svg'):
+    """
+    問題を生成して問題・正解を返す（puzzle_layout.pyから直接呼び出す）
     
-    # ファイル名
-    problem_filename = f'{today}_cryptarithm.svg'
-    answer_filename = f'{today}_cryptarithm_ans.svg'
+    Returns:
+        {'problem': 問題, 'answer': 正解, 'stats': 試行回数などのカウンター}（backend='svg'ならSVG文字列、'drawing'ならDrawing）
+    """
+    # 日付・パズル種別・生成器バージョンから乱数を初期化（同じ日付なら同じ問題になる）
+    if seed is None:
+        seed = date_seed(date_prefix, PUZZLE_TYPE, GENERATOR_VERSION)
+    rng.seed(seed)
+    stats.clear()
     
     print("覆面算（ミニモード）を生成中...")
     print(f"条件: 記号3つ、確定数字の総数4個以下、各行に最大1つの確定数字、一意解")
@@ -510,16 +520,32 @@ def main():
     print(f"確定数字の総数: {problem['confirmed_total']}個")
     print(f"記号マッピング: {problem['reverse_mapping']}")
     
-    # SVG生成（問題）
-    svg_problem = generate_svg(problem, show_answer=False)
+    return {
+        'problem': render(problem, show_answer=False, backend=backend),
+        'answer': render(problem, show_answer=True, backend=backend),
+        'stats': dict(stats),
+    }
+
+
+def main():
+    """メイン処理"""
+    # 日付を取得
+    today = get_date_prefix()
+    
+    # ファイル名
+    problem_filename = f'{today}_cryptarithm.svg'
+    answer_filename = f'{today}_cryptarithm_ans.svg'
+    
+    svgs = generate(today)
+    
+    # SVG保存（問題）
     with open(problem_filename, 'w', encoding='utf-8') as f:
-        f.write(svg_problem)
+        f.write(svgs['problem'])
     print(f"\n問題ファイル: {problem_filename}")
     
-    # SVG生成（正解）
-    svg_answer = generate_svg(problem, show_answer=True)
+    # SVG保存（正解）
     with open(answer_filename, 'w', encoding='utf-8') as f:
-        f.write(svg_answer)
+        f.write(svgs['answer'])
     print(f"正解ファイル: {answer_filename}")
 
 
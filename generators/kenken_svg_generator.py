@@ -3,15 +3,33 @@
 
 """
 KenKen風パズルSVG生成スクリプト
-4×4サイズ、厳密な一意解検証付き
+4×4〜9×9サイズ（デフォルト4×4）、厳密な一意解検証付き
+
+使用方法:
+    $ python kenken_svg_generator.py [YYYYMMDD] [--size N] [--jobs N]
+
+    --jobs を指定すると試行をNプロセスで並列に実行する（結果は --jobs の値によらず同じだが、--jobs なしの結果とは異なる）
 """
 
 import random
 import itertools
+import math
 import sys
 import os
+import time
 from datetime import datetime
-from typing import List, Set, Tuple, Dict
+from typing import List, Set, Tuple, Dict, Optional
+from collections import Counter
+from functools import lru_cache
+
+from render_backend import create_backend
+from seeding import date_seed
+
+# 乱数・カウンター・バージョンの約束は seeding.py を参照
+PUZZLE_TYPE = 'kenken'
+GENERATOR_VERSION = 2
+rng = random.Random()
+stats = Counter()
 
 
 def get_date_prefix():
@@ -24,14 +42,50 @@ def get_date_prefix():
         return os.environ['PUZZLE_DATE']
     return datetime.now().strftime('%Y%m%d')
 
+
+def get_int_option(flag, env_name, default):
+    """整数のオプションを取得（引数 flag > 環境変数 env_name > デフォルト）"""
+    if flag in sys.argv:
+        index = sys.argv.index(flag)
+        if index + 1 < len(sys.argv):
+            return int(sys.argv[index + 1])
+    if env_name in os.environ:
+        return int(os.environ[env_name])
+    return default
+
 # 定数
-N = 4
+N = 4  # デフォルトの盤の大きさ（毎日のパズル）
+MIN_SIZE = 4
+MAX_SIZE = 9
 CELL_SIZE = 60  # SVG単位
 BORDER_THICK = 2
 BORDER_THIN = 0.5
 FONT_SIZE_LARGE = 36
 FONT_SIZE_SMALL = 18
 
+# 盤の大きさごとの試行回数の上限（試行回数で区切るため、同じシードなら機械の速さによらず同じパズルになる）
+SIZE_MAX_ATTEMPTS = {4: 200, 5: 200, 6: 200, 7: 100, 8: 50, 9: 30}
+
+# 盤の大きさごとの生成時間の上限（秒）。超えたら RuntimeError で打ち切る（結果は返さない）
+SIZE_TIME_LIMITS = {4: 60, 5: 60, 6: 120, 7: 180, 8: 300, 9: 600}
+
+# 1回の一意解チェックで探索するマスの数の上限（超えたら一意解と確認できなかったものとして作り直す）
+MAX_SOLVER_NODES = 20000
+
+# 別解が見つかったときにケージを修正する回数の上限（超えたらラテン方陣から作り直す）
+MAX_REPAIRS = 20
+
+# 修正でケージを結合する・マスを移すときの、できるケージの大きさの上限
+MAX_REPAIRED_CAGE_SIZE = 5
+
+# ケージの大きさの分布（盤の大きさの上限, ((累積確率, ケージの大きさ), ...)）
+# 盤が大きいほど大きなケージを減らす（ターゲットを満たす数字の組が増えて一意解になりにくく、探索も遅くなる）
+CAGE_SIZE_DISTRIBUTIONS = (
+    (5, ((0.1, 1), (0.5, 3), (0.7, 4), (1.0, 2))),
+    (7, ((0.1, 1), (0.45, 3), (0.55, 4), (1.0, 2))),
+    (9, ((0.1, 1), (0.4, 3), (0.45, 4), (1.0, 2))),
+)
+
 
 class Cage:
     """ケージ構造"""
@@ -62,7 +116,7 @@ def generate_latin_square(n: int) -> List[int]:
             return True
         
         nums = list(range(1, n + 1))
-        random.shuffle(nums)
+        rng.shuffle(nums)
         
         for num in nums:
             if is_valid(idx, num):
@@ -76,26 +130,28 @@ def generate_latin_square(n: int) -> List[int]:
     return board
 
 
+def cage_size_distribution(n: int) -> Tuple[Tuple[float, int], ...]:
+    """ケージの大きさの分布（(累積確率, 大きさ) の組）"""
+    for max_size, distribution in CAGE_SIZE_DISTRIBUTIONS:
+        if n <= max_size:
+            return distribution
+    return CAGE_SIZE_DISTRIBUTIONS[-1][1]
+
+
 def generate_cages(n: int) -> List[int]:
     """ケージを生成（各セルにケージIDを割り当て）"""
     grid = [-1] * (n * n)
     visited = [False] * (n * n)
     cage_id = 0
+    distribution = cage_size_distribution(n)
     
     for i in range(n * n):
         if visited[i]:
             continue
         
         # ターゲットサイズを決定
-        rand = random.random()
-        if rand < 0.1:
-            target_size = 1
-        elif rand < 0.5:
-            target_size = 3
-        elif rand < 0.7:
-            target_size = 4
-        else:
-            target_size = 2
+        rand = rng.random()
+        target_size = next(size for limit, size in distribution if rand < limit)
         
         current = [i]
         visited[i] = True
@@ -125,7 +181,7 @@ def generate_cages(n: int) -> List[int]:
             if not candidates:
                 break
             
-            next_cell = random.choice(candidates)
+            next_cell = rng.choice(candidates)
             visited[next_cell] = True
             current.append(next_cell)
         
@@ -171,6 +227,53 @@ def generate_cages(n: int) -> List[int]:
     return grid
 
 
+def choose_target(nums: List[int]) -> int:
+    """ケージの数字から演算子を選んでターゲット値を決める"""
+    if len(nums) == 1:
+        return nums[0]
+    elif len(nums) == 2:
+        a, b = nums[0], nums[1]
+        big, small = max(a, b), min(a, b)
+        ops = ['+', '*', '-']
+        if big % small == 0:
+            ops.append('/')
+        op = rng.choice(ops)
+        
+        if op == '+':
+            return a + b
+        elif op == '*':
+            return a * b
+        elif op == '-':
+            return big - small
+        else:
+            return big // small
+    else:
+        op = rng.choice(['+', '*']) if rng.random() < 0.6 else rng.choice(['+', '*'])
+        if op == '+':
+            return sum(nums)
+        else:
+            target = 1
+            for v in nums:
+                target *= v
+            return target
+
+
+def target_options(nums: List[int]) -> List[int]:
+    """ケージの数字から作れるターゲット値の一覧（各演算子で計算した値、割り切れない割り算は除く）"""
+    if len(nums) == 1:
+        return [nums[0]]
+    if len(nums) == 2:
+        big, small = max(nums), min(nums)
+        options = {big + small, big * small, big - small}
+        if big % small == 0:
+            options.add(big // small)
+        return sorted(options)
+    product = 1
+    for v in nums:
+        product *= v
+    return sorted({sum(nums), product})
+
+
 def calculate_targets(grid_struct: List[int], solution: List[int], n: int) -> List[Cage]:
     """ターゲット値を計算"""
     cage_map = {}
@@ -183,39 +286,20 @@ def calculate_targets(grid_struct: List[int], solution: List[int], n: int) -> Li
     cages = []
     for cid, nums in cage_map.items():
         cells = [i for i in range(n * n) if grid_struct[i] == cid]
-        
-        if len(nums) == 1:
-            target = nums[0]
-        elif len(nums) == 2:
-            a, b = nums[0], nums[1]
-            big, small = max(a, b), min(a, b)
-            ops = ['+', '*', '-']
-            if big % small == 0:
-                ops.append('/')
-            op = random.choice(ops)
-            
-            if op == '+':
-                target = a + b
-            elif op == '*':
-                target = a * b
-            elif op == '-':
-                target = big - small
-            else:
-                target = big // small
-        else:
-            op = random.choice(['+', '*']) if random.random() < 0.6 else random.choice(['+', '*'])
-            if op == '+':
-                target = sum(nums)
-            else:
-                target = 1
-                for v in nums:
-                    target *= v
-        
-        cages.append(Cage(cid, cells, target))
+        cages.append(Cage(cid, cells, choose_target(nums)))
     
     return cages
 
 
+def cage_operators(size: int) -> List[str]:
+    """ケージの大きさで使える演算子（'=' は1マスのケージ）"""
+    if size == 1:
+        return ['=']
+    elif size == 2:
+        return ['+', '-', '*', '/']
+    return ['+', '*']
+
+
 def check_cage_math(nums: List[int], target: int, op: str) -> bool:
     """ケージの制約チェック"""
     if len(nums) == 1:
@@ -230,7 +314,9 @@ def check_cage_math(nums: List[int], target: int, op: str) -> bool:
         elif op == '-':
             return abs(a - b) == target
         elif op == '/':
-            return (a != 0 and b != 0 and (a // b == target or b // a == target))
+            # 割り切れる場合のみ（calculate_targets() と同じ）
+            big, small = max(a, b), min(a, b)
+            return small != 0 and big % small == 0 and big // small == target
         return False
     
     if len(nums) >= 3:
@@ -246,134 +332,497 @@ def check_cage_math(nums: List[int], target: int, op: str) -> bool:
     return False
 
 
-def solve_with_operators(n: int, grid_struct: List[int], cages: List[Cage], 
-                         operators: Dict[int, str], max_solutions: int = 2) -> List[List[int]]:
-    """指定された演算子で解を探索"""
-    board = [0] * (n * n)
-    cage_map = {cage.id: cage for cage in cages}
-    cell_cage_ids = grid_struct
+def cage_matches(nums: List[int], target: int) -> bool:
+    """いずれかの演算子で nums がターゲットになるか（問題には演算子を印刷しないため）"""
+    return any(check_cage_math(nums, target, op) for op in cage_operators(len(nums)))
+
+
+@lru_cache(maxsize=None)
+def cage_candidates(size: int, target: int, operators: Tuple[str, ...], n: int) -> Tuple[Tuple[int, ...], ...]:
+    """
+    ケージに入りうる数字の組（重複を含む組み合わせ）の一覧
+    各組は数字ごとの個数 counts（counts[d] = 数字dの個数、長さ n+1）で表す
+    (大きさ, ターゲット, 演算子, n) ごとにメモ化し、同じ条件のケージ・試行で使い回す
+    """
+    candidates = []
+    for nums in itertools.combinations_with_replacement(range(1, n + 1), size):
+        if any(check_cage_math(list(nums), target, op) for op in operators):
+            counts = [0] * (n + 1)
+            for v in nums:
+                counts[v] += 1
+            candidates.append(tuple(counts))
+    return tuple(candidates)
+
+
+@lru_cache(maxsize=None)
+def cage_assignments(size: int, target: int, operators: Tuple[str, ...], n: int,
+                     conflicts: Tuple[Tuple[int, int], ...]) -> Tuple[Tuple[int, ...], ...]:
+    """
+    ケージの置き方（ケージのマス順の数字の組）の一覧を、マスと数字ごとのビットマスクで返す
+    戻り値[k][v] は、k番目のマスに数字vを置く置き方の番号の集合（ビット）
+    cage_candidates() の各組を並べ替え、同じ行・列にあるマスの組 conflicts に
+    同じ数字が入るものを除く（形ごとにメモ化する）
+    """
+    masks = [[0] * (n + 1) for _ in range(size)]
+    count = 0
+    for counts in cage_candidates(size, target, operators, n):
+        nums = [d for d in range(1, n + 1) for _ in range(counts[d])]
+        for values in sorted(set(itertools.permutations(nums))):
+            if any(values[i] == values[j] for i, j in conflicts):
+                continue
+            for k, v in enumerate(values):
+                masks[k][v] |= 1 << count
+            count += 1
+    return tuple(tuple(row) for row in masks)
+
+
+def solve(n: int, grid_struct: List[int], cages: List[Cage], max_solutions: int = 2,
+          max_nodes: int = None) -> List[List[int]]:
+    """
+    演算子を問わない制約（各ケージがいずれかの演算子でターゲットになる）で解を探索
+    max_solutions 個見つかった時点で打ち切る
+    max_nodes を指定すると、探索したマスの数がそれを超えた時点で打ち切って None を返す
+    （時間ではなく探索量で打ち切るため、同じ乱数なら同じ結果になる）
+
+    - 各ケージは cage_assignments() の表（メモ化済み）の置き方のうち、
+      これまでに置いた数字と矛盾しないものだけをビットマスクで残す
+      （置いたマスと同じ行・列のケージからは、その数字を同じ行・列に置く置き方を除く）
+    - 残った置き方から各マスに入りうる数字を求め、候補が最も少ないマスから埋める
+    - いずれかのケージの置き方が無くなった時点で戻る
+    """
+    cells = n * n
+    position = [None] * cells  # マス -> (ケージ番号, ケージ内の位置)
+    tables = []
+    options = []  # ケージごとに残っている置き方（ビット）
+    for ci, cage in enumerate(cages):
+        for k, cell in enumerate(cage.cells):
+            position[cell] = (ci, k)
+        conflicts = tuple(
+            (i, j)
+            for i, j in itertools.combinations(range(len(cage.cells)), 2)
+            if cage.cells[i] // n == cage.cells[j] // n or cage.cells[i] % n == cage.cells[j] % n
+        )
+        ops = tuple(cage_operators(len(cage.cells)))
+        table = cage_assignments(len(cage.cells), cage.target, ops, n, conflicts)
+        tables.append(table)
+        options.append(sum(table[0]))  # 1番目のマスの数字ごとの集合は互いに重ならない
+    # 行・列ごとに、その行・列にマスを持つケージと、ケージ内の位置
+    lines = [dict() for _ in range(2 * n)]
+    for cell in range(cells):
+        ci, k = position[cell]
+        for line in (cell // n, n + cell % n):
+            lines[line].setdefault(ci, []).append(k)
+    digits = range(1, n + 1)
+    
+    def cell_masks(ci: int) -> List[int]:
+        """ケージの各マスに入りうる数字（残った置き方の和集合）"""
+        remaining = options[ci]
+        return [
+            sum(1 << v for v in digits if remaining & by_value[v])
+            for by_value in tables[ci]
+        ]
+    
+    domains = [cell_masks(ci) for ci in range(len(cages))]
+    line_cells_list = [[r * n + c for c in range(n)] for r in range(n)] + \
+                      [[r * n + c for r in range(n)] for c in range(n)]
+    line_used = [0] * (2 * n)  # 行・列ごとに置いた数字
+    full = sum(1 << v for v in digits)
+    board = [0] * cells
+    empty = set(range(cells))
     solutions = []
-    
-    def is_valid(idx: int, num: int) -> bool:
-        r, c = idx // n, idx % n
-        
-        # 行・列チェック
-        for k in range(c):
-            if board[r * n + k] == num:
+    nodes = 0
+    
+    def place(idx: int, num: int, undo: list) -> bool:
+        """数字を置いて各ケージの置き方を絞り込む（置き方が無くなるケージがあればFalse）"""
+        own, own_k = position[idx]
+        keep = {own: tables[own][own_k][num]}
+        for line in (idx // n, n + idx % n):
+            for ci, ks in lines[line].items():
+                removed = 0
+                for k in ks:
+                    if ci != own or k != own_k:
+                        removed |= tables[ci][k][num]
+                if removed:
+                    keep[ci] = keep.get(ci, -1) & ~removed
+        for ci, mask in keep.items():
+            remaining = options[ci] & mask
+            if remaining == options[ci]:
+                continue
+            undo.append((ci, options[ci], domains[ci]))
+            options[ci] = remaining
+            if not remaining:
                 return False
-        for k in range(r):
-            if board[k * n + c] == num:
-                return False
-        
-        # ケージ制約チェック
-        cage_id = cell_cage_ids[idx]
-        cage = cage_map[cage_id]
-        op = operators[cage_id]
-        
-        current_nums = []
-        is_full = True
-        
-        for cell_idx in cage.cells:
-            if cell_idx == idx:
-                current_nums.append(num)
-            elif cell_idx < idx:
-                current_nums.append(board[cell_idx])
-            else:
-                is_full = False
-        
-        if is_full:
-            return check_cage_math(current_nums, cage.target, op)
-        
+            domains[ci] = cell_masks(ci)
         return True
     
-    def backtrack(idx: int):
-        nonlocal solutions
-        if idx == n * n:
-            solutions.append(board[:])
+    def backtrack():
+        nonlocal nodes
+        nodes += 1
+        if max_nodes is not None and nodes > max_nodes:
             return
-        if len(solutions) >= max_solutions:
+        if not empty:
+            solutions.append(board[:])
             return
         
-        for num in range(1, n + 1):
-            if is_valid(idx, num):
-                board[idx] = num
-                backtrack(idx + 1)
-                if len(solutions) >= max_solutions:
+        # 候補が最も少ないマスを選ぶ
+        best, best_domain, best_count = None, 0, n + 1
+        for idx in empty:
+            ci, k = position[idx]
+            domain = domains[ci][k]
+            count = bin(domain).count('1')
+            if count < best_count or (count == best_count and idx < best):
+                best, best_domain, best_count = idx, domain, count
+                if count == 0:
                     return
-                board[idx] = 0
+        
+        # 行・列に、まだ置いていない数字の入る場所が無ければ戻る。1か所しか無ければそこに置く
+        if best_count > 1:
+            for line, line_cells in enumerate(line_cells_list):
+                once = twice = 0
+                for cell in line_cells:
+                    if not board[cell]:
+                        ci, k = position[cell]
+                        twice |= once & domains[ci][k]
+                        once |= domains[ci][k]
+                missing = full & ~line_used[line]
+                if missing & ~once:
+                    return
+                singles = missing & ~twice
+                if singles:
+                    digit = singles & -singles
+                    best = next(cell for cell in line_cells
+                                if not board[cell] and domains[position[cell][0]][position[cell][1]] & digit)
+                    best_domain = digit
+                    break
+        
+        idx = best
+        row, col = idx // n, n + idx % n
+        empty.remove(idx)
+        for num in digits:
+            if not best_domain & (1 << num):
+                continue
+            undo = []
+            board[idx] = num
+            line_used[row] |= 1 << num
+            line_used[col] |= 1 << num
+            if place(idx, num, undo):
+                backtrack()
+            board[idx] = 0
+            line_used[row] &= ~(1 << num)
+            line_used[col] &= ~(1 << num)
+            for ci, saved_options, saved_domains in reversed(undo):
+                options[ci], domains[ci] = saved_options, saved_domains
+            if len(solutions) >= max_solutions or (max_nodes is not None and nodes > max_nodes):
+                break
+        empty.add(idx)
     
-    backtrack(0)
+    backtrack()
+    stats['solver_nodes'] += nodes
+    if max_nodes is not None and nodes > max_nodes:
+        return None
     return solutions
 
 
-def generate_operator_combinations(cages: List[Cage]) -> List[Dict[int, str]]:
-    """すべての演算子組み合わせを生成"""
-    cage_ops = {}
-    for cage in cages:
-        length = len(cage.cells)
-        if length == 1:
-            cage_ops[cage.id] = ['=']
-        elif length == 2:
-            cage_ops[cage.id] = ['+', '-', '*', '/']
-        else:
-            cage_ops[cage.id] = ['+', '*']
-    
-    cage_ids = [cage.id for cage in cages]
-    op_lists = [cage_ops[cid] for cid in cage_ids]
-    
-    combinations = []
-    for combo in itertools.product(*op_lists):
-        combinations.append(dict(zip(cage_ids, combo)))
-    
-    return combinations
-
-
-def has_unique_solution(n: int, grid_struct: List[int], cages: List[Cage], 
-                       expected_solution: List[int]) -> bool:
-    """厳密な一意解チェック"""
-    all_combinations = generate_operator_combinations(cages)
-    
-    # 組み合わせ数が多すぎる場合
-    if len(all_combinations) > 50000:
-        return False
-    
-    found_solutions = set()
-    
-    for op_combo in all_combinations:
-        sols = solve_with_operators(n, grid_struct, cages, op_combo, max_solutions=2)
+def check_uniqueness(n: int, grid_struct: List[int], cages: List[Cage],
+                     expected_solution: List[int]) -> Tuple[bool, Optional[List[int]]]:
+    """
+    厳密な一意解チェック
+    演算子の組み合わせごとに解くのではなく、演算子を問わない1回の探索で解を2つまで数える
+    （どの組み合わせの解も、この探索の解のいずれかになる）
+
+    Returns:
+        (一意解か, expected_solution と異なる解)
+        一意解の場合と、探索が上限を超えた場合の別解は None
+    """
+    stats['uniqueness_checks'] += 1
+    solutions = solve(n, grid_struct, cages, max_solutions=2, max_nodes=MAX_SOLVER_NODES)
+    if solutions is None:
+        stats['solver_limit'] += 1
+        return False, None
+    if len(solutions) == 1 and solutions[0] == expected_solution:
+        return True, None
+    other = next((solution for solution in solutions if solution != expected_solution), None)
+    return False, other
+
+
+def cage_neighbors(cells: List[int], n: int) -> List[int]:
+    """ケージに隣接する（ケージ外の）マス"""
+    members = set(cells)
+    neighbors = set()
+    for idx in cells:
+        r, c = idx // n, idx % n
+        for nr, nc in ((r - 1, c), (r + 1, c), (r, c - 1), (r, c + 1)):
+            if 0 <= nr < n and 0 <= nc < n and nr * n + nc not in members:
+                neighbors.add(nr * n + nc)
+    return sorted(neighbors)
+
+
+def is_connected(cells: List[int], n: int) -> bool:
+    """マスの集合が上下左右でつながっているか"""
+    members = set(cells)
+    seen = {cells[0]}
+    stack = [cells[0]]
+    while stack:
+        idx = stack.pop()
+        for nei in cage_neighbors([idx], n):
+            if nei in members and nei not in seen:
+                seen.add(nei)
+                stack.append(nei)
+    return len(seen) == len(members)
+
+
+def split_cells(cells: List[int], start: int, n: int) -> List[int]:
+    """
+    ケージを2つに分けるときの start 側のマス（start から広げて半分、残りもつながるもの）
+    1マスのケージ（数字がそのまま分かる）はできないように、4マス以上のケージだけを分ける
+    分けられなければ空リスト
+    """
+    if len(cells) < 4:
+        return []
+    part = [start]
+    frontier = [start]
+    while frontier and len(part) < len(cells) // 2:
+        idx = frontier.pop(0)
+        for nei in cage_neighbors([idx], n):
+            if nei in cells and nei not in part and len(part) < len(cells) // 2:
+                part.append(nei)
+                frontier.append(nei)
+    rest = [idx for idx in cells if idx not in part]
+    if len(part) < 2 or not is_connected(rest, n):
+        return []
+    return sorted(part)
+
+
+def repair_cages(n: int, grid_struct: List[int], cages: List[Cage], solution: List[int],
+                 others: List[List[int]]) -> Optional[Tuple[List[int], List[Cage]]]:
+    """
+    別解が見つかったパズルを局所的に修正する
+    最後に見つかった別解と解で数字が異なるマスのケージだけを、分割・隣のケージと結合・
+    隣のケージへのマスの移動・ターゲットの変更のいずれかで作り直す（他のケージはそのまま）
+    作り直し方は、これまでに見つかった別解 others がどれも解にならないものから選ぶ
+    （最後の別解を消すために、前に消した別解が戻ってこないようにする）
+    修正できなければ None
+    """
+    other = others[-1]
+    
+    def excluded_all(new_cages: List[Cage]) -> bool:
+        """どの別解も、いずれかのケージのターゲットを満たさないか"""
+        return all(
+            any(not cage_matches([o[idx] for idx in c.cells], c.target) for c in new_cages)
+            for o in others
+        )
+    
+    differing = [idx for idx in range(n * n) if solution[idx] != other[idx]]
+    repairs = []  # (作り直し方, 修正後のケージの一覧, 作り直したケージ)
+    for cage_id in sorted({grid_struct[idx] for idx in differing}):
+        cage = next(c for c in cages if c.id == cage_id)
+        start = next(idx for idx in cage.cells if idx in differing)
         
-        for sol in sols:
-            found_solutions.add(tuple(sol))
+        layouts = [('retarget', [cage], [cage.cells])]
+        part = split_cells(cage.cells, start, n)
+        if part:
+            layouts.append(('split', [cage], [[idx for idx in cage.cells if idx not in part], part]))
+        seen = set()
+        for nei in cage_neighbors(cage.cells, n):
+            partner = next(c for c in cages if c.id == grid_struct[nei])
+            if partner.id not in seen and len(cage.cells) + len(partner.cells) <= MAX_REPAIRED_CAGE_SIZE:
+                seen.add(partner.id)
+                layouts.append(('merge', [cage, partner], [sorted(cage.cells + partner.cells)]))
+        # 境界のマスを1つ隣のケージに移す（ケージの中で数字が入れ替わっているだけの別解はこれで消せる）
+        if len(cage.cells) > 2:
+            for idx in cage.cells:
+                rest = [i for i in cage.cells if i != idx]
+                if not is_connected(rest, n):
+                    continue
+                for nei in cage_neighbors([idx], n):
+                    partner = next(c for c in cages if c.id == grid_struct[nei])
+                    if partner.id != cage.id and len(partner.cells) < MAX_REPAIRED_CAGE_SIZE:
+                        layouts.append(('move', [cage, partner], [rest, sorted(partner.cells + [idx])]))
         
-        # 複数解が見つかった時点で終了
-        if len(found_solutions) > 1:
-            return False
-    
-    # 1つの解のみが見つかり、期待する解と一致するか
-    if len(found_solutions) == 1:
-        return tuple(expected_solution) in found_solutions
+        for action, replaced, groups in layouts:
+            kept = [c for c in cages if c not in replaced]
+            if action == 'move':
+                ids = [cage.id, replaced[1].id]
+            else:
+                ids = [cage.id, max(c.id for c in cages) + 1][:len(groups)]
+            options = [target_options([solution[idx] for idx in cells]) for cells in groups]
+            for targets in itertools.product(*options):
+                added = [Cage(cid, cells, t) for cid, cells, t in zip(ids, groups, targets)]
+                if added[0].target == cage.target and action == 'retarget':
+                    continue
+                if excluded_all(kept + added):
+                    repairs.append((action, kept + added, added))
+    
+    if not repairs:
+        # どのケージを作り直しても別解を消せない（ケージの中で数字が入れ替わっているだけの場合など）
+        return None
+    
+    # 作り直したケージに入りうる数字の組が少ない（他の別解も消しやすい）ものから選ぶ
+    def freedom(repair) -> int:
+        return sum(
+            len(cage_candidates(len(c.cells), c.target, tuple(cage_operators(len(c.cells))), n))
+            for c in repair[2]
+        )
+    least = min(freedom(repair) for repair in repairs)
+    action, new_cages, _ = rng.choice([repair for repair in repairs if freedom(repair) == least])
+    stats[f'repair_{action}'] += 1
+    new_cages.sort(key=lambda c: c.cells[0])
+    grid_struct = grid_struct[:]
+    for c in new_cages:
+        for idx in c.cells:
+            grid_struct[idx] = c.id
+    return grid_struct, new_cages
+
+
+def attempt_puzzle(n: int) -> Tuple[bool, List[int], List[int], List[Cage]]:
+    """
+    1回の試行（ラテン方陣・ケージ・ターゲットを作り、別解が見つかればケージを修正する）
+
+    Returns:
+        (一意解か, 解, ケージ構造, ケージ)
+    """
+    stats['attempts'] += 1
+    solution = generate_latin_square(n)
+    grid_struct = generate_cages(n)
+    cages = calculate_targets(grid_struct, solution, n)
+    
+    # 別解が見つかったら、ラテン方陣とケージ全体は作り直さずに、解が分かれたケージだけを修正する
+    others = []
+    for repair in range(MAX_REPAIRS + 1):
+        unique, other = check_uniqueness(n, grid_struct, cages, solution)
+        if unique:
+            return True, solution, grid_struct, cages
+        if other is None or repair == MAX_REPAIRS:
+            break
+        others.append(other)
+        repaired = repair_cages(n, grid_struct, cages, solution, others)
+        if repaired is None:
+            break
+        stats['repairs'] += 1
+        grid_struct, cages = repaired
+    return False, solution, grid_struct, cages
+
+
+def run_attempt_stream(n: int, seed: int, index: int) -> Tuple[bool, List[int], List[int], List[Cage], Dict]:
+    """
+    並列生成のワーカーで index 番目の試行を実行する（乱数は seed と index から初期化）
+    戻り値は attempt_puzzle() の結果とこの試行のカウンター
+    """
+    rng.seed(f"{seed}:{index}")
+    stats.clear()
+    return attempt_puzzle(n) + (dict(stats),)
+
+
+def generate_puzzle(n: int, max_attempts: int = None, time_limit: float = None,
+                    jobs: int = None) -> Tuple[List[int], List[int], List[Cage]]:
+    """
+    一意解のパズルを生成
+    max_attempts: 試行回数の上限（デフォルトは SIZE_MAX_ATTEMPTS の盤の大きさの値）
+    time_limit: 生成時間の上限（秒、デフォルトは SIZE_TIME_LIMITS の値）。超えたら RuntimeError
+    jobs: 指定すると generate_puzzle_parallel() で試行をプロセスプールで並列に実行する
+    """
+    if max_attempts is None:
+        max_attempts = SIZE_MAX_ATTEMPTS[n]
+    if time_limit is None:
+        time_limit = SIZE_TIME_LIMITS[n]
+    if jobs is not None:
+        return generate_puzzle_parallel(n, jobs, max_attempts, time_limit)
+    start = time.perf_counter()
     
-    return False
-
-
-def generate_puzzle(n: int, max_attempts: int = 200) -> Tuple[List[int], List[int], List[Cage]]:
-    """一意解のパズルを生成"""
     for attempt in range(max_attempts):
-        solution = generate_latin_square(n)
-        grid_struct = generate_cages(n)
-        cages = calculate_targets(grid_struct, solution, n)
-        
-        if has_unique_solution(n, grid_struct, cages, solution):
-            print(f"✓ 一意解のパズルを生成しました（試行回数: {attempt + 1}）")
+        unique, solution, grid_struct, cages = attempt_puzzle(n)
+        if unique:
+            print(f"✓ 一意解のパズルを生成しました（試行回数: {attempt + 1}、ケージの修正: {stats['repairs']}回）")
+            report_attempt_rate(n, attempt + 1, start)
             return solution, grid_struct, cages
         
         if (attempt + 1) % 10 == 0:
             print(f"  試行中... {attempt + 1}/{max_attempts}")
+        
+        if time.perf_counter() - start > time_limit:
+            report_attempt_rate(n, attempt + 1, start)
+            raise RuntimeError(f"{n}×{n}のパズルを{time_limit}秒以内に生成できませんでした")
     
     print(f"警告: {max_attempts}回の試行で一意解が見つかりませんでした")
+    report_attempt_rate(n, max_attempts, start)
+    stats['fallback'] += 1
+    return solution, grid_struct, cages
+
+
+def generate_puzzle_parallel(n: int, jobs: int, max_attempts: int,
+                             time_limit: float) -> Tuple[List[int], List[int], List[Cage]]:
+    """
+    試行を jobs 個のプロセスで投機的に並列実行し、一意解のパズルを生成
+
+    - i 番目の試行は (基準のシード, i) から初期化した乱数で行う（run_attempt_stream()）
+    - 一意解になった試行のうち番号が最も小さいものを採用する
+      （それより前の試行がすべて終わるまで待つため、プロセス数によらず同じパズルになる）
+    - 採用が決まったら、それより後のまだ始まっていない試行は取り消す
+      （実行中の試行は待たずに、結果を捨てる）
+    - カウンターは採用した試行までの合計（プロセス数によらない）
+    - time_limit 秒を超えたら RuntimeError（generate_puzzle() と同じ）
+    """
+    from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+    
+    seed = rng.getrandbits(64)
+    start = time.perf_counter()
+    results = {}  # 試行の番号 -> run_attempt_stream() の結果
+    running = {}  # Future -> 試行の番号
+    best = None  # 一意解になった試行の最小の番号
+    next_index = 0
+    timed_out = False
+    executor = ProcessPoolExecutor(max_workers=jobs)
+    try:
+        while True:
+            while len(running) < jobs and next_index < max_attempts and best is None:
+                running[executor.submit(run_attempt_stream, n, seed, next_index)] = next_index
+                next_index += 1
+            if best is not None and all(index > best for index in running.values()):
+                break
+            if not running:
+                break
+            remaining = time_limit - (time.perf_counter() - start)
+            if remaining <= 0:
+                timed_out = True
+                break
+            done, _ = wait(running, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = running.pop(future)
+                results[index] = future.result()
+                if results[index][0] and (best is None or index < best):
+                    best = index
+            if best is not None:
+                for future, index in list(running.items()):
+                    if index > best and future.cancel():
+                        del running[future]
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    
+    if timed_out:
+        report_attempt_rate(n, len(results), start)
+        raise RuntimeError(f"{n}×{n}のパズルを{time_limit}秒以内に生成できませんでした")
+    if best is not None:
+        chosen = best
+        print(f"✓ 一意解のパズルを生成しました（{chosen + 1}番目の試行、{next_index}回を{jobs}プロセスで実行）")
+    else:
+        chosen = max(results)
+        print(f"警告: {max_attempts}回の試行で一意解が見つかりませんでした")
+        stats['fallback'] += 1
+    for index in range(chosen + 1):
+        if index in results:
+            stats.update(results[index][4])
+    report_attempt_rate(n, len(results), start)
+    _, solution, grid_struct, cages, _ = results[chosen]
     return solution, grid_struct, cages
 
 
+def report_attempt_rate(n: int, attempts: int, start: float):
+    """試行回数と1秒あたりの試行回数を表示"""
+    elapsed = time.perf_counter() - start
+    rate = attempts / elapsed if elapsed > 0 else 0.0
+    print(f"  {n}×{n}: {attempts}回 / {elapsed:.2f}秒（{rate:.1f}回/秒）")
+
+
 def get_cage_borders(idx: int, cage_id: int, grid_struct: List[int], n: int) -> Dict[str, bool]:
     """セルのケージ境界を判定（Trueは太線、Falseは細線）"""
     r, c = idx // n, idx % n
@@ -414,27 +863,30 @@ def is_cage_top_left(idx: int, cage_id: int, grid_struct: List[int]) -> bool:
     return True
 
 
-def generate_svg(solution: List[int], grid_struct: List[int], cages: List[Cage], 
-                show_solution: bool = False) -> str:
-    """SVGを生成"""
-    n = N
+def render(solution: List[int], grid_struct: List[int], cages: List[Cage], 
+           show_solution: bool = False, backend: str = 'svg'):
+    """描画（backend='svg' ならSVG文字列、'drawing' ならReportLabのDrawing）"""
+    n = math.isqrt(len(grid_struct))
     width = n * CELL_SIZE
     height = n * CELL_SIZE
     
-    svg_lines = [
-        f'<?xml version="1.0" encoding="UTF-8"?>',
-        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}" width="{width}" height="{height}">',
-        f'  <rect x="0" y="0" width="{width}" height="{height}" fill="white"/>',
-    ]
+    out = create_backend(backend, width, height)
+    out.rect(0, 0, width, height, fill='white')
     
     # 1. すべてのセル背景を先に描画
     for idx in range(n * n):
         r, c = idx // n, idx % n
         x = c * CELL_SIZE
         y = r * CELL_SIZE
-        svg_lines.append(f'  <rect x="{x}" y="{y}" width="{CELL_SIZE}" height="{CELL_SIZE}" fill="white" stroke="none"/>')
+        out.rect(x, y, CELL_SIZE, CELL_SIZE, fill='white')
     
     # 2. 内部の境界線を描画（外周は除く）
+    def draw_border(x1, y1, x2, y2, thick):
+        if thick:
+            out.line(x1, y1, x2, y2, 'black', BORDER_THICK)
+        else:
+            out.line(x1, y1, x2, y2, 'gray', BORDER_THIN)
+    
     for idx in range(n * n):
         r, c = idx // n, idx % n
         x = c * CELL_SIZE
@@ -444,36 +896,24 @@ def generate_svg(solution: List[int], grid_struct: List[int], cages: List[Cage],
         
         # 上辺（最上行でない場合のみ）
         if r > 0:
-            if borders['top']:
-                svg_lines.append(f'  <line x1="{x}" y1="{y}" x2="{x + CELL_SIZE}" y2="{y}" stroke="black" stroke-width="{BORDER_THICK}"/>')
-            else:
-                svg_lines.append(f'  <line x1="{x}" y1="{y}" x2="{x + CELL_SIZE}" y2="{y}" stroke="gray" stroke-width="{BORDER_THIN}"/>')
+            draw_border(x, y, x + CELL_SIZE, y, borders['top'])
         
         # 下辺（最下行でない場合のみ）
         if r < n - 1:
-            if borders['bottom']:
-                svg_lines.append(f'  <line x1="{x}" y1="{y + CELL_SIZE}" x2="{x + CELL_SIZE}" y2="{y + CELL_SIZE}" stroke="black" stroke-width="{BORDER_THICK}"/>')
-            else:
-                svg_lines.append(f'  <line x1="{x}" y1="{y + CELL_SIZE}" x2="{x + CELL_SIZE}" y2="{y + CELL_SIZE}" stroke="gray" stroke-width="{BORDER_THIN}"/>')
+            draw_border(x, y + CELL_SIZE, x + CELL_SIZE, y + CELL_SIZE, borders['bottom'])
         
         # 左辺（最左列でない場合のみ）
         if c > 0:
-            if borders['left']:
-                svg_lines.append(f'  <line x1="{x}" y1="{y}" x2="{x}" y2="{y + CELL_SIZE}" stroke="black" stroke-width="{BORDER_THICK}"/>')
-            else:
-                svg_lines.append(f'  <line x1="{x}" y1="{y}" x2="{x}" y2="{y + CELL_SIZE}" stroke="gray" stroke-width="{BORDER_THIN}"/>')
+            draw_border(x, y, x, y + CELL_SIZE, borders['left'])
         
         # 右辺（最右列でない場合のみ）
         if c < n - 1:
-            if borders['right']:
-                svg_lines.append(f'  <line x1="{x + CELL_SIZE}" y1="{y}" x2="{x + CELL_SIZE}" y2="{y + CELL_SIZE}" stroke="black" stroke-width="{BORDER_THICK}"/>')
-            else:
-                svg_lines.append(f'  <line x1="{x + CELL_SIZE}" y1="{y}" x2="{x + CELL_SIZE}" y2="{y + CELL_SIZE}" stroke="gray" stroke-width="{BORDER_THIN}"/>')
+            draw_border(x + CELL_SIZE, y, x + CELL_SIZE, y + CELL_SIZE, borders['right'])
     
     # 3. 最外周フレームをrectのstrokeとして描画（確実にviewBox内に収める）
-    svg_lines.append(f'  <!-- 外周フレーム（太線） -->')
     half_border = BORDER_THICK / 2
-    svg_lines.append(f'  <rect x="{half_border}" y="{half_border}" width="{width - BORDER_THICK}" height="{height - BORDER_THICK}" fill="none" stroke="black" stroke-width="{BORDER_THICK}"/>')
+    out.rect(half_border, half_border, width - BORDER_THICK, height - BORDER_THICK,
+             fill=None, stroke='black', stroke_width=BORDER_THICK)
     
     # 4. ターゲット値を描画
     for idx in range(n * n):
@@ -481,10 +921,13 @@ def generate_svg(solution: List[int], grid_struct: List[int], cages: List[Cage],
         if is_cage_top_left(idx, cage_id, grid_struct):
             cage = next(c for c in cages if c.id == cage_id)
             r, c = idx // n, idx % n
+            # 大きな盤の掛け算では桁数が多くなるため、マスに収まるように文字を小さくする
+            digits = len(str(cage.target))
+            font_size = min(FONT_SIZE_SMALL, round((CELL_SIZE - 8) / (0.6 * digits), 1))
             x = c * CELL_SIZE + 4
-            y = r * CELL_SIZE + FONT_SIZE_SMALL + 2
+            y = r * CELL_SIZE + font_size + 2
             
-            svg_lines.append(f'  <text x="{x}" y="{y}" font-family="sans-serif" font-size="{FONT_SIZE_SMALL}" fill="black">{cage.target}</text>')
+            out.text(x, y, cage.target, font_size)
     
     # 5. 解答を描画
     if show_solution:
@@ -493,38 +936,70 @@ def generate_svg(solution: List[int], grid_struct: List[int], cages: List[Cage],
             x = c * CELL_SIZE + CELL_SIZE / 2
             y = r * CELL_SIZE + CELL_SIZE / 2 + FONT_SIZE_LARGE / 3
             
-            svg_lines.append(f'  <text x="{x}" y="{y}" font-family="sans-serif" font-size="{FONT_SIZE_LARGE}" fill="black" text-anchor="middle">{solution[idx]}</text>')
+            out.text(x, y, solution[idx], FONT_SIZE_LARGE, anchor='middle')
     
-    svg_lines.append('</svg>')
-    
-    return '\n'.join(svg_lines)
+    return out.result()
 
 
-def main():
-    """メイン処理"""
+def generate_svg(solution: List[int], grid_struct: List[int], cages: List[Cage], 
+                show_solution: bool = False) -> str:
+    """SVGを生成"""
+    return render(solution, grid_struct, cages, show_solution, backend='svg')
+
+
+def generate(date_prefix: str, seed=None, backend: str = 'svg', size: int = N,
+             jobs: int = None) -> Dict:
+    """
+    パズルを生成して問題・解答を返す（puzzle_layout.pyから直接呼び出す）
+    size: 盤の大きさ（MIN_SIZE〜MAX_SIZE、週末の「難しい」版では大きな盤を使う）
+    jobs: 試行を並列に実行するプロセス数（generate_puzzle_parallel()、省略時は1プロセスで順に試す）
+
+    Returns:
+        {'problem': 問題, 'answer': 解答, 'stats': 試行回数などのカウンター}
+        backend='svg' ならSVG文字列、'drawing' ならReportLabのDrawing
+    """
+    if not MIN_SIZE <= size <= MAX_SIZE:
+        raise Exception(f"盤の大きさは{MIN_SIZE}〜{MAX_SIZE}で指定してください: {size}")
+    # 日付・パズル種別・生成器バージョンから乱数を初期化（同じ日付なら同じ問題になる）
+    if seed is None:
+        seed = date_seed(date_prefix, PUZZLE_TYPE, GENERATOR_VERSION)
+    rng.seed(seed)
+    stats.clear()
+    
     print("KenKen風パズル生成中...")
-    print(f"サイズ: {N}×{N}")
+    print(f"サイズ: {size}×{size}")
     print()
     
     # パズル生成
-    solution, grid_struct, cages = generate_puzzle(N)
+    solution, grid_struct, cages = generate_puzzle(size, jobs=jobs)
     
-    # ファイル名生成
+    # 描画
+    return {
+        'problem': render(solution, grid_struct, cages, show_solution=False, backend=backend),
+        'answer': render(solution, grid_struct, cages, show_solution=True, backend=backend),
+        'stats': dict(stats),
+    }
+
+
+def main():
+    """メイン処理"""
     today = get_date_prefix()
-    filename_puzzle = f"{today}_kenken.svg"
-    filename_answer = f"{today}_kenken_ans.svg"
+    size = get_int_option('--size', 'KENKEN_SIZE', N)
+    jobs = get_int_option('--jobs', 'KENKEN_JOBS', None)
+    svgs = generate(today, size=size, jobs=jobs)
     
-    # SVG生成
-    svg_puzzle = generate_svg(solution, grid_struct, cages, show_solution=False)
-    svg_answer = generate_svg(solution, grid_struct, cages, show_solution=True)
+    # ファイル名生成（デフォルト以外の大きさはファイル名に大きさを付ける）
+    suffix = "" if size == N else f"_{size}x{size}"
+    filename_puzzle = f"{today}_kenken{suffix}.svg"
+    filename_answer = f"{today}_kenken{suffix}_ans.svg"
     
     # ファイル保存
     with open(filename_puzzle, 'w', encoding='utf-8') as f:
-        f.write(svg_puzzle)
+        f.write(svgs['problem'])
     print(f"✓ 問題を保存しました: {filename_puzzle}")
     
     with open(filename_answer, 'w', encoding='utf-8') as f:
-        f.write(svg_answer)
+        f.write(svgs['answer'])
     print(f"✓ 解答を保存しました: {filename_answer}")
     
     print()
@@ -4,6 +4,7 @@
 マッチ棒パズル SVG生成スクリプト
 
 必要なモジュール: Python標準ライブラリのみ（追加インストール不要）
+※PDF用のDrawing出力にはreportlabが必要
 - random, datetime, os
 
 使用方法:
@@ -18,6 +19,16 @@ import random
 import os
 import sys
 from datetime import datetime
+from collections import Counter
+
+from render_backend import create_backend
+from seeding import date_seed
+
+# 乱数・カウンター・バージョンの約束は seeding.py を参照
+PUZZLE_TYPE = 'matchstick'
+GENERATOR_VERSION = 1
+rng = random.Random()
+stats = Counter()
 
 
 def get_date_prefix():
@@ -170,35 +181,36 @@ def gen_valid_equation():
     ops = ['+', '-', '×', '÷']
     
     for _ in range(12000):
-        op = random.choice(ops)
+        stats['equation_tries'] += 1
+        op = rng.choice(ops)
         
         if op == '+':
-            A = random.randint(1, 98)
-            B = random.randint(1, min(99, 99 - A))
+            A = rng.randint(1, 98)
+            B = rng.randint(1, min(99, 99 - A))
             C = A + B
             if C < 1 or C > 99:
                 continue
         elif op == '-':
-            C = random.randint(1, 99)
-            A = random.randint(C + 1, 99)
+            C = rng.randint(1, 98)  # A = C + B <= 99 となるよう C は98まで
+            A = rng.randint(C + 1, 99)
             B = A - C
             if B < 1 or B > 99:
                 continue
         elif op == '×':
-            A = random.randint(1, 99)
+            A = rng.randint(1, 99)
             max_b = 99 // A
             if max_b < 1:
                 continue
-            B = random.randint(1, max_b)
+            B = rng.randint(1, max_b)
             C = A * B
             if C < 1 or C > 99:
                 continue
         else:  # ÷
-            B = random.randint(1, 99)
+            B = rng.randint(1, 99)
             r_max = 99 // B
             if r_max < 1:
                 continue
-            R = random.randint(1, r_max)
+            R = rng.randint(1, r_max)
             A = B * R
             C = R
             if A < 1 or A > 99 or C < 1 or C > 99:
@@ -360,7 +372,7 @@ def pick_decrease(symbol, k):
         cand = DECREASE[k]['digits'].get(symbol['value'])
         if not cand:
             return None
-        pick = random.choice(cand)
+        pick = rng.choice(cand)
         return {'type': 'digit', 'cell': symbol['cell'], 'from': symbol['value'], 'to': pick['to'], 'remove': pick['remove']}
 
 def pick_increase(symbol, k):
@@ -374,7 +386,7 @@ def pick_increase(symbol, k):
         cand = INCREASE[k]['digits'].get(symbol['value'])
         if not cand:
             return None
-        pick = random.choice(cand)
+        pick = rng.choice(cand)
         return {'type': 'digit', 'cell': symbol['cell'], 'from': symbol['value'], 'to': pick['to'], 'add': pick['add']}
 
 def apply_delta(state, change):
@@ -400,8 +412,8 @@ def disturb_equation_once(state, chars, N):
     state.reset()
     draw_equation_chars(state, chars)
     
-    split_dec = random.choice(partitions(N))
-    split_inc = random.choice(partitions(N))
+    split_dec = rng.choice(partitions(N))
+    split_inc = rng.choice(partitions(N))
     
     used_cells = set()
     used_op = False
@@ -431,13 +443,14 @@ def disturb_equation_once(state, chars, N):
         ok = False
         while tries < 100 and not ok:
             tries += 1
+            stats['move_tries'] += 1
             cand = [s for s in symbols if (
                 (s['type'] == 'op' and not used_op and s['op'] in DECREASE[k]['op']) or
                 (s['type'] == 'digit' and s['cell'] not in used_cells and s['value'] in DECREASE[k]['digits'])
             )]
             if not cand:
                 break
-            sym = random.choice(cand)
+            sym = rng.choice(cand)
             ch = pick_decrease(sym, k)
             if not ch:
                 continue
@@ -467,13 +480,14 @@ def disturb_equation_once(state, chars, N):
         ok = False
         while tries < 100 and not ok:
             tries += 1
+            stats['move_tries'] += 1
             cand = [s for s in symbols if (
                 (s['type'] == 'op' and not used_op and s['op'] in INCREASE[k]['op']) or
                 (s['type'] == 'digit' and s['cell'] not in used_cells and s['value'] in INCREASE[k]['digits'])
             )]
             if not cand:
                 break
-            sym = random.choice(cand)
+            sym = rng.choice(cand)
             ch = pick_increase(sym, k)
             if not ch:
                 continue
@@ -514,6 +528,7 @@ def generate_puzzle(moves_required=2):
     state.moves_required = moves_required
     
     for attempts in range(400):
+        stats['attempts'] += 1
         eq = gen_valid_equation()
         chars = equation_to_chars(eq)
         ok = disturb_equation_once(state, chars, min(3, max(1, moves_required)))
@@ -540,8 +555,8 @@ def generate_puzzle(moves_required=2):
 # ==========================
 # SVG生成
 # ==========================
-def generate_svg(state, show_answer=False, answer_eq=None):
-    """SVG画像を生成"""
+def render(state, show_answer=False, answer_eq=None, backend='svg'):
+    """画像を描画（backend: 'svg'=SVG文字列, 'drawing'=ReportLabのDrawing）"""
     
     # サイズ設定（HTMLと同じ比率）
     digit_w = 110
@@ -592,8 +607,8 @@ def generate_svg(state, show_answer=False, answer_eq=None):
     total_width = x
     total_height = 20 + digit_h + 20
     
-    # SVG開始
-    svg_parts = [f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {total_width} {total_height}">']
+    # 描画開始
+    out = create_backend(backend, total_width, total_height)
     
     # 7セグメントの座標定義
     def get_segment_rect(cell_x, cell_y, seg):
@@ -615,11 +630,10 @@ def generate_svg(state, show_answer=False, answer_eq=None):
             return (cell_x + seg_t, cell_y + half_h - seg_t // 2, digit_w - seg_t * 2, seg_t)
         return None
     
-    def draw_rect(x, y, w, h, fill, radius=None, transform=None):
-        """矩形を描画"""
+    def draw_rect(x, y, w, h, fill, radius=None, rotate=None):
+        """矩形を描画（rotate=(角度, cx, cy)）"""
         r = radius if radius is not None else rx
-        t = f' transform="{transform}"' if transform else ''
-        return f'  <rect x="{x}" y="{y}" width="{w}" height="{h}" fill="{fill}" rx="{r}"{t}/>'
+        out.rect(x, y, w, h, fill=fill, rx=r, rotate=rotate)
     
     # ==============================
     # 1. まずゴースト（空きセグメント）をすべて描画
@@ -631,7 +645,7 @@ def generate_svg(state, show_answer=False, answer_eq=None):
         for seg in ['a', 'b', 'c', 'd', 'e', 'f', 'g']:
             rect = get_segment_rect(pos['x'], pos['y'], seg)
             if rect:
-                svg_parts.append(draw_rect(rect[0], rect[1], rect[2], rect[3], ghost_color))
+                draw_rect(rect[0], rect[1], rect[2], rect[3], ghost_color)
     
     # 演算子セグメントのゴースト（h, v, fs, bs の4つ）
     op_pos = positions['OP']
@@ -640,21 +654,21 @@ def generate_svg(state, show_answer=False, answer_eq=None):
     v_len = digit_h // 2 - seg_t
     
     # 横棒ゴースト
-    svg_parts.append(draw_rect(op_x + seg_t, op_center_y - seg_t // 2, 
-                               digit_w - seg_t * 2, seg_t, ghost_op_color))
+    draw_rect(op_x + seg_t, op_center_y - seg_t // 2, 
+              digit_w - seg_t * 2, seg_t, ghost_op_color)
     # 縦棒ゴースト
-    svg_parts.append(draw_rect(op_x + digit_w // 2 - seg_t // 2, op_center_y - v_len // 2,
-                               seg_t, v_len, ghost_op_color))
+    draw_rect(op_x + digit_w // 2 - seg_t // 2, op_center_y - v_len // 2,
+              seg_t, v_len, ghost_op_color)
     # 前スラッシュゴースト
     cx = op_x + digit_w // 2
     cy = op_center_y
-    svg_parts.append(draw_rect(op_x + seg_t, op_center_y - seg_t // 2,
-                               digit_w - seg_t * 2, seg_t, ghost_op_color,
-                               transform=f"rotate(-45 {cx} {cy})"))
+    draw_rect(op_x + seg_t, op_center_y - seg_t // 2,
+              digit_w - seg_t * 2, seg_t, ghost_op_color,
+              rotate=(-45, cx, cy))
     # 後スラッシュゴースト
-    svg_parts.append(draw_rect(op_x + seg_t, op_center_y - seg_t // 2,
-                               digit_w - seg_t * 2, seg_t, ghost_op_color,
-                               transform=f"rotate(45 {cx} {cy})"))
+    draw_rect(op_x + seg_t, op_center_y - seg_t // 2,
+              digit_w - seg_t * 2, seg_t, ghost_op_color,
+              rotate=(45, cx, cy))
     
     # ==============================
     # 2. 存在するセグメント（マッチ棒）を描画
@@ -692,7 +706,7 @@ def generate_svg(state, show_answer=False, answer_eq=None):
             if present:
                 rect = get_segment_rect(pos['x'], pos['y'], seg)
                 if rect:
-                    svg_parts.append(draw_rect(rect[0], rect[1], rect[2], rect[3], stick_color))
+                    draw_rect(rect[0], rect[1], rect[2], rect[3], stick_color)
     
     # 演算子を描画
     if show_answer and answer_eq:
@@ -710,53 +724,59 @@ def generate_svg(state, show_answer=False, answer_eq=None):
     
     # 横棒
     if h_present:
-        svg_parts.append(draw_rect(op_x + seg_t, op_center_y - seg_t // 2,
-                                   digit_w - seg_t * 2, seg_t, stick_color))
+        draw_rect(op_x + seg_t, op_center_y - seg_t // 2,
+                  digit_w - seg_t * 2, seg_t, stick_color)
     
     # 縦棒
     if v_present:
-        svg_parts.append(draw_rect(op_x + digit_w // 2 - seg_t // 2, op_center_y - v_len // 2,
-                                   seg_t, v_len, stick_color))
+        draw_rect(op_x + digit_w // 2 - seg_t // 2, op_center_y - v_len // 2,
+                  seg_t, v_len, stick_color)
     
     # 前スラッシュ（÷や×）
     if fs_present:
-        svg_parts.append(draw_rect(op_x + seg_t, op_center_y - seg_t // 2,
-                                   digit_w - seg_t * 2, seg_t, stick_color,
-                                   transform=f"rotate(-45 {cx} {cy})"))
+        draw_rect(op_x + seg_t, op_center_y - seg_t // 2,
+                  digit_w - seg_t * 2, seg_t, stick_color,
+                  rotate=(-45, cx, cy))
     
     # 後スラッシュ（×のみ）
     if bs_present:
-        svg_parts.append(draw_rect(op_x + seg_t, op_center_y - seg_t // 2,
-                                   digit_w - seg_t * 2, seg_t, stick_color,
-                                   transform=f"rotate(45 {cx} {cy})"))
+        draw_rect(op_x + seg_t, op_center_y - seg_t // 2,
+                  digit_w - seg_t * 2, seg_t, stick_color,
+                  rotate=(45, cx, cy))
     
     # 等号を描画
     eq_y = 20 + digit_h // 2
     eq_gap = 24  # 等号の2本の線の中心間距離
-    svg_parts.append(draw_rect(eq_x, eq_y - eq_gap - seg_t // 2, eq_w, seg_t, stick_color))
-    svg_parts.append(draw_rect(eq_x, eq_y + eq_gap - seg_t // 2, eq_w, seg_t, stick_color))
+    draw_rect(eq_x, eq_y - eq_gap - seg_t // 2, eq_w, seg_t, stick_color)
+    draw_rect(eq_x, eq_y + eq_gap - seg_t // 2, eq_w, seg_t, stick_color)
     
-    svg_parts.append('</svg>')
-    
-    return '\n'.join(svg_parts)
+    return out.result()
+
+
+def generate_svg(state, show_answer=False, answer_eq=None):
+    """SVG画像を生成"""
+    return render(state, show_answer, answer_eq, backend='svg')
+
 
 # ==========================
 # メイン処理
 # ==========================
-def main():
-    # 日付文字列を取得
-    today = get_date_prefix()
-    
-    # 出力ファイル名
-    problem_file = f"{today}_matchstick.svg"
-    answer_file = f"{today}_matchstick_ans.svg"
+def generate(date_prefix, seed=None, backend='svg'):
+    """
+    パズルを生成して問題・正解を返す（puzzle_layout.pyから直接呼び出す）
+    
+    Returns:
+        {'problem': 問題, 'answer': 正解, 'stats': 試行回数などのカウンター}（backend='svg'ならSVG文字列、'drawing'ならDrawing）
+    """
+    # 日付・パズル種別・生成器バージョンから乱数を初期化（同じ日付なら同じ問題になる）
+    if seed is None:
+        seed = date_seed(date_prefix, PUZZLE_TYPE, GENERATOR_VERSION)
+    rng.seed(seed)
+    stats.clear()
     
     print("マッチ棒パズル SVG生成スクリプト")
     print("=" * 40)
     print(f"難易度: 2本（ふつう）")
-    print(f"出力ファイル:")
-    print(f"  問題: {problem_file}")
-    print(f"  正解: {answer_file}")
     print()
     
     # パズル生成
@@ -764,8 +784,7 @@ def main():
     puzzle = generate_puzzle(moves_required=2)
     
     if puzzle is None:
-        print("エラー: パズルの生成に失敗しました")
-        return 1
+        raise Exception("パズルの生成に失敗しました")
     
     state = puzzle['state']
     answer = puzzle['answer']
@@ -778,19 +797,37 @@ def main():
     print(f"正解の式: {answer['A']} {op_display} {answer['B']} = {answer['C']}")
     print()
     
-    # SVG生成
-    print("SVGファイルを生成中...")
+    return {
+        'problem': render(state, show_answer=False, backend=backend),
+        'answer': render(state, show_answer=True, answer_eq=answer, backend=backend),
+        'stats': dict(stats),
+    }
+
+def main():
+    # 日付文字列を取得
+    today = get_date_prefix()
+    
+    # 出力ファイル名
+    problem_file = f"{today}_matchstick.svg"
+    answer_file = f"{today}_matchstick_ans.svg"
+    
+    try:
+        svgs = generate(today)
+    except Exception as e:
+        print(f"エラー: {e}")
+        return 1
+    
+    # SVG保存
+    print("SVGファイルを保存中...")
     
     # 問題SVG
-    problem_svg = generate_svg(state, show_answer=False)
     with open(problem_file, 'w', encoding='utf-8') as f:
-        f.write(problem_svg)
+        f.write(svgs['problem'])
     print(f"  ✓ {problem_file} を生成しました")
     
     # 正解SVG
-    answer_svg = generate_svg(state, show_answer=True, answer_eq=answer)
     with open(answer_file, 'w', encoding='utf-8') as f:
-        f.write(answer_svg)
+        f.write(svgs['answer'])
     print(f"  ✓ {answer_file} を生成しました")
     
     print()
@@ -8,6 +8,16 @@ import math
 import sys
 import os
 from datetime import datetime
+from collections import Counter
+
+from render_backend import create_backend
+from seeding import date_seed
+
+# 乱数・カウンター・バージョンの約束は seeding.py を参照
+PUZZLE_TYPE = 'maze'
+GENERATOR_VERSION = 1
+rng = random.Random()
+stats = Counter()
 
 def get_date_prefix():
     """日付プレフィックスを取得（引数 > 環境変数 > 今日）"""
@@ -118,8 +128,8 @@ class Maze:
         
         while stack:
             current_index = len(stack) - 1
-            if random.random() < entropy and len(stack) > 1:
-                current_index = random.randint(0, len(stack) - 1)
+            if rng.random() < entropy and len(stack) > 1:
+                current_index = rng.randint(0, len(stack) - 1)
             
             current_cell = stack[current_index]
             neighbors = self._get_unvisited_neighbors(current_cell)
@@ -128,13 +138,13 @@ class Maze:
                 def sort_key(n):
                     dir_n = {'x': n['cell'].x - current_cell.x, 'y': n['cell'].y - current_cell.y}
                     dot = dir_n['x'] * goal_direction['x'] + dir_n['y'] * goal_direction['y']
-                    return dot if random.random() < 0.75 else random.random() - 0.5
+                    return dot if rng.random() < 0.75 else rng.random() - 0.5
                 
                 neighbors.sort(key=sort_key)
                 chosen = neighbors[0]
                 next_cell = chosen['cell']
                 
-                if random.random() <= roughness:
+                if rng.random() <= roughness:
                     current_cell.walls[chosen['wall']] = False
                     next_cell.walls[opposite_wall[chosen['wall']]] = False
                 
@@ -211,43 +221,98 @@ class Maze:
         
         self.solution = []
     
-    def render_svg(self, show_solution=True, cell_size=10, wall_color='gray'):
+    def _wall_runs(self):
+        """
+        壁をセル座標の線分 ((x1, y1), (x2, y2)) のリストで返す
+        どちらかの隣接セルに壁がある辺を1回だけ数え、同じ格子線上で続く辺は1本につなげる
+        （水平線を上から、垂直線を左から順に並べる）
+        """
+        runs = []
+        # 水平線: 格子線 y 上の辺 x は、上のセルの下壁か下のセルの上壁
+        for y in range(self.height + 1):
+            start = None
+            for x in range(self.width + 1):
+                above, below = self.get_cell(x, y - 1), self.get_cell(x, y)
+                wall = x < self.width and ((above is not None and above.walls['bottom']) or
+                                           (below is not None and below.walls['top']))
+                if wall and start is None:
+                    start = x
+                elif not wall and start is not None:
+                    runs.append(((start, y), (x, y)))
+                    start = None
+        # 垂直線: 格子線 x 上の辺 y は、左のセルの右壁か右のセルの左壁
+        for x in range(self.width + 1):
+            start = None
+            for y in range(self.height + 1):
+                left, right = self.get_cell(x - 1, y), self.get_cell(x, y)
+                wall = y < self.height and ((left is not None and left.walls['right']) or
+                                            (right is not None and right.walls['left']))
+                if wall and start is None:
+                    start = y
+                elif not wall and start is not None:
+                    runs.append(((x, start), (x, y)))
+                    start = None
+        return runs
+    
+    def render(self, show_solution=True, cell_size=10, wall_color='gray', backend='svg'):
+        """
+        迷路を描画する
+        backend='svg' ならSVG文字列、'drawing' ならReportLabのDrawingを返す
+        """
         wall_stroke_width = 1
         offset = wall_stroke_width / 2.0
         
         svg_total_width = self.width * cell_size + wall_stroke_width
         svg_total_height = self.height * cell_size + wall_stroke_width
         
-        lines = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{svg_total_width}" height="{svg_total_height}" viewBox="0 0 {svg_total_width} {svg_total_height}" shape-rendering="crispEdges" style="background-color: transparent;">']
+        out = create_backend(
+            backend, svg_total_width, svg_total_height,
+            root_attrs='shape-rendering="crispEdges" style="background-color: transparent;"'
+        )
         
         if show_solution and self.solution:
             solution_stroke_width = max(1, cell_size // 5)
-            path_d = f'M{offset + (self.solution[0].x + 0.5) * cell_size},{offset + (self.solution[0].y + 0.5) * cell_size}'
-            for i in range(1, len(self.solution)):
-                path_d += f' L{offset + (self.solution[i].x + 0.5) * cell_size},{offset + (self.solution[i].y + 0.5) * cell_size}'
-            lines.append(f'<path d="{path_d}" stroke="black" stroke-width="{solution_stroke_width}" fill="none" stroke-linecap="round" stroke-linejoin="round"/>')
+            # 曲がり角のセルだけを頂点にする（まっすぐ進む途中のセルは省く）
+            corners = [cell for i, cell in enumerate(self.solution)
+                       if i == 0 or i == len(self.solution) - 1 or
+                       self.solution[i - 1].x != self.solution[i + 1].x and
+                       self.solution[i - 1].y != self.solution[i + 1].y]
+            path_d = f'M{offset + (corners[0].x + 0.5) * cell_size},{offset + (corners[0].y + 0.5) * cell_size}'
+            for cell in corners[1:]:
+                path_d += f' L{offset + (cell.x + 0.5) * cell_size},{offset + (cell.y + 0.5) * cell_size}'
+            out.path(path_d, fill=None, stroke='black', stroke_width=solution_stroke_width, round_joins=True)
         
-        for y in range(self.height):
-            for x in range(self.width):
-                cell = self.get_cell(x, y)
-                if not cell:
-                    continue
-                cell_corner_x = offset + x * cell_size
-                cell_corner_y = offset + y * cell_size
-                
-                if cell.walls['top']:
-                    lines.append(f'<line x1="{cell_corner_x}" y1="{cell_corner_y}" x2="{cell_corner_x + cell_size}" y2="{cell_corner_y}" stroke="{wall_color}" stroke-width="{wall_stroke_width}"/>')
-                if cell.walls['right']:
-                    lines.append(f'<line x1="{cell_corner_x + cell_size}" y1="{cell_corner_y}" x2="{cell_corner_x + cell_size}" y2="{cell_corner_y + cell_size}" stroke="{wall_color}" stroke-width="{wall_stroke_width}"/>')
-                if cell.walls['bottom']:
-                    lines.append(f'<line x1="{cell_corner_x}" y1="{cell_corner_y + cell_size}" x2="{cell_corner_x + cell_size}" y2="{cell_corner_y + cell_size}" stroke="{wall_color}" stroke-width="{wall_stroke_width}"/>')
-                if cell.walls['left']:
-                    lines.append(f'<line x1="{cell_corner_x}" y1="{cell_corner_y}" x2="{cell_corner_x}" y2="{cell_corner_y + cell_size}" stroke="{wall_color}" stroke-width="{wall_stroke_width}"/>')
+        # 壁は1本の<path>にまとめる（隣り合うセルで共有する壁は1回だけ、一直線に続く壁は1本の線分）
+        wall_d = []
+        for (x1, y1), (x2, y2) in self._wall_runs():
+            start_x, start_y = offset + x1 * cell_size, offset + y1 * cell_size
+            if y1 == y2:
+                wall_d.append(f'M{start_x},{start_y} H{offset + x2 * cell_size}')
+            else:
+                wall_d.append(f'M{start_x},{start_y} V{offset + y2 * cell_size}')
+        if wall_d:
+            out.path(' '.join(wall_d), fill=None, stroke=wall_color, stroke_width=wall_stroke_width)
         
-        lines.append('</svg>')
-        return '\n'.join(lines)
+        return out.result()
+    
+    def render_svg(self, show_solution=True, cell_size=10, wall_color='gray'):
+        """迷路をSVG文字列として描画する"""
+        return self.render(show_solution, cell_size, wall_color, backend='svg')
 
-def main():
+def generate(date_prefix, seed=None, backend='svg'):
+    """
+    迷路を生成して問題・解答を返す（puzzle_layout.pyから直接呼び出す）
+
+    Returns:
+        {'problem': 問題, 'answer': 解答, 'stats': 試行回数などのカウンター}
+        backend='svg' ならSVG文字列、'drawing' ならReportLabのDrawing
+    """
+    # 日付・パズル種別・生成器バージョンから乱数を初期化（同じ日付なら同じ問題になる）
+    if seed is None:
+        seed = date_seed(date_prefix, PUZZLE_TYPE, GENERATOR_VERSION)
+    rng.seed(seed)
+    stats.clear()
+    
     width, height = 75, 50
     
     print(f"迷路を生成中... ({width}x{height})")
@@ -255,16 +320,24 @@ def main():
     maze.generate(entropy=0.5, roughness=1.0, start_at='leftTop')
     print(f"解答パス長: {len(maze.solution)} セル")
     
+    return {
+        'problem': maze.render(show_solution=False, cell_size=10, wall_color='gray', backend=backend),
+        'answer': maze.render(show_solution=True, cell_size=10, wall_color='gray', backend=backend),
+        'stats': dict(stats),
+    }
+
+def main():
     date_str = get_date_prefix()
+    svgs = generate(date_str)
     
     filename_no_solution = f"{date_str}_maze.svg"
     with open(filename_no_solution, 'w', encoding='utf-8') as f:
-        f.write(maze.render_svg(show_solution=False, cell_size=10, wall_color='gray'))
+        f.write(svgs['problem'])
     print(f"保存: {filename_no_solution}")
     
     filename_with_solution = f"{date_str}_maze_ans.svg"
     with open(filename_with_solution, 'w', encoding='utf-8') as f:
-        f.write(maze.render_svg(show_solution=True, cell_size=10, wall_color='gray'))
+        f.write(svgs['answer'])
     print(f"保存: {filename_with_solution}")
 
 if __name__ == '__main__':
@@ -13,6 +13,16 @@ import copy
 import sys
 import os
 from datetime import date
+from collections import Counter
+
+from render_backend import create_backend
+from seeding import date_seed
+
+# 乱数・カウンター・バージョンの約束は seeding.py を参照
+PUZZLE_TYPE = 'mininumpre'
+GENERATOR_VERSION = 1
+rng = random.Random()
+stats = Counter()
 
 
 def get_date_prefix():
@@ -450,6 +460,7 @@ class MiniNumpreGenerator:
         max_attempts = 100
         
         for attempt in range(max_attempts):
+            stats['attempts'] += 1
             # 解答生成
             self._generate_solution()
             
@@ -476,7 +487,7 @@ class MiniNumpreGenerator:
         # 数字のマッピングをシャッフル
         digits = list(range(1, self.N + 1))
         mapping = digits[:]
-        random.shuffle(mapping)
+        rng.shuffle(mapping)
         for r in range(self.N):
             for c in range(self.N):
                 self.solution[r][c] = mapping[self.solution[r][c] - 1]
@@ -485,7 +496,7 @@ class MiniNumpreGenerator:
         for br in range(self.N // self.BLOCK_ROWS):
             base = br * self.BLOCK_ROWS
             rows = [self.solution[base + i][:] for i in range(self.BLOCK_ROWS)]
-            random.shuffle(rows)
+            rng.shuffle(rows)
             for i in range(self.BLOCK_ROWS):
                 self.solution[base + i] = rows[i]
         
@@ -493,7 +504,7 @@ class MiniNumpreGenerator:
         for bc in range(self.N // self.BLOCK_COLS):
             base = bc * self.BLOCK_COLS
             cols_idx = list(range(base, base + self.BLOCK_COLS))
-            random.shuffle(cols_idx)
+            rng.shuffle(cols_idx)
             temp_cols = [[self.solution[r][ci] for r in range(self.N)] for ci in cols_idx]
             for i, ci in enumerate(range(base, base + self.BLOCK_COLS)):
                 for r in range(self.N):
@@ -501,7 +512,7 @@ class MiniNumpreGenerator:
         
         # ブロック行をシャッフル
         block_row_groups = list(range(self.N // self.BLOCK_ROWS))
-        random.shuffle(block_row_groups)
+        rng.shuffle(block_row_groups)
         copy_sol = [row[:] for row in self.solution]
         for tb, sb in enumerate(block_row_groups):
             for i in range(self.BLOCK_ROWS):
@@ -509,7 +520,7 @@ class MiniNumpreGenerator:
         
         # ブロック列をシャッフル
         block_col_groups = list(range(self.N // self.BLOCK_COLS))
-        random.shuffle(block_col_groups)
+        rng.shuffle(block_col_groups)
         copy_sol = [row[:] for row in self.solution]
         for r in range(self.N):
             for tb, sb in enumerate(block_col_groups):
@@ -545,7 +556,7 @@ class MiniNumpreGenerator:
         
         # セルリストをシャッフル
         cells = [(r, c) for r in range(self.N) for c in range(self.N)]
-        random.shuffle(cells)
+        rng.shuffle(cells)
         
         for r, c in cells:
             if filled <= target_hints:
@@ -598,9 +609,9 @@ class MiniNumpreGenerator:
         return sum(1 for r in range(self.N) for c in range(self.N) if self.puzzle[r][c] != 0)
 
 
-def generate_svg(grid, solution, show_answer=False, cell_size=50):
+def render(grid, solution, show_answer=False, cell_size=50, backend='svg'):
     """
-    SVG文字列を生成
+    問題・解答を描画（backend: 'svg'=SVG文字列, 'drawing'=ReportLabのDrawing）
     - 背景色なし
     - 太い罫線（ブロック境界・外枠）はBlack
     - 細い罫線（セル境界）はグレー
@@ -614,39 +625,25 @@ def generate_svg(grid, solution, show_answer=False, cell_size=50):
     H = cell_size * N
     
     # フォント設定（cryptarithm_generator.pyと統一）
-    font_family = "DejaVu Sans, Liberation Sans, Noto Sans, sans-serif"
     font_size = 36  # cryptarithm_generator.pyと同じ固定値
     
-    svg_parts = []
-    svg_parts.append(f'<svg xmlns="http://www.w3.org/2000/svg" width="{W}" height="{H}" viewBox="0 0 {W} {H}">')
-    
-    # CSSスタイル（cryptarithm_generator.pyと同じ方式）
-    svg_parts.append('<style>')
-    svg_parts.append(f'  .digit {{ font-family: {font_family}; font-size: {font_size}px; fill: black; }}')
-    svg_parts.append(f'  .digit-answer {{ font-family: {font_family}; font-size: {font_size}px; fill: #666666; }}')
-    svg_parts.append('</style>')
+    out = create_backend(backend, W, H)
     
     # グリッド線
-    svg_parts.append('<g>')
-    
     for i in range(N + 1):
         # 横線
         is_thick = (i == 0 or i == N or i % BLOCK_ROWS == 0)
         stroke_width = 3 if is_thick else 1
         stroke_color = "black" if is_thick else "#999999"
-        svg_parts.append(f'<line x1="0" y1="{i * cell_size}" x2="{W}" y2="{i * cell_size}" stroke="{stroke_color}" stroke-width="{stroke_width}"/>')
+        out.line(0, i * cell_size, W, i * cell_size, stroke_color, stroke_width)
         
         # 縦線
         is_thick = (i == 0 or i == N or i % BLOCK_COLS == 0)
         stroke_width = 3 if is_thick else 1
         stroke_color = "black" if is_thick else "#999999"
-        svg_parts.append(f'<line x1="{i * cell_size}" y1="0" x2="{i * cell_size}" y2="{H}" stroke="{stroke_color}" stroke-width="{stroke_width}"/>')
-    
-    svg_parts.append('</g>')
+        out.line(i * cell_size, 0, i * cell_size, H, stroke_color, stroke_width)
     
     # 数字
-    svg_parts.append('<g>')
-    
     for r in range(N):
         for c in range(N):
             val = grid[r][c]
@@ -658,19 +655,17 @@ def generate_svg(grid, solution, show_answer=False, cell_size=50):
             
             if val != 0:
                 # ヒント数字
-                svg_parts.append(
-                    f'<text x="{x}" y="{y}" class="digit" text-anchor="middle">{val}</text>'
-                )
+                out.text(x, y, val, font_size, anchor='middle')
             elif show_answer and sol_val != 0:
                 # 解答数字（グレーで表示して区別）
-                svg_parts.append(
-                    f'<text x="{x}" y="{y}" class="digit-answer" text-anchor="middle">{sol_val}</text>'
-                )
+                out.text(x, y, sol_val, font_size, fill='#666666', anchor='middle')
     
-    svg_parts.append('</g>')
-    svg_parts.append('</svg>')
-    
-    return '\n'.join(svg_parts)
+    return out.result()
+
+
+def generate_svg(grid, solution, show_answer=False, cell_size=50):
+    """SVG文字列を生成"""
+    return render(grid, solution, show_answer, cell_size, backend='svg')
 
 
 def get_symmetry_by_date(d=None):
@@ -686,13 +681,22 @@ def get_symmetry_by_date(d=None):
     return symmetry_types[index]
 
 
-def main():
-    """メイン処理"""
-    date_str = get_date_prefix()
+def generate(date_prefix, seed=None, backend='svg'):
+    """
+    パズルを生成して問題・解答を返す（puzzle_layout.pyから直接呼び出す）
+    
+    Returns:
+        {'problem': 問題, 'answer': 解答, 'stats': 試行回数などのカウンター}（backend='svg'ならSVG文字列、'drawing'ならDrawing）
+    """
+    # 日付・パズル種別・生成器バージョンから乱数を初期化（同じ日付なら同じ問題になる）
+    if seed is None:
+        seed = date_seed(date_prefix, PUZZLE_TYPE, GENERATOR_VERSION)
+    rng.seed(seed)
+    stats.clear()
     
     # 対称性を日付から決定（dateオブジェクトが必要なのでパース）
     try:
-        today = date(int(date_str[:4]), int(date_str[4:6]), int(date_str[6:8]))
+        today = date(int(date_prefix[:4]), int(date_prefix[4:6]), int(date_prefix[6:8]))
     except:
         today = date.today()
     
@@ -700,9 +704,9 @@ def main():
     symmetry = get_symmetry_by_date(today)
     
     # ヒント数を10〜12の範囲でランダムに選択
-    target_hints = random.randint(10, 12)
+    target_hints = rng.randint(10, 12)
     
-    print(f"日付: {date_str}")
+    print(f"日付: {date_prefix}")
     print(f"対称性: {symmetry}")
     print(f"目標ヒント数: {target_hints}")
     print("パズル生成中...")
@@ -712,8 +716,7 @@ def main():
     success = generator.generate(target_hints, symmetry)
     
     if not success:
-        print("エラー: パズル生成に失敗しました。再度実行してください。")
-        return
+        raise Exception("パズル生成に失敗しました。再度実行してください。")
     
     actual_hints = generator.get_hint_count()
     print(f"実際のヒント数: {actual_hints}")
@@ -723,27 +726,10 @@ def main():
     solved, _, techniques = solver.solve_logically(generator.puzzle)
     
     if not solved:
-        print("エラー: 生成されたパズルが論理的に解けません。再度実行してください。")
-        return
+        raise Exception("生成されたパズルが論理的に解けません。再度実行してください。")
     
     print(f"使用される解法技法: {', '.join(techniques)}")
     
-    # SVG生成
-    puzzle_svg = generate_svg(generator.puzzle, generator.solution, show_answer=False)
-    answer_svg = generate_svg(generator.puzzle, generator.solution, show_answer=True)
-    
-    # ファイル出力
-    puzzle_filename = f"{date_str}_mininumpre.svg"
-    answer_filename = f"{date_str}_mininumpre_ans.svg"
-    
-    with open(puzzle_filename, 'w', encoding='utf-8') as f:
-        f.write(puzzle_svg)
-    print(f"問題ファイル生成: {puzzle_filename}")
-    
-    with open(answer_filename, 'w', encoding='utf-8') as f:
-        f.write(answer_svg)
-    print(f"解答ファイル生成: {answer_filename}")
-    
     # パズルのテキスト表示
     print("\n--- 生成されたパズル ---")
     for r in range(6):
@@ -767,6 +753,36 @@ def main():
         print(row_str)
         if r == 1 or r == 3:
             print("---+---")
+    
+    # 描画
+    return {
+        'problem': render(generator.puzzle, generator.solution, show_answer=False, backend=backend),
+        'answer': render(generator.puzzle, generator.solution, show_answer=True, backend=backend),
+        'stats': dict(stats),
+    }
+
+
+def main():
+    """メイン処理"""
+    date_str = get_date_prefix()
+    
+    try:
+        svgs = generate(date_str)
+    except Exception as e:
+        print(f"エラー: {e}")
+        return
+    
+    # ファイル出力
+    puzzle_filename = f"{date_str}_mininumpre.svg"
+    answer_filename = f"{date_str}_mininumpre_ans.svg"
+    
+    with open(puzzle_filename, 'w', encoding='utf-8') as f:
+        f.write(svgs['problem'])
+    print(f"問題ファイル生成: {puzzle_filename}")
+    
+    with open(answer_filename, 'w', encoding='utf-8') as f:
+        f.write(svgs['answer'])
+    print(f"解答ファイル生成: {answer_filename}")
 
 
 if __name__ == '__main__':
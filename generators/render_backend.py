@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+パズル描画のバックエンド
+
+各生成スクリプトは同じ描画命令（左上原点・y軸下向きのSVG座標系）を
+バックエンドに渡し、出力形式はバックエンドが決める。
+
+- SVGBackend     : SVG文字列を組み立てる（Web出力・単体実行用）
+- DrawingBackend : ReportLabのDrawingを直接組み立てる（PDF出力用）
+                   SVG文字列の生成とsvglibによる解析・CSS/色解決を省略できる
+
+DrawingBackendはsvglibがSVGを変換した結果と同じ構造
+（px→pt変換とy軸反転を持つルートGroup）を作るため、PDF上の見た目は変わらない。
+
+必要モジュール: SVGBackendは標準ライブラリのみ、DrawingBackendはreportlab
+"""
+
+import re
+
+# 出力形式の一覧
+BACKENDS = ('svg', 'drawing')
+
+FONT_FAMILY = "DejaVu Sans, Liberation Sans, Noto Sans, sans-serif"
+
+# SVGのpx → PDFのpt（svglibと同じ換算）
+PX_TO_PT = 0.75
+
+
+def create_backend(backend, width, height, **kwargs):
+    """バックエンド名（'svg' / 'drawing'）から描画先を作成"""
+    if backend == 'svg':
+        return SVGBackend(width, height, **kwargs)
+    elif backend == 'drawing':
+        return DrawingBackend(width, height, **kwargs)
+    raise ValueError(f"未対応のバックエンドです: {backend}")
+
+
+def _escape(text):
+    """SVGテキスト用のエスケープ"""
+    return str(text).replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+# ============================================================
+# SVGバックエンド
+# ============================================================
+class SVGBackend:
+    """SVG文字列を組み立てるバックエンド"""
+
+    def __init__(self, width, height, root_attrs=''):
+        self.width = width
+        self.height = height
+        attrs = f' {root_attrs}' if root_attrs else ''
+        self.parts = [
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+            f'viewBox="0 0 {width} {height}"{attrs}>'
+        ]
+
+    def _paint(self, fill, stroke, stroke_width):
+        attrs = f' fill="{fill if fill else "none"}"'
+        if stroke:
+            attrs += f' stroke="{stroke}" stroke-width="{stroke_width}"'
+        return attrs
+
+    def line(self, x1, y1, x2, y2, stroke='black', stroke_width=1):
+        self.parts.append(
+            f'<line x1="{x1}" y1="{y1}" x2="{x2}" y2="{y2}" stroke="{stroke}" stroke-width="{stroke_width}"/>'
+        )
+
+    def rect(self, x, y, width, height, fill='black', stroke=None, stroke_width=1, rx=0, rotate=None):
+        """矩形（rotate=(角度, cx, cy) で中心回転）"""
+        radius = f' rx="{rx}"' if rx else ''
+        transform = f' transform="rotate({rotate[0]} {rotate[1]} {rotate[2]})"' if rotate else ''
+        self.parts.append(
+            f'<rect x="{x}" y="{y}" width="{width}" height="{height}"{radius}'
+            f'{self._paint(fill, stroke, stroke_width)}{transform}/>'
+        )
+
+    def circle(self, cx, cy, r, fill='black', stroke=None, stroke_width=1):
+        self.parts.append(f'<circle cx="{cx}" cy="{cy}" r="{r}"{self._paint(fill, stroke, stroke_width)}/>')
+
+    def polygon(self, points, fill='black', stroke=None, stroke_width=1):
+        pts = ' '.join(f"{x},{y}" for x, y in points)
+        self.parts.append(f'<polygon points="{pts}"{self._paint(fill, stroke, stroke_width)}/>')
+
+    def path(self, d, fill='black', stroke=None, stroke_width=1, transform=None, round_joins=False):
+        """パス（transform は6要素のアフィン行列）"""
+        attrs = self._paint(fill, stroke, stroke_width)
+        if round_joins:
+            attrs += ' stroke-linecap="round" stroke-linejoin="round"'
+        if transform:
+            attrs += f' transform="matrix({" ".join(str(v) for v in transform)})"'
+        self.parts.append(f'<path d="{d}"{attrs}/>')
+
+    def text(self, x, y, text, font_size, fill='black', anchor='start', bold=False,
+             middle_baseline=False, dy=0):
+        """テキスト（(x, y)はベースライン位置）"""
+        attrs = f' font-family="{FONT_FAMILY}" font-size="{font_size}" fill="{fill}"'
+        if anchor != 'start':
+            attrs += f' text-anchor="{anchor}"'
+        if bold:
+            attrs += ' font-weight="bold"'
+        if middle_baseline:
+            attrs += ' dominant-baseline="middle"'
+        if dy:
+            attrs += f' dy="{dy:g}"'
+        self.parts.append(f'<text x="{x}" y="{y}"{attrs}>{_escape(text)}</text>')
+
+    def result(self):
+        return '\n'.join(self.parts + ['</svg>'])
+
+
+# ============================================================
+# ReportLab Drawingバックエンド
+# ============================================================
+_PATH_TOKEN = re.compile(r'[MLHVQCZ]|-?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?', re.IGNORECASE)
+
+
+def parse_path(d):
+    """
+    SVGパスのd属性を (コマンド, 座標リスト) のリストに変換
+    生成スクリプトが使う絶対座標コマンド M/L/H/V/Q/C/Z のみ対応
+    """
+    arity = {'M': 2, 'L': 2, 'H': 1, 'V': 1, 'Q': 4, 'C': 6, 'Z': 0}
+    commands = []
+    command = None
+    args = []
+
+    def flush():
+        if command is None:
+            return
+        n = arity[command]
+        if n == 0:
+            commands.append((command, []))
+            return
+        if not args or len(args) % n:
+            raise ValueError(f"パスの座標数が不正です: {command} {args}")
+        for i in range(0, len(args), n):
+            # M の後に続く座標は暗黙の L
+            op = 'L' if command == 'M' and i > 0 else command
+            commands.append((op, args[i:i + n]))
+
+    for token in _PATH_TOKEN.findall(d):
+        if token.isalpha():
+            if token not in arity:
+                raise ValueError(f"未対応のパスコマンドです: {token}")
+            flush()
+            command = token
+            args = []
+        else:
+            args.append(float(token))
+    flush()
+    return commands
+
+
+class DrawingBackend:
+    """ReportLabのDrawingを直接組み立てるバックエンド"""
+
+    def __init__(self, width, height, root_attrs=''):
+        from reportlab.graphics import shapes
+        from reportlab.lib import colors
+        from reportlab.pdfbase import pdfmetrics
+
+        self.shapes = shapes
+        self.colors = colors
+        self.width = width
+        self.height = height
+        self.drawing = shapes.Drawing(width * PX_TO_PT, height * PX_TO_PT)
+        # svglibと同じく、px→pt換算とy軸反転をルートGroupで行う
+        self.root = shapes.Group(transform=(PX_TO_PT, 0, 0, -PX_TO_PT, 0, height * PX_TO_PT))
+        self.drawing.add(self.root)
+
+        # puzzle_layout.pyでDejaVu Sansが登録されていればヘッダーと同じフォントを使う
+        # （太字が無い場合は puzzle_layout.py と同じく通常体で代用し、Helveticaを混ぜない）
+        registered = pdfmetrics.getRegisteredFontNames()
+        if 'DejaVuSans' in registered:
+            self.font_regular = 'DejaVuSans'
+            self.font_bold = 'DejaVuSans-Bold' if 'DejaVuSans-Bold' in registered else 'DejaVuSans'
+        else:
+            self.font_regular, self.font_bold = 'Helvetica', 'Helvetica-Bold'
+
+    def _color(self, value):
+        if not value or value == 'none':
+            return None
+        try:
+            return self.colors.toColor(value)
+        except ValueError:
+            # reportlabに無いCSS色名（lightgray など）
+            css_grays = {'lightgray': '#D3D3D3', 'lightgrey': '#D3D3D3',
+                         'darkgray': '#A9A9A9', 'darkgrey': '#A9A9A9'}
+            return self.colors.HexColor(css_grays[value.lower()])
+
+    def _paint(self, shape, fill, stroke, stroke_width):
+        shape.fillColor = self._color(fill)
+        shape.strokeColor = self._color(stroke)
+        shape.strokeWidth = stroke_width
+        if hasattr(shape, 'fillMode'):
+            shape.fillMode = 1  # nonzero（SVGの既定）
+        return shape
+
+    def line(self, x1, y1, x2, y2, stroke='black', stroke_width=1):
+        self.root.add(self.shapes.Line(
+            x1, y1, x2, y2, strokeColor=self._color(stroke), strokeWidth=stroke_width
+        ))
+
+    def rect(self, x, y, width, height, fill='black', stroke=None, stroke_width=1, rx=0, rotate=None):
+        shape = self._paint(self.shapes.Rect(x, y, width, height, rx=rx, ry=rx), fill, stroke, stroke_width)
+        if rotate:
+            group = self.shapes.Group(shape)
+            angle, cx, cy = rotate
+            group.translate(cx, cy)
+            group.rotate(angle)
+            group.translate(-cx, -cy)
+            self.root.add(group)
+        else:
+            self.root.add(shape)
+
+    def circle(self, cx, cy, r, fill='black', stroke=None, stroke_width=1):
+        self.root.add(self._paint(self.shapes.Circle(cx, cy, r), fill, stroke, stroke_width))
+
+    def polygon(self, points, fill='black', stroke=None, stroke_width=1):
+        flat = [v for point in points for v in point]
+        self.root.add(self._paint(self.shapes.Polygon(flat), fill, stroke, stroke_width))
+
+    def path(self, d, fill='black', stroke=None, stroke_width=1, transform=None, round_joins=False):
+        shape = self._paint(self.shapes.Path(), fill, stroke, stroke_width)
+        if round_joins:
+            shape.strokeLineCap = 1
+            shape.strokeLineJoin = 1
+        x = y = 0
+        for op, args in parse_path(d):
+            if op == 'M':
+                x, y = args
+                shape.moveTo(x, y)
+            elif op == 'L':
+                x, y = args
+                shape.lineTo(x, y)
+            elif op == 'H':
+                x = args[0]
+                shape.lineTo(x, y)
+            elif op == 'V':
+                y = args[0]
+                shape.lineTo(x, y)
+            elif op == 'Q':
+                # 2次ベジェを3次ベジェに変換
+                qx, qy, ex, ey = args
+                shape.curveTo(
+                    x + 2 / 3 * (qx - x), y + 2 / 3 * (qy - y),
+                    ex + 2 / 3 * (qx - ex), ey + 2 / 3 * (qy - ey),
+                    ex, ey,
+                )
+                x, y = ex, ey
+            elif op == 'C':
+                shape.curveTo(*args)
+                x, y = args[4], args[5]
+            else:
+                shape.closePath()
+        if transform:
+            self.root.add(self.shapes.Group(shape, transform=tuple(transform)))
+        else:
+            self.root.add(shape)
+
+    def text(self, x, y, text, font_size, fill='black', anchor='start', bold=False,
+             middle_baseline=False, dy=0):
+        # svglibと同じくdominant-baselineは無視し、ベースライン位置に置く
+        string = self.shapes.String(
+            x, -(y + dy), str(text),
+            fontName=self.font_bold if bold else self.font_regular,
+            fontSize=font_size,
+            fillColor=self._color(fill),
+            textAnchor=anchor,
+        )
+        # y軸反転の中で文字が裏返らないように戻す
+        group = self.shapes.Group(string)
+        group.scale(1, -1)
+        self.root.add(group)
+
+    def result(self):
+        return self.drawing
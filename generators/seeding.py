@@ -0,0 +1,22 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+パズル生成用の乱数シード
+
+各生成モジュールはモジュール直下に次の4つを持つ。
+    PUZZLE_TYPE        パズル種別（シードの計算に使う）
+    GENERATOR_VERSION  生成器のバージョン。生成ロジックを変えて問題が変わる場合は上げること
+    rng                そのモジュール専用の random.Random。generate() で date_seed() から初期化する
+    stats              試行回数などの Counter。generate() でリセットし、結果の 'stats' として返す
+同じ日付・同じバージョンなら何度実行しても同じ問題が生成される。
+
+必要モジュール: Python3標準ライブラリのみ
+"""
+
+import hashlib
+
+
+def date_seed(date_prefix, puzzle_type, version):
+    """日付（YYYYMMDD）・パズル種別・生成器バージョンから64ビットのシードを返す"""
+    key = f"{date_prefix}:{puzzle_type}:{version}".encode('utf-8')
+    return int.from_bytes(hashlib.sha256(key).digest()[:8], 'big')
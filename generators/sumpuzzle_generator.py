@@ -7,6 +7,16 @@ import random
 import sys
 import os
 from datetime import datetime
+from collections import Counter
+
+from render_backend import create_backend
+from seeding import date_seed
+
+# 乱数・カウンター・バージョンの約束は seeding.py を参照
+PUZZLE_TYPE = 'sumpuzzle'
+GENERATOR_VERSION = 1
+rng = random.Random()
+stats = Counter()
 
 def get_date_prefix():
     """日付プレフィックスを取得（引数 > 環境変数 > 今日）"""
@@ -81,6 +91,7 @@ class PuzzleGenerator:
     def generate(self):
         max_attempts = 100
         for attempt in range(max_attempts):
+            stats['attempts'] += 1
             solution = self._create_valid_solution_greedy()
             if solution is None:
                 continue
@@ -91,7 +102,7 @@ class PuzzleGenerator:
     
     def _create_valid_solution_greedy(self):
         solution = [[False] * self.size for _ in range(self.size)]
-        row_targets = [random.randint(self.min_per_line, self.max_per_line) for _ in range(self.size)]
+        row_targets = [rng.randint(self.min_per_line, self.max_per_line) for _ in range(self.size)]
         total_to_select = sum(row_targets)
         
         col_targets = []
@@ -101,7 +112,7 @@ class PuzzleGenerator:
             max_possible = min(self.max_per_line, remaining - (self.size - j - 1) * self.min_per_line)
             if min_possible > max_possible:
                 return None
-            count = random.randint(min_possible, max_possible)
+            count = rng.randint(min_possible, max_possible)
             col_targets.append(count)
             remaining -= count
         col_targets.append(remaining)
@@ -115,7 +126,7 @@ class PuzzleGenerator:
             available = [j for j in range(self.size) if col_counts[j] < col_targets[j]]
             if len(available) < needed:
                 return None
-            random.shuffle(available)
+            rng.shuffle(available)
             for k in range(needed):
                 col = available[k]
                 solution[i][col] = True
@@ -128,7 +139,8 @@ class PuzzleGenerator:
     
     def _generate_grid_for_solution(self, solution):
         for attempt in range(30):
-            grid = [[random.randint(1, 9) for _ in range(self.size)] for _ in range(self.size)]
+            stats['grid_attempts'] += 1
+            grid = [[rng.randint(1, 9) for _ in range(self.size)] for _ in range(self.size)]
             row_targets = [sum(grid[i][j] for j in range(self.size) if solution[i][j]) for i in range(self.size)]
             col_targets = [sum(grid[i][j] for i in range(self.size) if solution[i][j]) for j in range(self.size)]
             
@@ -148,36 +160,36 @@ class SVGGenerator:
         self.target_cell_width = 36
         self.target_cell_height = 30
         self.gap = 2
-        self.font_family = "DejaVu Sans, Liberation Sans, Noto Sans, sans-serif"
     
     def generate_puzzle_svg(self):
-        return self._generate_svg(show_answer=False)
+        return self.render(show_answer=False)
     
     def generate_answer_svg(self):
-        return self._generate_svg(show_answer=True)
+        return self.render(show_answer=True)
     
-    def _generate_svg(self, show_answer=False):
+    def render(self, show_answer=False, backend='svg'):
+        """描画（backend: 'svg'=SVG文字列, 'drawing'=ReportLabのDrawing）"""
         grid_width = self.size * self.cell_size + (self.size - 1) * self.gap
         grid_height = grid_width
         spacing = 5
         total_width = self.target_cell_width + spacing + grid_width
         total_height = self.target_cell_height + spacing + grid_height
         
-        svg_parts = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{total_width}" height="{total_height}" viewBox="0 0 {total_width} {total_height}">']
+        out = create_backend(backend, total_width, total_height)
         
         col_start_x = self.target_cell_width + spacing
         for j in range(self.size):
             x = col_start_x + j * (self.cell_size + self.gap)
             text_x = x + self.cell_size / 2
             text_y = self.target_cell_height / 2
-            svg_parts.append(f'<text x="{text_x}" y="{text_y}" font-family="{self.font_family}" font-size="14" fill="black" text-anchor="middle" dy="0.35em">{self.col_targets[j]}</text>')
+            out.text(text_x, text_y, self.col_targets[j], 14, anchor='middle', dy=14 * 0.35)
         
         row_start_y = self.target_cell_height + spacing
         for i in range(self.size):
             y = row_start_y + i * (self.cell_size + self.gap)
             text_x = self.target_cell_width / 2
             text_y = y + self.cell_size / 2
-            svg_parts.append(f'<text x="{text_x}" y="{text_y}" font-family="{self.font_family}" font-size="14" fill="black" text-anchor="middle" dy="0.35em">{self.row_targets[i]}</text>')
+            out.text(text_x, text_y, self.row_targets[i], 14, anchor='middle', dy=14 * 0.35)
         
         grid_start_x = self.target_cell_width + spacing
         grid_start_y = self.target_cell_height + spacing
@@ -186,21 +198,30 @@ class SVGGenerator:
             for j in range(self.size):
                 x = grid_start_x + j * (self.cell_size + self.gap)
                 y = grid_start_y + i * (self.cell_size + self.gap)
-                svg_parts.append(f'<rect x="{x}" y="{y}" width="{self.cell_size}" height="{self.cell_size}" fill="none" stroke="lightgray" stroke-width="1"/>')
+                out.rect(x, y, self.cell_size, self.cell_size, fill=None, stroke='lightgray')
                 
                 text_x = x + self.cell_size / 2
                 text_y = y + self.cell_size / 2
-                svg_parts.append(f'<text x="{text_x}" y="{text_y}" font-family="{self.font_family}" font-size="18" fill="gray" text-anchor="middle" dy="0.35em">{self.grid[i][j]}</text>')
+                out.text(text_x, text_y, self.grid[i][j], 18, fill='gray', anchor='middle', dy=18 * 0.35)
                 
                 if show_answer and self.solution[i][j]:
                     circle_r = self.cell_size / 2 - 4
-                    svg_parts.append(f'<circle cx="{text_x}" cy="{text_y}" r="{circle_r}" fill="none" stroke="black" stroke-width="1"/>')
+                    out.circle(text_x, text_y, circle_r, fill=None, stroke='black')
         
-        svg_parts.append('</svg>')
-        return '\n'.join(svg_parts)
+        return out.result()
 
-def main():
-    today = get_date_prefix()
+def generate(date_prefix, seed=None, backend='svg'):
+    """
+    パズルを生成して問題・解答を返す（puzzle_layout.pyから直接呼び出す）
+
+    Returns:
+        {'problem': 問題, 'answer': 解答, 'stats': 試行回数などのカウンター}（backend='svg'ならSVG文字列、'drawing'ならDrawing）
+    """
+    # 日付・パズル種別・生成器バージョンから乱数を初期化（同じ日付なら同じ問題になる）
+    if seed is None:
+        seed = date_seed(date_prefix, PUZZLE_TYPE, GENERATOR_VERSION)
+    rng.seed(seed)
+    stats.clear()
     
     print("Sum Puzzle Generator (6×6)")
     print("=" * 40)
@@ -224,15 +245,24 @@ def main():
     print()
     
     svg_gen = SVGGenerator(puzzle_data, size=6)
+    return {
+        'problem': svg_gen.render(show_answer=False, backend=backend),
+        'answer': svg_gen.render(show_answer=True, backend=backend),
+        'stats': dict(stats),
+    }
+
+def main():
+    today = get_date_prefix()
+    svgs = generate(today)
     
     puzzle_filename = f"{today}_sumpuzzle.svg"
     with open(puzzle_filename, 'w', encoding='utf-8') as f:
-        f.write(svg_gen.generate_puzzle_svg())
+        f.write(svgs['problem'])
     print(f"問題SVGを保存しました: {puzzle_filename}")
     
     answer_filename = f"{today}_sumpuzzle_ans.svg"
     with open(answer_filename, 'w', encoding='utf-8') as f:
-        f.write(svg_gen.generate_answer_svg())
+        f.write(svgs['answer'])
     print(f"解答SVGを保存しました: {answer_filename}")
     
     print("\n完了!")
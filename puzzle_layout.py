@@ -1,75 +1,163 @@
 #!/usr/bin/env python3
 """
-9種類のパズルSVGを生成し、PDFに配置するスクリプト
-SVGファイル名は実行日付に基づいて YYYYMMDD_xxx.svg の形式
+9種類のパズルを生成し、PDFに配置するスクリプト
+パズルは生成モジュールからReportLabのDrawingとしてメモリ上で受け取り、
+SVG文字列の生成・解析や中間ファイルの作成は行わない
 
 使用方法:
-    パズル生成スクリプト群があるフォルダで実行してください。
-    $ python puzzle_layout.py [YYYYMMDD]
+    出力先のフォルダで実行してください（パズル生成モジュールは generators/ から読み込みます）。
+    $ python puzzle_layout.py [YYYYMMDD] [--jobs N] [--timeout 秒] [--deadline 秒] [--vector-qr]
+    $ python puzzle_layout.py --from YYYYMMDD --to YYYYMMDD [--missing-only] [-o 出力先]
+    $ python puzzle_layout.py --booklet YYYYMMDD:YYYYMMDD [-o 出力先]
+    $ python puzzle_layout.py --make-spares
+    $ python puzzle_layout.py --profile-startup
 
 出力:
     YYYYMMDD_puzzle.pdf（問題用）
     YYYYMMDD_answer.pdf（解答用）
-    ※生成後、SVGファイルは自動削除されます
+    YYYYMMDD_report.json（実行レポート：各段階・各パズルの時間、試行回数、出力サイズ）
 """
 
-from datetime import datetime
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from reportlab.graphics import renderPDF
-import reportlab.lib.colors as rl_colors
-from reportlab.lib.colors import HexColor
-from reportlab.lib.units import mm
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
+from datetime import datetime, timedelta
 import os
 import io
+import re
 import sys
-import subprocess
+import struct
+import importlib
+import hashlib
+import pickle
+import signal
+import threading
+import time
+import json
+import platform
+import argparse
+from collections import Counter
+from contextlib import contextmanager
 from pathlib import Path
 
+# reportlab・svglib・concurrent.futures（multiprocessing）は読み込みに時間がかかるため、
+# 実際に使う関数の中でimportする
+# （日付範囲の確認など、PDFを作らない処理や1プロセスでの生成をすぐに起動できるようにする）
+
+# 単位とページサイズ（reportlab.lib.units.mm / reportlab.lib.pagesizes.A4 と同じ値）
+mm = 72 / 25.4
+A4 = (210 * mm, 297 * mm)
+
+
 # ============================================
 # フォント登録
 # ============================================
-def register_fonts():
-    """DejaVu Sans フォントを登録（存在する場合）"""
-    font_paths = [
+# リポジトリ同梱のフォント（システムのフォントより優先）
+BUNDLED_FONT_DIR = Path(__file__).resolve().parent
+
+FONT_PATHS = {
+    'DejaVuSans': [
+        BUNDLED_FONT_DIR / "DejaVuSans.ttf",
         "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
-        "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
         "/usr/share/fonts/TTF/DejaVuSans.ttf",
+    ],
+    'DejaVuSans-Bold': [
+        BUNDLED_FONT_DIR / "DejaVuSans-Bold.ttf",
+        "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
         "/usr/share/fonts/TTF/DejaVuSans-Bold.ttf",
-    ]
-    
-    registered = False
-    for path in font_paths:
-        if os.path.exists(path):
-            if "Bold" in path:
-                try:
-                    pdfmetrics.registerFont(TTFont('DejaVuSans-Bold', path))
-                except:
-                    pass
-            else:
-                try:
-                    pdfmetrics.registerFont(TTFont('DejaVuSans', path))
-                    registered = True
-                except:
-                    pass
+    ],
+}
+
+# 埋め込むフォントのnameテーブルに残す項目（0:著作権 1:ファミリー名 2:スタイル 3:ID 4:フルネーム
+# 5:バージョン 6:PostScript名、英語のみ）。ライセンス全文などはPDFの表示に使われず、
+# ReportLabはnameテーブルをそのままサブセットにコピーするため、登録前に取り除く
+FONT_NAME_IDS = frozenset(range(7))
+FONT_NAME_LANGUAGES = frozenset([(1, 0), (3, 0x409)])  # (プラットフォーム, 言語): Mac英語, Windows英語
+
+# 使用するフォント名（register_fonts() で決まる）
+FONT_REGULAR = 'Helvetica'
+FONT_BOLD = 'Helvetica-Bold'
+_fonts_registered = False
+
+
+def slim_name_table(data):
+    """nameテーブルを FONT_NAME_IDS・FONT_NAME_LANGUAGES の項目だけにする"""
+    _, count, string_offset = struct.unpack('>HHH', data[:6])
+    records = []
+    strings = b""
+    for i in range(count):
+        platform, encoding, language, name_id, length, offset = struct.unpack(
+            '>6H', data[6 + 12 * i:18 + 12 * i])
+        if name_id not in FONT_NAME_IDS or (platform, language) not in FONT_NAME_LANGUAGES:
+            continue
+        value = data[string_offset + offset:string_offset + offset + length]
+        records.append(struct.pack('>6H', platform, encoding, language, name_id, len(value), len(strings)))
+        strings += value
+    return struct.pack('>HHH', 0, len(records), 6 + 12 * len(records)) + b"".join(records) + strings
+
+
+def slim_font_data(path):
+    """
+    nameテーブルを小さくしたTrueTypeフォントのデータを返す（字形などはそのまま）
+    新しいnameテーブルは元の位置に上書きし、テーブル一覧の長さとチェックサムだけを直す
+    （フォント全体を組み直すより速く、起動時間をほとんど増やさない）
+    """
+    from reportlab.pdfbase.ttfonts import calcChecksum
     
-    return registered
-
+    data = bytearray(Path(path).read_bytes())
+    if data[:4] == b'ttcf':
+        # フォントコレクションはそのまま使う
+        return bytes(data)
+    num_tables = struct.unpack('>H', data[4:6])[0]
+    for i in range(num_tables):
+        entry = 12 + 16 * i
+        tag, _, offset, length = struct.unpack('>4sLLL', data[entry:entry + 16])
+        if tag == b'name':
+            name = slim_name_table(bytes(data[offset:offset + length]))
+            data[offset:offset + len(name)] = name
+            struct.pack_into('>L', data, entry + 4, calcChecksum(name))
+            struct.pack_into('>L', data, entry + 12, len(name))
+            break
+    return bytes(data)
 
-# フォント登録を試みる
-DEJAVU_AVAILABLE = register_fonts()
 
-# 使用するフォント名
-FONT_REGULAR = 'DejaVuSans' if DEJAVU_AVAILABLE else 'Helvetica'
-FONT_BOLD = 'DejaVuSans-Bold' if DEJAVU_AVAILABLE else 'Helvetica-Bold'
+def register_fonts():
+    """
+    DejaVu Sans フォントを登録（存在する場合）
+    最初に呼ばれたときだけ登録し、FONT_REGULAR / FONT_BOLD を決める
+    PDFには実際に使った文字の字形だけを埋め込む（asciiReadable=False: 使わないASCII文字を含めない）
+    """
+    global FONT_REGULAR, FONT_BOLD, _fonts_registered
+    if _fonts_registered:
+        return
+    _fonts_registered = True
+    
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    
+    registered = set()
+    for font_name, paths in FONT_PATHS.items():
+        for path in paths:
+            if not os.path.exists(path):
+                continue
+            try:
+                font_file = io.BytesIO(slim_font_data(path))
+                pdfmetrics.registerFont(TTFont(font_name, font_file, asciiReadable=False))
+            except Exception:
+                continue
+            registered.add(font_name)
+            break
+    
+    if 'DejaVuSans' in registered:
+        FONT_REGULAR = 'DejaVuSans'
+        # 太字が無い場合もπなどの文字が出るように通常体で代用する
+        FONT_BOLD = 'DejaVuSans-Bold' if 'DejaVuSans-Bold' in registered else 'DejaVuSans'
 
 
 # ============================================
 # svglibがサポートしていない色名を事前登録
 # ============================================
 def register_custom_colors():
+    import reportlab.lib.colors as rl_colors
+    from reportlab.lib.colors import HexColor
+    
     custom_colors = {
         'lightgray': '#D3D3D3',
         'lightgrey': '#D3D3D3',
@@ -90,86 +178,757 @@ def register_custom_colors():
             setattr(rl_colors, name, HexColor(hex_value))
 
 
-register_custom_colors()
+def load_svglib():
+    """svglibを読み込んでsvg2rlgを返す（SVG文字列を扱うときだけ必要）"""
+    register_custom_colors()
+    from svglib.svglib import svg2rlg
+    return svg2rlg
 
-from svglib.svglib import svg2rlg
+
+# ============================================
+# パズル生成モジュールのレジストリ
+# ============================================
+# generators/ 以下の各モジュールは generate(date_prefix, seed=None, backend='svg') を公開し、
+# {'problem': 問題, 'answer': 解答} を返す
+# backend='svg' ならSVG文字列（Web出力用）、'drawing' ならReportLabのDrawing（PDF用）
+# seed を省略すると日付・パズル種別・生成器バージョンから決まり、同じ日付は同じ問題になる
+GENERATORS_DIR = Path(__file__).resolve().parent / "generators"
+
+GENERATORS = {
+    'building': "building_puzzle_svg",
+    'calcpuzzle': "calcpuzzle_generator",
+    'countdown': "countdown_generator",
+    'cryptarithm': "cryptarithm_generator",
+    'kenken': "kenken_svg_generator",
+    'matchstick': "matchstick_puzzle_generator",
+    'maze': "maze_generator",
+    'mininumpre': "mininumpre_generator",
+    'sumpuzzle': "sumpuzzle_generator",
+}
+
+
+def load_generator(name):
+    """パズル名から生成モジュールをインポートして返す"""
+    if str(GENERATORS_DIR) not in sys.path:
+        sys.path.insert(0, str(GENERATORS_DIR))
+    return importlib.import_module(GENERATORS[name])
 
 
 # ============================================
-# SVG生成スクリプトの実行
+# 生成結果のキャッシュ
 # ============================================
-def generate_svg_files(working_dir, date_prefix=None):
+# 生成結果は (日付, パズル種別, 生成モジュールのソースのハッシュ) で決まるため、
+# ディスクに保存して再利用する。生成モジュールを変更するとハッシュが変わり自動的に再生成される
+CACHE_DIR = Path(__file__).resolve().parent / ".cache" / "puzzles"
+
+# 全生成モジュールが共通で使うモジュール（変更されたら全パズルを再生成）
+SHARED_GENERATOR_MODULES = ["render_backend", "seeding"]
+
+_source_hashes = {}
+
+
+def generator_source_hash(name):
+    """生成モジュールと共通モジュールのソースからハッシュを求める"""
+    if name not in _source_hashes:
+        digest = hashlib.sha256()
+        for module in [GENERATORS[name]] + SHARED_GENERATOR_MODULES:
+            digest.update((GENERATORS_DIR / f"{module}.py").read_bytes())
+        _source_hashes[name] = digest.hexdigest()[:16]
+    return _source_hashes[name]
+
+
+def cache_path(name, date_prefix, seed=None, backend='drawing'):
+    """キャッシュファイルのパス（.cache/puzzles/パズル名/日付_[シード_]出力形式_ハッシュ.pickle）"""
+    seed_part = f"seed{seed}_" if seed is not None else ""
+    filename = f"{date_prefix}_{seed_part}{backend}_{generator_source_hash(name)}.pickle"
+    return CACHE_DIR / name / filename
+
+
+def load_cached(name, date_prefix, seed=None, backend='drawing'):
+    """キャッシュがあれば生成結果を返す（無い・壊れている場合はNone）"""
+    path = cache_path(name, date_prefix, seed, backend)
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Warning: ignoring broken cache {path}: {e}")
+        return None
+
+
+def load_latest_cached(name, date_prefix, backend='drawing'):
     """
-    各パズル生成スクリプトを実行してSVGファイルを生成
-    日付を引数と環境変数の両方で渡す
+    同じ生成モジュールのソースで作られたキャッシュのうち、date_prefixより前で最も新しい日付のものを返す
+    （前の日付が無ければ最も新しいもの）。期限に間に合わなかったパズルの代わりに使う
+
+    戻り値: (日付, 生成結果)、キャッシュが無ければ (None, None)
     """
-    scripts = [
-        "building_puzzle_svg.py",
-        "calcpuzzle_generator.py",
-        "countdown_generator.py",
-        "cryptarithm_generator.py",
-        "kenken_svg_generator.py",
-        "matchstick_puzzle_generator.py",
-        "maze_generator.py",
-        "mininumpre_generator.py",
-        "sumpuzzle_generator.py",
-    ]
+    suffix = f"_{backend}_{generator_source_hash(name)}.pickle"
+    dates = sorted(
+        path.name[:8] for path in (CACHE_DIR / name).glob(f"*{suffix}")
+        if path.name == path.name[:8] + suffix and path.name[:8] != date_prefix
+    )
+    earlier = [d for d in dates if d < date_prefix]
+    for cached_date in reversed(earlier or dates):
+        artifact = load_cached(name, cached_date, backend=backend)
+        if artifact is not None:
+            return cached_date, artifact
+    return None, None
+
+
+def store_cached(name, date_prefix, artifact, seed=None, backend='drawing'):
+    """生成結果をキャッシュに保存（書き込み途中のファイルが読まれないよう一時ファイル経由）"""
+    path = cache_path(name, date_prefix, seed, backend)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(artifact, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+# ============================================
+# 日付ごとのチェックポイント（中断・失敗した実行の再開）
+# ============================================
+# 完了したパズルはキャッシュに保存されるため、再実行すると未完了・失敗したパズルだけを生成して組版し直す。
+# マニフェストには日付ごとに各パズルの状態・試行回数とキャッシュファイルのハッシュを記録し、
+# 再開するときに完了済みの生成結果が壊れていないかを確かめる
+MANIFEST_DIR = CACHE_DIR.parent / "manifests"
+
+# 失敗したパズルを1回の実行の中で作り直す回数
+DEFAULT_GENERATOR_RETRIES = 1
+
+
+def manifest_path(date_prefix):
+    """マニフェストのパス（.cache/manifests/日付.json）"""
+    return MANIFEST_DIR / f"{date_prefix}.json"
+
+
+def file_sha256(path):
+    """ファイルのSHA-256（16進）"""
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def load_manifest(date_prefix):
+    """日付のマニフェストを返す（無い・壊れている場合はNone）"""
+    path = manifest_path(date_prefix)
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"Warning: ignoring broken manifest {path}: {e}")
+        return None
+
+
+def write_manifest(date_prefix, results, outputs=()):
+    """
+    generate_svgs() の結果と出力ファイルのハッシュをマニフェストに書き出す
+    outputs: 作成したファイルのパス（PDFなど。組版まで終わった場合に指定する）
+    """
+    generators = {}
+    for name, r in results.items():
+        entry = {'status': r['status'], 'attempts': r.get('attempts', 0), 'error': r['error'],
+                 'source_hash': generator_source_hash(name)}
+        path = cache_path(name, date_prefix)
+        if r['status'] == 'ok' and path.exists():
+            entry['cache'] = path.name
+            entry['sha256'] = file_sha256(path)
+        generators[name] = entry
+    manifest = {
+        'date': date_prefix,
+        'updated_at': datetime.now().isoformat(timespec='seconds'),
+        'complete': all(r['status'] == 'ok' for r in results.values()),
+        'generators': generators,
+        'outputs': {os.path.basename(path): file_sha256(path) for path in outputs},
+    }
+    path = manifest_path(date_prefix)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def resume_checkpoint(date_prefix):
+    """
+    前回の実行のマニフェストがあれば、完了済み・作り直すパズルを表示する
+    完了済みのパズルのキャッシュがマニフェストのハッシュと一致しない場合は、
+    そのキャッシュを削除して作り直させる（書き込み途中で止まった・壊れたファイル）
+
+    戻り値: 前回完了していたパズル名のリスト（マニフェストが無ければNone）
+    """
+    manifest = load_manifest(date_prefix)
+    if manifest is None:
+        return None
+    done = []
+    for name, entry in manifest['generators'].items():
+        if name not in GENERATORS or entry['status'] != 'ok':
+            continue
+        # 生成モジュールが変わった場合はキャッシュのファイル名も変わり、自動的に作り直される
+        if entry['source_hash'] != generator_source_hash(name):
+            continue
+        path = cache_path(name, date_prefix)
+        if path.exists() and file_sha256(path) != entry.get('sha256'):
+            print(f"Warning: cache of {name} does not match the checkpoint, regenerating")
+            path.unlink()
+            continue
+        done.append(name)
+    redo = [name for name in GENERATORS if name not in done]
+    print(f"Resuming {date_prefix} from checkpoint: {len(done)}/{len(GENERATORS)} puzzles complete" +
+          (f", generating {', '.join(redo)}" if redo else ""))
+    return done
+
+
+# ============================================
+# 時間の計測
+# ============================================
+@contextmanager
+def timed(timings=None, key=None):
+    """
+    withブロックの経過時間とCPU時間（このプロセス分）を計測する
+    yieldする辞書 {'wall': 秒, 'cpu': 秒} はブロックを抜けた時点で埋まる
+    timingsを指定すると timings[key] にも記録する（Noneなら記録しない）
+    """
+    timing = {}
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        yield timing
+    finally:
+        timing['wall'] = time.perf_counter() - wall_start
+        timing['cpu'] = time.process_time() - cpu_start
+        if timings is not None:
+            timings[key] = timing
+
+
+# ============================================
+# SVG生成
+# ============================================
+# 1パズルあたりの生成制限時間（秒）
+DEFAULT_GENERATOR_TIMEOUT = 300
+
+
+# 生成の制限時間に加えて待つ、ワーカーの起動・モジュールの読み込みの余裕（秒）
+WORKER_STARTUP_SLACK = 30
+
+# ワーカーの応答を確かめる間隔（秒）
+WORKER_POLL_INTERVAL = 1.0
+
+
+class GeneratorTimeout(Exception):
+    """パズル生成が制限時間を超えた"""
+
+
+def terminate_workers(executor):
+    """応答しないワーカーがあるプロセスプールを、ワーカーを強制終了して待たずに閉じる"""
+    for process in list(getattr(executor, '_processes', {}).values()):
+        process.terminate()
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def run_generator(name, date_prefix, seed=None, timeout=None, backend='drawing'):
+    """
+    1種類のパズルを生成して {'problem', 'answer'} を返す
+    backend='drawing' の場合はSVGを経由せずDrawingを直接受け取る
+    timeout秒を超えた場合は GeneratorTimeout を送出して打ち切る
+    （ProcessPoolExecutorのワーカーからも呼び出される）
+    生成にかかった時間は結果の 'timing'（{'wall': 秒, 'cpu': 秒}）に入れて返す
+    """
+    use_alarm = (
+        timeout and hasattr(signal, 'SIGALRM') and
+        threading.current_thread() is threading.main_thread()
+    )
+    if use_alarm:
+        def on_timeout(signum, frame):
+            raise GeneratorTimeout(f"{timeout:g}秒以内に生成できませんでした")
+        previous_handler = signal.signal(signal.SIGALRM, on_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        if backend == 'drawing':
+            # Drawing内の文字にヘッダーと同じフォントを使うため、ワーカーでも先に登録しておく
+            register_fonts()
+        with timed() as timing:
+            artifact = load_generator(name).generate(date_prefix, seed=seed, backend=backend)
+        artifact['timing'] = timing
+        return artifact
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous_handler)
+
+
+def generate_svgs(date_prefix=None, seed=None, jobs=1, timeout=DEFAULT_GENERATOR_TIMEOUT,
+                  backend='drawing', use_cache=True, executor=None, retries=0):
+    """
+    各パズル生成モジュールを呼び出してパズルをメモリ上に生成
+    jobs > 1 の場合はプロセスプールで並列に実行する
+    executor: 指定するとそのプロセスプールで実行する（呼び出し側が所有し、終了もしない）
+    backend: 'drawing'=ReportLabのDrawing（PDF用）, 'svg'=SVG文字列
+    use_cache: キャッシュにあるパズルは生成せずに再利用し、新たに生成したものは保存する
+    retries: 失敗したパズルだけを同じシードで作り直す回数（ワーカーの異常終了など、一時的な失敗を想定）
+             タイムアウトは作り直さない（同じシードでは同じ探索になり、また時間切れになるため）
+
+    戻り値: (svgs, results)
+        svgs: パズル名 -> {'problem': 問題, 'answer': 解答}（成功したもののみ）
+        results: パズル名 -> {'status': 'ok'|'error'|'timeout', 'elapsed': 秒, 'error': メッセージ,
+                             'cached': キャッシュから読み込んだか,
+                             'timing': {'wall': 秒, 'cpu': 秒}（生成またはキャッシュ読み込みの時間）,
+                             'stats': 生成モジュールの試行回数などのカウンター,
+                             'attempts': 生成を試みた回数（キャッシュから読み込んだ場合は0）}
+    """
+    if date_prefix is None:
+        date_prefix = get_date_prefix()
     
-    base_dir = Path(working_dir)
+    svgs = {}
+    results = {}
+    attempts = Counter()
+    start = time.perf_counter()
     
-    # 環境変数で日付を渡す（サブプログラムが対応している場合）
-    env = os.environ.copy()
-    if date_prefix:
-        env['PUZZLE_DATE'] = date_prefix
+    def record(name, artifact=None, error=None, cached=False, timing=None):
+        elapsed = time.perf_counter() - start
+        if error is None:
+            # 計測時間はキャッシュに入れない（キャッシュから読んだ場合は読み込み時間を記録する）
+            timing = artifact.pop('timing', timing)
+            svgs[name] = artifact
+            results[name] = {'status': 'ok', 'elapsed': elapsed, 'error': None, 'cached': cached,
+                             'timing': timing, 'stats': artifact.get('stats', {}),
+                             'attempts': attempts[name]}
+            if use_cache and not cached:
+                store_cached(name, date_prefix, artifact, seed, backend)
+            return
+        status = 'timeout' if isinstance(error, GeneratorTimeout) else 'error'
+        results[name] = {'status': status, 'elapsed': elapsed, 'error': str(error), 'cached': False,
+                         'timing': None, 'stats': {}, 'attempts': attempts[name]}
+        # 最初の失敗はその場で報告する
+        if sum(1 for r in results.values() if r['status'] != 'ok') == 1:
+            print(f"Error generating {name} ({status}): {error}")
     
-    for script in scripts:
-        script_path = base_dir / script
-        if script_path.exists():
-            print(f"=== Running {script} ===")
+    if use_cache:
+        for name in GENERATORS:
+            with timed() as timing:
+                artifact = load_cached(name, date_prefix, seed, backend)
+            if artifact is not None:
+                record(name, artifact, cached=True, timing=timing)
+    names = [name for name in GENERATORS if name not in results]
+    
+    for attempt in range(retries + 1):
+        if not names:
+            break
+        if attempt:
+            print(f"=== Retrying {', '.join(names)} ({attempt}/{retries}) ===")
+        attempts.update(names)
+        _run_generators(names, record, date_prefix, seed, jobs, timeout, backend, executor)
+        names = [name for name in names if results[name]['status'] == 'error']
+    
+    print("All SVG generation finished.")
+    return svgs, {name: results[name] for name in GENERATORS}
+
+
+def _run_generators(names, record, date_prefix, seed, jobs, timeout, backend, executor):
+    """generate_svgs() の1回分の生成。パズルごとに record(名前, 生成結果) または record(名前, error=例外) を呼ぶ"""
+    if executor is None and jobs <= 1:
+        for name in names:
+            print(f"=== Generating {name} ===")
             try:
-                # 日付を引数として渡す
-                cmd = [sys.executable, str(script_path)]
-                if date_prefix:
-                    cmd.append(date_prefix)
-                
-                result = subprocess.run(
-                    cmd,
-                    cwd=str(base_dir),
-                    env=env,
-                    check=True
-                )
-            except subprocess.CalledProcessError as e:
-                print(f"Error running {script}: {e}")
+                artifact = run_generator(name, date_prefix, seed=seed, timeout=timeout, backend=backend)
+            except Exception as e:
+                record(name, error=e)
+            else:
+                record(name, artifact)
+    else:
+        from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+        
+        own_executor = executor is None
+        if own_executor:
+            print(f"=== Generating {len(names)} puzzles with {jobs} workers ===")
+            executor = ProcessPoolExecutor(max_workers=jobs)
+        futures = {
+            executor.submit(run_generator, name, date_prefix, seed, timeout, backend): name
+            for name in names
+        }
+        # ワーカー側のタイマーが効かなかった場合の保険として、実行が始まった時点から
+        # timeout + WORKER_STARTUP_SLACK 秒で打ち切る（ワーカーの起動・読み込みの時間は含めない）
+        # ProcessPoolExecutorはワーカー数より1つ多く先に渡して running にするため、
+        # 投入順で先頭のワーカー数個だけを実行中とみなす
+        max_workers = getattr(executor, '_max_workers', jobs)
+        started = {}
+        pending = set(futures)
+        unresponsive = False
+        try:
+            while pending:
+                now = time.monotonic()
+                running = [future for future in futures if future in pending and future.running()]
+                for future in running[:max_workers]:
+                    started.setdefault(future, now)
+                if timeout is not None:
+                    limit = timeout + WORKER_STARTUP_SLACK
+                    for future in [f for f in pending if f in started and now - started[f] > limit]:
+                        pending.discard(future)
+                        future.cancel()
+                        unresponsive = True
+                        record(futures[future], error=GeneratorTimeout("ワーカーが応答しませんでした"))
+                if not pending:
+                    break
+                done, pending = wait(pending, timeout=WORKER_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = futures[future]
+                    try:
+                        record(name, future.result())
+                    except Exception as e:
+                        record(name, error=e)
+        finally:
+            if own_executor:
+                # 応答しないワーカーは強制終了する（共有のプールは他の処理も使っているので残す）
+                if unresponsive:
+                    terminate_workers(executor)
+                else:
+                    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def print_generation_summary(results):
+    """生成結果のサマリーを表示し、失敗したパズル名のリストを返す（代わりのパズルを使ったものは含めない）"""
+    failed = [name for name, r in results.items() if r['status'] not in ('ok', 'fallback')]
+    cached = sum(1 for r in results.values() if r.get('cached'))
+    fallbacks = [name for name, r in results.items() if r['status'] == 'fallback']
+    generated = len(results) - len(failed) - len(fallbacks)
+    print(f"Generated {generated}/{len(results)} puzzles ({cached} from cache).")
+    for name in fallbacks:
+        r = results[name]
+        print(f"  - {name}: using {r['fallback']} instead ({r['error']})")
+    for name in failed:
+        r = results[name]
+        print(f"  - {name}: {r['status']} after {r['elapsed']:.1f}s ({r['error']})")
+    return failed
+
+
+# ============================================
+# 期限付きの生成（間に合わないパズルは代わりのパズルを使う）
+# ============================================
+# 予備のパズル（SVG）。どのキャッシュも使えないときの最後の手段で、--make-spares で作り直す
+SPARES_DIR = Path(__file__).resolve().parent / "spares"
+
+# 予備のパズルを生成するときの日付（日付によって変わる部分を固定するため。シードは日付と別に決める）
+SPARE_DATE = "20000101"
+
+
+def spare_paths(name):
+    """予備のパズルのファイル（spares/パズル名_problem.svg, spares/パズル名_answer.svg）"""
+    return {kind: SPARES_DIR / f"{name}_{kind}.svg" for kind in ('problem', 'answer')}
+
+
+def load_spare(name):
+    """予備のパズルを {'problem': SVG文字列, 'answer': SVG文字列} で返す（無ければNone）"""
+    paths = spare_paths(name)
+    if not all(path.exists() for path in paths.values()):
+        return None
+    return {kind: path.read_text(encoding='utf-8') for kind, path in paths.items()}
+
+
+def make_spares():
+    """
+    全種類の予備のパズルを spares/ に作成する
+    日付のパズルと重ならないよう、日付とは別のシードで生成する
+    """
+    SPARES_DIR.mkdir(exist_ok=True)
+    for name in GENERATORS:
+        seed = int.from_bytes(hashlib.sha256(f"spare:{name}".encode('utf-8')).digest()[:8], 'big')
+        artifact = run_generator(name, SPARE_DATE, seed=seed, backend='svg')
+        for kind, path in spare_paths(name).items():
+            path.write_text(artifact[kind], encoding='utf-8')
+            print(f"Spare created: {path}")
+
+
+def find_fallback(name, date_prefix):
+    """
+    期限に間に合わなかったパズルの代わりを探す
+    1. 同じ種類で最後にキャッシュされたパズル  2. 予備のパズル
+
+    戻り値: (生成結果, 説明)、どちらも無ければ (None, None)
+    """
+    cached_date, artifact = load_latest_cached(name, date_prefix)
+    if artifact is not None:
+        return artifact, f"cached puzzle of {cached_date}"
+    artifact = load_spare(name)
+    if artifact is not None:
+        return artifact, "spare puzzle"
+    return None, None
+
+
+async def orchestrate(date_prefix, deadline, jobs=1, timeout=DEFAULT_GENERATOR_TIMEOUT, use_cache=True,
+                      retries=DEFAULT_GENERATOR_RETRIES):
+    """
+    全パズルの生成をプロセスプール上のタスクとして実行し、全体の期限（deadline秒）で打ち切る
+    失敗したパズルは期限内なら retries 回まで作り直す（generate_svgs() と同じく、タイムアウトは作り直さない）
+    期限までに生成できなかった・失敗したパズルは find_fallback() の代わりのパズルにする
+    （各パズルの制限時間も期限を超えないようにする）
+
+    戻り値: generate_svgs() と同じ (svgs, results)
+        代わりのパズルを使ったものは results の 'status' が 'fallback'、'fallback' にその説明が入る
+    """
+    import asyncio  # --deadline のときだけ使うため、ここで読み込む
+    from concurrent.futures import ProcessPoolExecutor
+    
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    svgs = {}
+    results = {}
+    attempts = Counter()
+    
+    def record(name, artifact=None, error=None, cached=False, timing=None):
+        elapsed = loop.time() - start
+        if error is None:
+            timing = artifact.pop('timing', timing)
+            svgs[name] = artifact
+            results[name] = {'status': 'ok', 'elapsed': elapsed, 'error': None, 'cached': cached,
+                             'timing': timing, 'stats': artifact.get('stats', {}), 'fallback': None,
+                             'attempts': attempts[name]}
+            if use_cache and not cached:
+                store_cached(name, date_prefix, artifact)
+            return
+        status = 'timeout' if isinstance(error, (GeneratorTimeout, asyncio.TimeoutError)) else 'error'
+        results[name] = {'status': status, 'elapsed': elapsed, 'error': str(error) or status,
+                         'cached': False, 'timing': None, 'stats': {}, 'fallback': None,
+                         'attempts': attempts[name]}
+        fallback, description = find_fallback(name, date_prefix)
+        if fallback is not None:
+            svgs[name] = fallback
+            results[name].update(status='fallback', stats=fallback.get('stats', {}), fallback=description)
+        print(f"Error generating {name} ({status}): {error}"
+              + (f" -> using {description}" if fallback is not None else ""))
+    
+    if use_cache:
+        for name in GENERATORS:
+            with timed() as timing:
+                artifact = load_cached(name, date_prefix)
+            if artifact is not None:
+                record(name, artifact, cached=True, timing=timing)
+    names = [name for name in GENERATORS if name not in results]
+    if not names:
+        return svgs, {name: results[name] for name in GENERATORS}
+    
+    print(f"=== Generating {len(names)} puzzles with {jobs} workers (deadline {deadline:g}s) ===")
+    # 各パズルの制限時間が全体の期限を超えないようにする
+    slice_timeout = min(timeout, deadline) if timeout else deadline
+    executor = ProcessPoolExecutor(max_workers=jobs)
+    tasks = {}
+    
+    def submit(name, limit):
+        attempts[name] += 1
+        task = loop.run_in_executor(executor, run_generator, name, date_prefix, None, limit)
+        tasks[task] = name
+        return task
+    
+    pending = {submit(name, slice_timeout) for name in names}
+    try:
+        while pending:
+            remaining = deadline - (loop.time() - start)
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining,
+                                               return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                name = tasks[task]
+                try:
+                    record(name, task.result())
+                except Exception as e:
+                    remaining = deadline - (loop.time() - start)
+                    if (not isinstance(e, (GeneratorTimeout, asyncio.TimeoutError))
+                            and attempts[name] <= retries and remaining > 0):
+                        print(f"{name} failed ({e}), retrying ({attempts[name]}/{retries})")
+                        pending.add(submit(name, min(slice_timeout, remaining)))
+                    else:
+                        record(name, error=e)
+        for task in pending:
+            task.cancel()
+            record(tasks[task], error=GeneratorTimeout(f"全体の期限（{deadline:g}秒）に間に合いませんでした"))
+    finally:
+        if pending:
+            # 期限を過ぎても動いているワーカーは強制終了する
+            terminate_workers(executor)
         else:
-            print(f"Warning: {script} not found, skipping...")
+            executor.shutdown(wait=False, cancel_futures=True)
     
-    print("All SVG generation scripts finished.")
+    print("All SVG generation finished.")
+    return svgs, {name: results[name] for name in GENERATORS}
 
 
-def delete_svg_files(working_dir, date_prefix):
+def generate_with_deadline(date_prefix, deadline, jobs=1, timeout=DEFAULT_GENERATOR_TIMEOUT,
+                           use_cache=True, retries=DEFAULT_GENERATOR_RETRIES):
+    """orchestrate() をイベントループで実行する（同期的に呼び出すための入口）"""
+    import asyncio
+    
+    return asyncio.run(orchestrate(date_prefix, deadline, jobs=jobs, timeout=timeout,
+                                   use_cache=use_cache, retries=retries))
+
+
+# ============================================
+# 日付範囲の一括生成
+# ============================================
+def plan_dates(date_from, date_to, output_dir, missing_only=False):
     """
-    生成したSVGファイル（18ファイル）を削除
+    date_from〜date_to（YYYYMMDD、両端を含む）の日付リストを返す
+    missing_only=True の場合は output_dir に問題用・解答用PDFが揃っている日付を除く
     """
-    puzzle_names = [
-        'building', 'kenken', 'matchstick', 'cryptarithm',
-        'countdown', 'mininumpre', 'calcpuzzle', 'sumpuzzle', 'maze'
-    ]
+    start = datetime.strptime(date_from, "%Y%m%d")
+    end = datetime.strptime(date_to, "%Y%m%d")
+    if start > end:
+        raise ValueError(f"開始日が終了日より後です: {date_from} > {date_to}")
     
-    deleted_count = 0
-    for name in puzzle_names:
-        # 問題用SVG
-        svg_path = os.path.join(working_dir, f"{date_prefix}_{name}.svg")
-        if os.path.exists(svg_path):
-            os.remove(svg_path)
-            deleted_count += 1
-        
-        # 解答用SVG
-        ans_svg_path = os.path.join(working_dir, f"{date_prefix}_{name}_ans.svg")
-        if os.path.exists(ans_svg_path):
-            os.remove(ans_svg_path)
-            deleted_count += 1
+    existing = set(os.listdir(output_dir)) if os.path.isdir(output_dir) else set()
+    dates = []
+    current = start
+    while current <= end:
+        date_prefix = current.strftime("%Y%m%d")
+        complete = (f"{date_prefix}_puzzle.pdf" in existing and
+                    f"{date_prefix}_answer.pdf" in existing)
+        if not (missing_only and complete):
+            dates.append(date_prefix)
+        current += timedelta(days=1)
+    return dates
+
+
+def run_batch(dates, on_day, jobs=1, timeout=DEFAULT_GENERATOR_TIMEOUT, use_cache=True,
+              retries=DEFAULT_GENERATOR_RETRIES, executor=None, report=None):
+    """
+    複数日付のパズル生成を1つのプロセスでまとめて行う
+    フォント・レイアウト・QRコードのキャッシュは全日付で共有し、
+    jobs > 1 の場合は全日付の生成タスクを1つのプロセスプールに投入する
+    9種類が揃った日付から順に on_day(日付, svgs) を呼ぶ（失敗した日付は svgs=None）
+    use_cache: キャッシュにあるパズルはプロセスプールに投入せず再利用し、
+               日付ごとのマニフェストに進み具合と on_day が返した出力ファイルを記録する
+    retries: 失敗したパズルを作り直す回数（generate_svgs() と同じく、タイムアウトは作り直さない）
+    executor: 指定するとそのプロセスプールで生成する（呼び出し側が所有し、終了もしない）
+    report: 指定すると日付ごとの生成結果を report['days'] に記録する（new_batch_report()）。
+            on_day が呼ばれる時点で report['days'][日付] ができている
+
+    戻り値: (failed_dates, unresponsive)
+        failed_dates: 失敗した日付 -> 失敗したパズル名のリスト
+        unresponsive: 応答しないワーカーがあったか（True なら共有のプールは呼び出し側が
+                      terminate_workers() で閉じる。自分で作ったプールはここで閉じる）
+    """
+    failed_dates = {}
+    finished = 0
+    if use_cache:
+        for date_prefix in dates:
+            resume_checkpoint(date_prefix)
+    
+    def finish(date_prefix, svgs, results):
+        nonlocal finished
+        finished += 1
+        failed = [name for name, r in results.items() if r['status'] != 'ok']
+        if report is not None:
+            day = new_day_report(report, date_prefix)
+            day['status'] = 'failed' if failed else 'ok'
+            record_generation(day, results)
+        if failed:
+            failed_dates[date_prefix] = failed
+            for name in failed:
+                r = results[name]
+                print(f"[{finished}/{len(dates)}] {date_prefix}: {name} {r['status']} ({r['error']})")
+            outputs = on_day(date_prefix, None)
+        else:
+            outputs = on_day(date_prefix, svgs)
+            print(f"[{finished}/{len(dates)}] {date_prefix} done")
+        if use_cache:
+            write_manifest(date_prefix, results, outputs or ())
+    
+    if jobs <= 1:
+        for date_prefix in dates:
+            svgs, results = generate_svgs(date_prefix, jobs=1, timeout=timeout, use_cache=use_cache,
+                                          retries=retries)
+            finish(date_prefix, svgs, results)
+        return failed_dates, False
     
-    print(f"Deleted {deleted_count} SVG files.")
+    print(f"=== Generating {len(dates)} days with {jobs} workers ===")
+    pending = {date_prefix: ({}, {}) for date_prefix in dates}
+    attempts = Counter()
+    start = time.perf_counter()
+    
+    def record(date_prefix, name, artifact=None, error=None, cached=False, timing=None):
+        svgs, results = pending[date_prefix]
+        elapsed = time.perf_counter() - start
+        if error is None:
+            timing = artifact.pop('timing', timing)
+            svgs[name] = artifact
+            results[name] = {'status': 'ok', 'elapsed': elapsed, 'error': None, 'cached': cached,
+                             'timing': timing, 'stats': artifact.get('stats', {}),
+                             'attempts': attempts[date_prefix, name]}
+            if use_cache and not cached:
+                store_cached(name, date_prefix, artifact)
+        else:
+            status = 'timeout' if isinstance(error, GeneratorTimeout) else 'error'
+            results[name] = {'status': status, 'elapsed': elapsed, 'error': str(error), 'cached': False,
+                             'timing': None, 'stats': {}, 'attempts': attempts[date_prefix, name]}
+        if len(results) == len(GENERATORS):
+            del pending[date_prefix]
+            finish(date_prefix, svgs, {n: results[n] for n in GENERATORS})
+    
+    tasks = []
+    for date_prefix in dates:
+        for name in GENERATORS:
+            with timed() as timing:
+                artifact = load_cached(name, date_prefix) if use_cache else None
+            if artifact is not None:
+                record(date_prefix, name, artifact, cached=True, timing=timing)
+            else:
+                tasks.append((date_prefix, name))
+    if not tasks:
+        return failed_dates, False
+    
+    from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+    from concurrent.futures import TimeoutError as FuturesTimeout
+    
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=jobs)
+    futures = {}
+    
+    def submit(date_prefix, name):
+        attempts[date_prefix, name] += 1
+        futures[executor.submit(run_generator, name, date_prefix, None, timeout)] = (date_prefix, name)
+    
+    for date_prefix, name in tasks:
+        submit(date_prefix, name)
+    # ワーカー側のタイマーが効かなかった場合の保険（作り直しの分も含めた全体の期限）
+    deadline = None
+    if timeout is not None:
+        deadline = time.perf_counter() + timeout * len(tasks) * (retries + 1) / jobs + timeout
+    unresponsive = False
+    try:
+        while futures:
+            remaining = None if deadline is None else max(0, deadline - time.perf_counter())
+            done, _ = wait(futures, timeout=remaining, return_when=FIRST_COMPLETED)
+            if not done:
+                raise FuturesTimeout()
+            for future in done:
+                date_prefix, name = futures.pop(future)
+                try:
+                    artifact = future.result()
+                except Exception as e:
+                    if not isinstance(e, GeneratorTimeout) and attempts[date_prefix, name] <= retries:
+                        print(f"{date_prefix}: {name} failed ({e}), retrying "
+                              f"({attempts[date_prefix, name]}/{retries})")
+                        submit(date_prefix, name)
+                    else:
+                        record(date_prefix, name, error=e)
+                else:
+                    record(date_prefix, name, artifact)
+    except FuturesTimeout:
+        unresponsive = True
+        for future, (date_prefix, name) in futures.items():
+            future.cancel()
+            record(date_prefix, name, error=GeneratorTimeout("ワーカーが応答しませんでした"))
+    finally:
+        if own_executor:
+            # 応答しないワーカーは強制終了する（共有のプールは呼び出し側が閉じる）
+            if unresponsive:
+                terminate_workers(executor)
+            else:
+                executor.shutdown(wait=False, cancel_futures=True)
+    
+    return failed_dates, unresponsive
 
 
 # ============================================
@@ -179,17 +938,20 @@ def get_date_prefix():
     return datetime.now().strftime("%Y%m%d")
 
 
-def get_formatted_date():
-    """YYYY/MM/DD形式の日付を返す"""
-    return datetime.now().strftime("%Y/%m/%d")
+# QRコードの誤り訂正レベル（L/M/Q/H）
+QR_ERROR_CORRECTION = 'L'
+
+# QRコードのキャッシュ（同じURLは1回の実行中に何度描画しても1回だけ生成する）
+_qr_matrix_cache = {}
+_qr_png_cache = {}
 
 
-def generate_qr_code(url, box_size=10, border=1):
+def generate_qr_code(url, box_size=10, border=1, error_correction=QR_ERROR_CORRECTION):
     """QRコードを生成してPIL Imageを返す"""
     import qrcode
     qr = qrcode.QRCode(
         version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        error_correction=getattr(qrcode.constants, f"ERROR_CORRECT_{error_correction}"),
         box_size=box_size,
         border=border,
     )
@@ -199,26 +961,143 @@ def generate_qr_code(url, box_size=10, border=1):
     return img
 
 
+def get_qr_matrix(url, border=1, error_correction=QR_ERROR_CORRECTION):
+    """QRコードのモジュール行列（余白込み、True=黒）を返す（URL・誤り訂正レベルごとにキャッシュ）"""
+    key = (url, error_correction, border)
+    if key not in _qr_matrix_cache:
+        import qrcode
+        qr = qrcode.QRCode(
+            version=1,
+            error_correction=getattr(qrcode.constants, f"ERROR_CORRECT_{error_correction}"),
+            border=border,
+        )
+        qr.add_data(url)
+        qr.make(fit=True)
+        _qr_matrix_cache[key] = qr.get_matrix()
+    return _qr_matrix_cache[key]
+
+
+def get_qr_png(url, box_size=10, border=1, error_correction=QR_ERROR_CORRECTION, grayscale=False):
+    """
+    QRコードのPNGバイト列を返す（URL・誤り訂正レベルごとにキャッシュ）
+    grayscale=True の場合は8bitグレースケールにする（ReportLabは1bit画像をRGBで埋め込むため）
+    """
+    key = (url, error_correction, box_size, border, grayscale)
+    if key not in _qr_png_cache:
+        buffer = io.BytesIO()
+        img = generate_qr_code(url, box_size, border, error_correction)
+        if grayscale:
+            img = img.get_image().convert('L')
+        img.save(buffer, format='PNG')
+        _qr_png_cache[key] = buffer.getvalue()
+    return _qr_png_cache[key]
+
+
+def draw_qr_code(c, url, x, y, size, vector=False):
+    """
+    QRコードを(x, y)を左下とするsize四方に描画
+    vector=True の場合はPNGを埋め込まず、黒モジュールを矩形のパスとして描く
+    """
+    from reportlab.lib.colors import HexColor
+    
+    if not vector:
+        from reportlab.lib.utils import ImageReader
+        png = get_qr_png(url, box_size=10, border=1, grayscale=_optimize_output)
+        # 同じPNGはReportLabが内容のハッシュで1回だけ埋め込み、2回目以降は参照する
+        c.drawImage(ImageReader(io.BytesIO(png)), x, y, width=size, height=size)
+        return
+    
+    matrix = get_qr_matrix(url, border=1)
+    module = size / len(matrix)
+    path = c.beginPath()
+    for row, cells in enumerate(matrix):
+        row_y = y + size - (row + 1) * module
+        col = 0
+        while col < len(cells):
+            if not cells[col]:
+                col += 1
+                continue
+            # 横に連続する黒モジュールは1つの矩形にまとめる
+            start = col
+            while col < len(cells) and cells[col]:
+                col += 1
+            path.rect(x + start * module, row_y, (col - start) * module, module)
+    c.saveState()
+    c.setFillColor(HexColor('#000000'))
+    c.drawPath(path, stroke=0, fill=1)
+    c.restoreState()
+
+
 # ============================================
-# Puzzle PDF用の描画関数
+# ページテンプレート（フォームXObject）
 # ============================================
-def draw_header_section(c, page_width, page_height, date_str):
+# 日付によらない部分（ヘッダーの定型文、ノート罫線、円周率、固定URLのQRコード）は
+# フォームXObjectとして1回だけ記録し、各ページからは参照するだけにする
+PUZZLE_TEMPLATE = "PuzzlePageTemplate"
+ANSWER_TEMPLATE = "AnswerPageTemplate"
+
+# ヘッダーの日付欄（数字はどれも同じ幅なので、この文字列の幅を空けておけば日付がぴったり入る）
+HEADER_PREFIX = "Brain Decathlon "
+DATE_PLACEHOLDER = "0000/00/00"
+
+
+def use_page_template(c, name, draw_template):
     """
-    ヘッダーテキストを描画（背景色なし）
-    「Brain Decathlon YYYY/MM/DD   pi=    digits , Puzzle   / 9 , Time    :     」
-    入力欄は4倍幅の余白
+    テンプレートをフォームXObjectとして描画する
+    そのPDFで初めて使うときだけ draw_template(c) で記録し、以降は参照のみ
+    """
+    if not c.hasForm(name):
+        c.beginForm(name)
+        draw_template(c)
+        c.endForm()
+    c.doForm(name)
+
+
+def draw_header_text(c, page_width, page_height, font_size, suffix, date_str=None):
     """
+    「Brain Decathlon 」+ 日付 + suffix の1行を描画
+    date_str=None の場合は日付以外の部分（テンプレート）、指定した場合は日付だけを描画
+    """
+    from reportlab.lib.colors import HexColor
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+    
     header_x = 8 * mm
     header_y = page_height - 5 * mm
+    text_x = header_x + 2 * mm
+    text_y = header_y - 4 * mm
     
     c.setFillColor(HexColor('#000000'))
-    c.setFont(FONT_BOLD, 9)
+    c.setFont(FONT_BOLD, font_size)
     
+    date_x = text_x + stringWidth(HEADER_PREFIX, FONT_BOLD, font_size)
+    if date_str is not None:
+        c.drawString(date_x, text_y, date_str)
+        return
+    c.drawString(text_x, text_y, HEADER_PREFIX)
+    c.drawString(date_x + stringWidth(DATE_PLACEHOLDER, FONT_BOLD, font_size), text_y, suffix)
+
+
+# ============================================
+# Puzzle PDF用の描画関数
+# ============================================
+def draw_puzzle_template(c, page_width, page_height, vector_qr=False):
+    """Puzzle PDFの日付によらない部分：ヘッダー定型文、ノート、GuideのQRコード"""
+    draw_header_section(c, page_width, page_height)
+    draw_note_section(c, page_width, page_height)
+    draw_qr_sections(c, page_width, page_height, vector_qr)
+
+
+def draw_header_section(c, page_width, page_height, date_str=None):
+    """
+    ヘッダーテキストを描画（背景色なし）
+    「Brain Decathlon YYYY/MM/DD   pi=    digits , Puzzle   / 9 , Time    :     」
+    入力欄は4倍幅の余白
+    date_str=None の場合は日付以外、指定した場合は日付だけを描画
+    """
     # 4倍幅の余白を表現するためにスペースを多めに入れる
     blank = "        "  # 8スペース（4倍幅相当）
-    text = f"Brain Decathlon {date_str}   pi={blank}digits , Puzzle{blank}/ 9 , Time{blank}:{blank}"
-    text_y = header_y - 4 * mm
-    c.drawString(header_x + 2 * mm, text_y, text)
+    suffix = f"   pi={blank}digits , Puzzle{blank}/ 9 , Time{blank}:{blank}"
+    draw_header_text(c, page_width, page_height, 9, suffix, date_str)
 
 
 def draw_note_section(c, page_width, page_height):
@@ -227,6 +1106,8 @@ def draw_note_section(c, page_width, page_height):
     1行目の最初に「π=」と書く
     罫線はパズル画像と被らない範囲まで
     """
+    from reportlab.lib.colors import HexColor
+    
     note_x = 5 * mm
     note_y = page_height - 10 * mm
     note_width = 132 * mm
@@ -251,71 +1132,66 @@ def draw_note_section(c, page_width, page_height):
     c.drawString(note_x + 3 * mm, pi_y, "π=")
 
 
-def draw_qr_sections(c, page_width, page_height, date_prefix):
+# QRコード欄の配置（Guide/more π は左、Answer/Games は右）
+QR_BOX_WIDTH = 26 * mm
+QR_SIZE = 16 * mm
+
+
+def qr_position(page_width, page_height, right):
+    """QRコード欄の見出し位置とQRコード左下の座標を返す"""
+    box_x = page_width - (32 if right else 60) * mm
+    box_y = page_height - 5 * mm
+    label = (box_x + QR_BOX_WIDTH / 2, box_y - 4 * mm)
+    qr = (box_x + (QR_BOX_WIDTH - QR_SIZE) / 2, box_y - 5 * mm - QR_SIZE)
+    return label, qr
+
+
+def draw_qr_sections(c, page_width, page_height, vector_qr=False):
     """
-    Guide/AnswerのQRコードを描画（背景色なし）
+    Guide/AnswerのQRコード欄を描画（背景色なし）
+    日付ごとに変わるAnswerのQRコードは draw_answer_link_qr() で描く
     """
-    from reportlab.lib.utils import ImageReader
+    from reportlab.lib.colors import HexColor
     
-    box_width = 26 * mm
-    qr_size = 16 * mm
-    
-    guide_x = page_width - 60 * mm
-    guide_y = page_height - 5 * mm
-    
-    answer_x = page_width - 32 * mm
-    answer_y = page_height - 5 * mm
+    (guide_label, guide_qr) = qr_position(page_width, page_height, right=False)
+    (answer_label, _) = qr_position(page_width, page_height, right=True)
     
     # 「Guide」テキストを描画
     c.setFillColor(HexColor('#000000'))
     c.setFont(FONT_BOLD, 9)
-    c.drawCentredString(guide_x + box_width / 2, guide_y - 4 * mm, "Guide")
+    c.drawCentredString(*guide_label, "Guide")
     
     # 「Answer」テキストを描画
-    c.drawCentredString(answer_x + box_width / 2, answer_y - 4 * mm, "Answer")
+    c.drawCentredString(*answer_label, "Answer")
     
     # GuideのQRコードを生成・描画
     guide_url = "https://351justy.github.io/brain-decathlon/guide.pdf"
-    guide_qr = generate_qr_code(guide_url, box_size=10, border=1)
-    
-    guide_qr_buffer = io.BytesIO()
-    guide_qr.save(guide_qr_buffer, format='PNG')
-    guide_qr_buffer.seek(0)
-    guide_qr_image = ImageReader(guide_qr_buffer)
-    
-    qr_y_offset = guide_y - 5 * mm - qr_size
-    qr_x_offset = guide_x + (box_width - qr_size) / 2
-    c.drawImage(guide_qr_image, qr_x_offset, qr_y_offset, width=qr_size, height=qr_size)
-    
-    # AnswerのQRコードを生成・描画
+    draw_qr_code(c, guide_url, *guide_qr, QR_SIZE, vector=vector_qr)
+
+
+def draw_answer_link_qr(c, page_width, page_height, date_prefix, vector_qr=False):
+    """その日の解答PDFへのQRコードを描画"""
+    (_, answer_qr) = qr_position(page_width, page_height, right=True)
     answer_url = f"https://351justy.github.io/brain-decathlon/puzzles/{date_prefix}_answer.pdf"
-    answer_qr = generate_qr_code(answer_url, box_size=10, border=1)
-    
-    answer_qr_buffer = io.BytesIO()
-    answer_qr.save(answer_qr_buffer, format='PNG')
-    answer_qr_buffer.seek(0)
-    answer_qr_image = ImageReader(answer_qr_buffer)
-    
-    qr_x_offset = answer_x + (box_width - qr_size) / 2
-    c.drawImage(answer_qr_image, qr_x_offset, qr_y_offset, width=qr_size, height=qr_size)
+    draw_qr_code(c, answer_url, *answer_qr, QR_SIZE, vector=vector_qr)
 
 
 # ============================================
 # Answer PDF用の描画関数
 # ============================================
-def draw_answer_header_section(c, page_width, page_height, date_str):
+def draw_answer_template(c, page_width, page_height, vector_qr=False):
+    """Answer PDFの日付によらない部分：ヘッダー定型文、円周率、more π/GamesのQRコード"""
+    draw_answer_header_section(c, page_width, page_height)
+    draw_answer_pi_section(c, page_width, page_height)
+    draw_answer_qr_sections(c, page_width, page_height, vector_qr)
+
+
+def draw_answer_header_section(c, page_width, page_height, date_str=None):
     """
     Answer PDF用ヘッダー：「Brain Decathlon YYYY/MM/DD Answer」
+    date_str=None の場合は日付以外、指定した場合は日付だけを描画
     """
-    header_x = 8 * mm
-    header_y = page_height - 5 * mm
-    
-    c.setFillColor(HexColor('#000000'))
-    c.setFont(FONT_BOLD, 11)
-    
-    text = f"Brain Decathlon {date_str} Answer"
-    text_y = header_y - 4 * mm
-    c.drawString(header_x + 2 * mm, text_y, text)
+    draw_header_text(c, page_width, page_height, 11, " Answer", date_str)
 
 
 def draw_answer_pi_section(c, page_width, page_height):
@@ -323,6 +1199,8 @@ def draw_answer_pi_section(c, page_width, page_height):
     Answer PDF用：円周率の数字を表示（罫線なし）
     9ptフォント、行間を詰める
     """
+    from reportlab.lib.colors import HexColor
+    
     note_x = 5 * mm
     note_y = page_height - 10 * mm
     
@@ -349,53 +1227,30 @@ def draw_answer_pi_section(c, page_width, page_height):
         c.drawString(note_x + 3 * mm, line_y, line)
 
 
-def draw_answer_qr_sections(c, page_width, page_height):
+def draw_answer_qr_sections(c, page_width, page_height, vector_qr=False):
     """
     Answer PDF用：「more π」と「Games」のQRコード
     """
-    from reportlab.lib.utils import ImageReader
-    
-    box_width = 26 * mm
-    qr_size = 16 * mm
+    from reportlab.lib.colors import HexColor
     
-    morepi_x = page_width - 60 * mm
-    morepi_y = page_height - 5 * mm
-    
-    games_x = page_width - 32 * mm
-    games_y = page_height - 5 * mm
+    (morepi_label, morepi_qr) = qr_position(page_width, page_height, right=False)
+    (games_label, games_qr) = qr_position(page_width, page_height, right=True)
     
     # 「more π」テキストを描画
     c.setFillColor(HexColor('#000000'))
     c.setFont(FONT_BOLD, 9)
-    c.drawCentredString(morepi_x + box_width / 2, morepi_y - 4 * mm, "more π")
+    c.drawCentredString(*morepi_label, "more π")
     
     # 「Games」テキストを描画
-    c.drawCentredString(games_x + box_width / 2, games_y - 4 * mm, "Games")
+    c.drawCentredString(*games_label, "Games")
     
     # more πのQRコードを生成・描画
     morepi_url = "https://www.tstcl.jp/randd/constants/pi/"
-    morepi_qr = generate_qr_code(morepi_url, box_size=10, border=1)
-    
-    morepi_qr_buffer = io.BytesIO()
-    morepi_qr.save(morepi_qr_buffer, format='PNG')
-    morepi_qr_buffer.seek(0)
-    morepi_qr_image = ImageReader(morepi_qr_buffer)
-    
-    qr_y_offset = morepi_y - 5 * mm - qr_size
-    qr_x_offset = morepi_x + (box_width - qr_size) / 2
-    c.drawImage(morepi_qr_image, qr_x_offset, qr_y_offset, width=qr_size, height=qr_size)
+    draw_qr_code(c, morepi_url, *morepi_qr, QR_SIZE, vector=vector_qr)
     
     # GamesのQRコードを生成・描画
     games_url = "https://justy.co.jp/games/"
-    games_qr = generate_qr_code(games_url, box_size=10, border=1)
-    
-    games_qr_buffer = io.BytesIO()
-    games_qr.save(games_qr_buffer, format='PNG')
-    games_qr_buffer.seek(0)
-    games_qr_image = ImageReader(games_qr_buffer)
-    
-    qr_x_offset = games_x + (box_width - qr_size) / 2
-    c.drawImage(games_qr_image, qr_x_offset, qr_y_offset, width=qr_size, height=qr_size)
+    draw_qr_code(c, games_url, *games_qr, QR_SIZE, vector=vector_qr)
 
 
 # ============================================
@@ -488,150 +1343,670 @@ def get_layout():
 
 
 # ============================================
-# PDF生成関数
+# 出力サイズの最適化（--optimize）
 # ============================================
-def create_puzzle_pdf(working_dir=None, date_override=None):
-    """問題用PDFを生成"""
-    if working_dir is None:
-        working_dir = os.getcwd()
+# optimized_output() の中で作るPDFかどうか（QRコードの画像形式の切り替えに使う）
+_optimize_output = False
 
-    date_prefix = date_override if date_override else get_date_prefix()
-    
-    if date_override:
-        year = date_override[:4]
-        month = date_override[4:6]
-        day = date_override[6:8]
-        formatted_date = f"{year}/{month}/{day}"
-    else:
-        formatted_date = get_formatted_date()
-
-    output_path = os.path.join(working_dir, f"{date_prefix}_puzzle.pdf")
-
-    svg_files = {
-        'building': f'{date_prefix}_building.svg',
-        'kenken': f'{date_prefix}_kenken.svg',
-        'matchstick': f'{date_prefix}_matchstick.svg',
-        'cryptarithm': f'{date_prefix}_cryptarithm.svg',
-        'countdown': f'{date_prefix}_countdown.svg',
-        'mininumpre': f'{date_prefix}_mininumpre.svg',
-        'calcpuzzle': f'{date_prefix}_calcpuzzle.svg',
-        'sumpuzzle': f'{date_prefix}_sumpuzzle.svg',
-        'maze': f'{date_prefix}_maze.svg',
-    }
 
-    page_width, page_height = A4
-    c = canvas.Canvas(output_path, pagesize=A4)
+@contextmanager
+def optimized_output(enabled=True):
+    """
+    この中で作成・保存するPDFを小さくする
+    - ストリーム（ページ・フォント・画像）をFlate圧縮し、ASCII85で符号化せずバイナリのまま書く
+    - QRコードの画像をRGBではなく8bitグレースケールで埋め込む
+    ReportLabの設定はモジュール全体で共有されるため、抜けるときに元に戻す
+    """
+    global _optimize_output
+    from reportlab import rl_config
 
-    # ヘッダー、ノート、QRコードセクションを描画
-    draw_header_section(c, page_width, page_height, formatted_date)
-    draw_note_section(c, page_width, page_height)
-    draw_qr_sections(c, page_width, page_height, date_prefix)
+    saved = rl_config.useA85, _optimize_output
+    if enabled:
+        rl_config.useA85 = 0
+        _optimize_output = True
+    try:
+        yield
+    finally:
+        rl_config.useA85, _optimize_output = saved
 
-    def load_svg(name):
-        path = os.path.join(working_dir, svg_files[name])
-        if os.path.exists(path):
-            return svg2rlg(path)
-        else:
-            print(f"Warning: {path} not found")
-            return None
 
-    def draw_svg(drawing, x, y, target_width=None, target_height=None):
-        if drawing is None:
-            return
-        ow, oh = drawing.width, drawing.height
-        if target_width and target_height:
-            scale = min(target_width / ow, target_height / oh)
-        elif target_width:
-            scale = target_width / ow
-        elif target_height:
-            scale = target_height / oh
+# 線分を同じ直線上とみなす座標の誤差
+COLLINEAR_EPSILON = 1e-6
+# 線分をまとめるときに同じでなければならない線のスタイル
+LINE_STYLE_ATTRS = ('strokeColor', 'strokeWidth', 'strokeLineCap', 'strokeLineJoin',
+                    'strokeMiterLimit', 'strokeDashArray', 'strokeOpacity')
+
+
+def simplify_drawing(drawing):
+    """
+    svglibのDrawingの線分を、見た目を変えずに少ない描画命令にまとめる（Drawingを書き換える）
+    - 同じスタイルの線（Line）が続く部分は、同じ直線上で接する・重なる水平線・垂直線を
+      1本につなげ、まとめて1つのPathにする（迷路の壁はセル1辺ごとの線分で出力される）
+    - 折れ線（Path）の途中で向きが変わらない点を取り除く
+    半透明・破線の線は重なり方で見た目が変わるためそのままにする
+
+    戻り値: 減った描画命令（線分・点）の数
+    """
+    from reportlab.graphics.shapes import Group, Line, Path
+
+    removed = 0
+    groups = [drawing]
+    while groups:
+        group = groups.pop()
+        contents = []
+        run = []
+        for node in group.contents + [None]:
+            if isinstance(node, Line) and _is_mergeable_line(node):
+                if run and _line_style(run[0]) != _line_style(node):
+                    removed += _flush_lines(run, contents)
+                run.append(node)
+                continue
+            removed += _flush_lines(run, contents)
+            if node is None:
+                break
+            if isinstance(node, Group):
+                groups.append(node)
+            elif isinstance(node, Path):
+                removed += _drop_collinear_points(node)
+            contents.append(node)
+        group.contents = contents
+    return removed
+
+
+def _line_style(line):
+    return tuple(getattr(line, attr, None) for attr in LINE_STYLE_ATTRS)
+
+
+def _is_mergeable_line(line):
+    return not getattr(line, 'strokeDashArray', None) and getattr(line, 'strokeOpacity', 1) in (None, 1)
+
+
+def _merge_intervals(intervals):
+    """[(始点, 終点), ...] のうち接する・重なる区間をつなげて返す"""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + COLLINEAR_EPSILON:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def _flush_lines(run, contents):
+    """同じスタイルの線分の並び run を1つのPathにして contents に追加し、run を空にする"""
+    from reportlab.graphics.shapes import Path
+
+    if not run:
+        return 0
+    if len(run) == 1:
+        contents.append(run.pop())
+        return 0
+
+    # 水平線は ('h', y)、垂直線は ('v', x) ごとに区間を集める（最初に現れた順）
+    axes = {}
+    others = []
+    for line in run:
+        x1, y1, x2, y2 = line.x1, line.y1, line.x2, line.y2
+        if abs(y1 - y2) <= COLLINEAR_EPSILON:
+            axes.setdefault(('h', y1), []).append((min(x1, x2), max(x1, x2)))
+        elif abs(x1 - x2) <= COLLINEAR_EPSILON:
+            axes.setdefault(('v', x1), []).append((min(y1, y2), max(y1, y2)))
         else:
-            scale = 1.0
-        drawing.scale(scale, scale)
+            others.append(line)
+
+    path = Path(fillColor=None)
+    for attr in LINE_STYLE_ATTRS:
+        if hasattr(run[0], attr):
+            setattr(path, attr, getattr(run[0], attr))
+    segments = 0
+    for (axis, fixed), intervals in axes.items():
+        for start, end in _merge_intervals(intervals):
+            if axis == 'h':
+                path.moveTo(start, fixed)
+                path.lineTo(end, fixed)
+            else:
+                path.moveTo(fixed, start)
+                path.lineTo(fixed, end)
+            segments += 1
+    for line in others:
+        path.moveTo(line.x1, line.y1)
+        path.lineTo(line.x2, line.y2)
+        segments += 1
+
+    removed = len(run) - segments
+    run.clear()
+    contents.append(path)
+    return removed
+
+
+def _drop_collinear_points(path):
+    """直線だけの折れ線（moveTo/lineTo のみ）から、前後と同じ向きに進む途中の点を取り除く"""
+    from reportlab.graphics.shapes import _MOVETO, _LINETO
+
+    if any(op not in (_MOVETO, _LINETO) for op in path.operators):
+        return 0
+    points = list(zip(path.points[::2], path.points[1::2]))
+    keep_points, keep_ops = [], []
+    for i, (op, point) in enumerate(zip(path.operators, points)):
+        if (op == _LINETO and keep_ops and i + 1 < len(points)
+                and path.operators[i + 1] == _LINETO):
+            (ax, ay), (bx, by) = keep_points[-1], point
+            cx, cy = points[i + 1]
+            cross = (bx - ax) * (cy - by) - (by - ay) * (cx - bx)
+            dot = (bx - ax) * (cx - bx) + (by - ay) * (cy - by)
+            if abs(cross) <= COLLINEAR_EPSILON and dot > 0:
+                continue
+        keep_points.append(point)
+        keep_ops.append(op)
+    removed = len(points) - len(keep_points)
+    path.points = [v for point in keep_points for v in point]
+    path.operators = keep_ops
+    return removed
+
+
+# ============================================
+# PDF生成関数
+# ============================================
+def parse_svg(svg_text):
+    """SVG文字列をメモリ上でReportLabのDrawingに変換"""
+    svg2rlg = load_svglib()
+    return use_registered_fonts(svg2rlg(io.BytesIO(svg_text.encode('utf-8'))))
+
+
+def use_registered_fonts(drawing):
+    """
+    svglibが標準フォント（Helvetica）で代用した文字を、ヘッダーと同じ登録済みフォントにする
+    生成スクリプトのSVGは font-family="DejaVu Sans, ..." を指定しているので、
+    DrawingBackendと同じくヘッダーとフォント（PDF内のサブセット）を共有できる
+    """
+    from reportlab.graphics.shapes import Group, String
+    
+    register_fonts()
+    replacements = {'Helvetica': FONT_REGULAR, 'Helvetica-Bold': FONT_BOLD}
+    nodes = [drawing]
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, String):
+            node.fontName = replacements.get(node.fontName, node.fontName)
+        elif isinstance(node, Group):
+            nodes.extend(node.contents)
+    return drawing
+
+
+def to_drawing(artifact):
+    """生成結果をDrawingにする（SVG文字列ならsvglibで変換、Drawingはそのまま）"""
+    if isinstance(artifact, str):
+        return parse_svg(artifact)
+    return artifact
+
+
+def fit_scale(drawing, target_width=None, target_height=None):
+    """Drawingを枠内に収めるための拡大率を返す"""
+    ow, oh = drawing.width, drawing.height
+    if target_width and target_height:
+        return min(target_width / ow, target_height / oh)
+    elif target_width:
+        return target_width / ow
+    elif target_height:
+        return target_height / oh
+    return 1.0
+
+
+def draw_svg(c, drawing, x, y, scale):
+    """Drawingを拡大率scaleで(x, y)に描画"""
+    from reportlab.graphics import renderPDF
+    
+    if drawing is None:
+        return
+    # drawing.scale() は変換行列に掛け合わせるため、描画後に元に戻して同じDrawingを何度でも描けるようにする
+    transform = drawing.transform
+    drawing.scale(scale, scale)
+    try:
         renderPDF.draw(drawing, c, x, y)
+    finally:
+        drawing.transform = transform
+
+
+def format_date(date_prefix):
+    """YYYYMMDD → YYYY/MM/DD"""
+    return f"{date_prefix[:4]}/{date_prefix[4:6]}/{date_prefix[6:8]}"
+
+
+def draw_pages(puzzle_canvas, answer_canvas, svgs, date_prefix, vector_qr=False, timings=None,
+               optimize=False):
+    """
+    1日分の問題ページと解答ページを描画（改ページは呼び出し側で行う）
+    svgs: パズル名 -> {'problem': 問題, 'answer': 解答}（SVG文字列またはDrawing）
+    timings: 指定すると パズル名 -> {'parse': ..., 'render': ...} にSVG解析とPDF描画の時間を記録する
+    optimize: 描画前にDrawingの線分をまとめる（simplify_drawing()、Drawingを書き換える）
+    """
+    page_width, page_height = A4
+    formatted_date = format_date(date_prefix)
+
+    # Puzzle PDF: ヘッダー、ノート、QRコードセクション
+    # 日付によらない部分はテンプレート（フォームXObject）、日付と解答QRだけをページに描く
+    use_page_template(puzzle_canvas, PUZZLE_TEMPLATE,
+                      lambda c: draw_puzzle_template(c, page_width, page_height, vector_qr))
+    draw_header_section(puzzle_canvas, page_width, page_height, formatted_date)
+    draw_answer_link_qr(puzzle_canvas, page_width, page_height, date_prefix, vector_qr)
+
+    # Answer PDF: ヘッダー、円周率、QRコードセクション
+    use_page_template(answer_canvas, ANSWER_TEMPLATE,
+                      lambda c: draw_answer_template(c, page_width, page_height, vector_qr))
+    draw_answer_header_section(answer_canvas, page_width, page_height, formatted_date)
 
     layout = get_layout()
 
-    for name in layout:
-        x, y, w, h = layout[name]
-        d = load_svg(name)
-        draw_svg(d, x, y, target_width=w, target_height=h)
+    for name, (x, y, w, h) in layout.items():
+        if name not in svgs:
+            print(f"Warning: {name} SVG not available")
+            continue
+        puzzle_timings = timings.setdefault(name, {}) if timings is not None else None
+        with timed(puzzle_timings, 'parse'):
+            problem = to_drawing(svgs[name]['problem'])
+            answer = to_drawing(svgs[name]['answer'])
+        if optimize:
+            with timed(puzzle_timings, 'simplify'):
+                simplify_drawing(problem)
+                simplify_drawing(answer)
+        
+        # 問題と解答は同じ寸法なので拡大率は1回だけ計算する
+        scale = fit_scale(problem, w, h)
+        if (answer.width, answer.height) != (problem.width, problem.height):
+            answer_scale = fit_scale(answer, w, h)
+        else:
+            answer_scale = scale
+        
+        with timed(puzzle_timings, 'render'):
+            draw_svg(puzzle_canvas, problem, x, y, scale)
+            draw_svg(answer_canvas, answer, x, y, answer_scale)
 
-    c.save()
-    print(f"PDF created: {output_path}")
-    return output_path
+
+def open_canvases(puzzle_path, answer_path):
+    """問題用・解答用のCanvasを作成"""
+    from reportlab.pdfgen import canvas
+    
+    register_fonts()
+    # invariant=1: 作成日時やIDを固定し、同じ日付なら同じバイト列のPDFにする
+    # pageCompression=1: ページとフォームXObjectの内容をFlate圧縮する
+    puzzle_canvas = canvas.Canvas(puzzle_path, pagesize=A4, invariant=1, pageCompression=1)
+    answer_canvas = canvas.Canvas(answer_path, pagesize=A4, invariant=1, pageCompression=1)
+    return puzzle_canvas, answer_canvas
 
 
-def create_answer_pdf(working_dir=None, date_override=None):
-    """解答用PDFを生成（_ans付きSVGを使用）"""
+def create_pdfs(svgs, working_dir=None, date_override=None, vector_qr=False, report=None,
+                optimize=False):
+    """
+    問題用PDFと解答用PDFを1回のレイアウト走査で同時に生成
+    svgs: パズル名 -> {'problem': 問題, 'answer': 解答}（SVG文字列またはDrawing）
+    vector_qr: QRコードを画像ではなくベクターで描画する
+    report: 指定すると各段階・各パズルの時間と出力ファイルのサイズを記録する（new_run_report()）
+    optimize: 出力サイズを小さくする（optimized_output()・simplify_drawing()）。
+              比較のため最適化しない場合のサイズもメモリ上で作成して表示する
+
+    戻り値: (問題用PDFのパス, 解答用PDFのパス)
+    """
     if working_dir is None:
         working_dir = os.getcwd()
 
     date_prefix = date_override if date_override else get_date_prefix()
-    
-    if date_override:
-        year = date_override[:4]
-        month = date_override[4:6]
-        day = date_override[6:8]
-        formatted_date = f"{year}/{month}/{day}"
-    else:
-        formatted_date = get_formatted_date()
-
-    output_path = os.path.join(working_dir, f"{date_prefix}_answer.pdf")
-
-    svg_files = {
-        'building': f'{date_prefix}_building_ans.svg',
-        'kenken': f'{date_prefix}_kenken_ans.svg',
-        'matchstick': f'{date_prefix}_matchstick_ans.svg',
-        'cryptarithm': f'{date_prefix}_cryptarithm_ans.svg',
-        'countdown': f'{date_prefix}_countdown_ans.svg',
-        'mininumpre': f'{date_prefix}_mininumpre_ans.svg',
-        'calcpuzzle': f'{date_prefix}_calcpuzzle_ans.svg',
-        'sumpuzzle': f'{date_prefix}_sumpuzzle_ans.svg',
-        'maze': f'{date_prefix}_maze_ans.svg',
-    }
 
-    page_width, page_height = A4
-    c = canvas.Canvas(output_path, pagesize=A4)
+    puzzle_path = os.path.join(working_dir, f"{date_prefix}_puzzle.pdf")
+    answer_path = os.path.join(working_dir, f"{date_prefix}_answer.pdf")
+
+    stages = report['stages'] if report is not None else None
+    baseline = {}
+    if optimize:
+        # SVGの解析は1回だけにし、同じDrawingから最適化なしのPDFを先に作る（線分をまとめる前）
+        with timed(stages, 'baseline'):
+            svgs = {name: {kind: to_drawing(svg) for kind, svg in pair.items()}
+                    for name, pair in svgs.items()}
+            baseline = dict(zip((puzzle_path, answer_path),
+                                map(len, render_pdf_bytes(svgs, date_prefix, vector_qr))))
+
+    with optimized_output(optimize):
+        with timed(stages, 'setup'):
+            puzzle_canvas, answer_canvas = open_canvases(puzzle_path, answer_path)
+        with timed(stages, 'compose'):
+            draw_pages(puzzle_canvas, answer_canvas, svgs, date_prefix, vector_qr,
+                       timings=report['generators'] if report is not None else None,
+                       optimize=optimize)
+
+        with timed(stages, 'save'):
+            puzzle_canvas.save()
+            print(f"PDF created: {puzzle_path}")
+            answer_canvas.save()
+            print(f"PDF created: {answer_path}")
+    for path, before in baseline.items():
+        after = os.path.getsize(path)
+        print(f"  {os.path.basename(path)}: {before:,} -> {after:,} bytes "
+              f"({(before - after) / before:.0%} smaller with --optimize)")
+    if report is not None:
+        for path in (puzzle_path, answer_path):
+            filename = os.path.basename(path)
+            with open(path, 'rb') as f:
+                fonts = embedded_font_sizes(f.read())
+            report['outputs'][filename] = os.path.getsize(path)
+            report['fonts'][filename] = fonts
+            if path in baseline:
+                report['unoptimized_outputs'][filename] = baseline[path]
+            print(f"  {filename}: {os.path.getsize(path):,} bytes (fonts: " +
+                  ", ".join(f"{font} {size:,}" for font, size in sorted(fonts.items())) + ")")
+    return puzzle_path, answer_path
+
+
+def embedded_font_sizes(pdf_data):
+    """
+    PDFに埋め込まれたフォントファイルのバイト数（圧縮後）をフォント名ごとに返す
+    ReportLabが書き出す形式（FontDescriptorのキーは名前順）を前提に読み取る
+    サブセット（AAAAAA+DejaVuSans, AAAAAB+DejaVuSans …）はフォント名ごとに合算する
+    """
+    sizes = {}
+    for number, name in re.findall(rb'/FontFile[23]? (\d+) 0 R\s*/FontName /([^\s/>]+)', pdf_data):
+        match = re.search(rb'\n' + number + rb' 0 obj\n<<[^>]*?/Length (\d+)', pdf_data)
+        if match:
+            font = name.decode('latin-1').split('+', 1)[-1]
+            sizes[font] = sizes.get(font, 0) + int(match.group(1))
+    return sizes
 
-    # Answer PDF用のヘッダー、円周率、QRコードセクションを描画
-    draw_answer_header_section(c, page_width, page_height, formatted_date)
-    draw_answer_pi_section(c, page_width, page_height)
-    draw_answer_qr_sections(c, page_width, page_height)
 
-    def load_svg(name):
-        path = os.path.join(working_dir, svg_files[name])
-        if os.path.exists(path):
-            return svg2rlg(path)
-        else:
-            print(f"Warning: {path} not found")
-            return None
+def render_pdf_bytes(svgs, date_prefix, vector_qr=False, optimize=False):
+    """
+    問題用PDFと解答用PDFをファイルに書かずメモリ上で生成（HTTPサーバー用）
+    内容は create_pdfs() で書き出すファイルと同じバイト列になる
 
-    def draw_svg(drawing, x, y, target_width=None, target_height=None):
-        if drawing is None:
-            return
-        ow, oh = drawing.width, drawing.height
-        if target_width and target_height:
-            scale = min(target_width / ow, target_height / oh)
-        elif target_width:
-            scale = target_width / ow
-        elif target_height:
-            scale = target_height / oh
+    戻り値: (問題用PDFのバイト列, 解答用PDFのバイト列)
+    """
+    puzzle_buffer, answer_buffer = io.BytesIO(), io.BytesIO()
+    with optimized_output(optimize):
+        puzzle_canvas, answer_canvas = open_canvases(puzzle_buffer, answer_buffer)
+        draw_pages(puzzle_canvas, answer_canvas, svgs, date_prefix, vector_qr, optimize=optimize)
+        puzzle_canvas.save()
+        answer_canvas.save()
+    return puzzle_buffer.getvalue(), answer_buffer.getvalue()
+
+
+# ============================================
+# 画像の書き出し（アーカイブ・リンクプレビュー用）
+# ============================================
+# 書き出せる画像形式と、デフォルトの解像度（A4 1ページが 794x1123 px）
+RASTER_FORMATS = ('png', 'webp')
+DEFAULT_RASTER_DPI = 96
+
+
+def load_pymupdf():
+    """PyMuPDFを読み込む（PDFを画像にするときだけ必要）"""
+    try:
+        import pymupdf
+    except ImportError:
+        raise Exception("画像の書き出しにはPyMuPDFが必要です（pip install pymupdf）")
+    return pymupdf
+
+
+def export_rasters(puzzle_path, date_prefix, output_dir, image_format='png', dpi=DEFAULT_RASTER_DPI):
+    """
+    問題用PDFの1ページ目を画像にしてPDFと同じ場所に書き出す（解答は含めない）
+    - YYYYMMDD_thumb.<形式>  : ページ全体のサムネイル
+    - YYYYMMDD_<パズル名>.<形式> : レイアウトの枠ごとに切り出した各パズル
+    組版済みのPDFから描画するため、フォント・QRコードを含めPDFと同じ見た目になる
+    プロセスプールからも呼べるよう、引数はパスと文字列だけにしている
+
+    戻り値: 書き出したファイル名 -> バイト数
+    """
+    from PIL import Image
+
+    pymupdf = load_pymupdf()
+    if image_format not in RASTER_FORMATS:
+        raise Exception(f"未対応の画像形式です: {image_format}")
+
+    def save(pixmap, name):
+        path = os.path.join(output_dir, f"{date_prefix}_{name}.{image_format}")
+        image = Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples)
+        if image_format == 'webp':
+            # 線と文字だけの画像なので、非可逆圧縮より可逆圧縮の方が小さく滲まない
+            image.save(path, 'WEBP', lossless=True)
         else:
-            scale = 1.0
-        drawing.scale(scale, scale)
-        renderPDF.draw(drawing, c, x, y)
+            image.save(path, 'PNG', optimize=True)
+        written[os.path.basename(path)] = os.path.getsize(path)
 
-    layout = get_layout()
+    written = {}
+    with pymupdf.open(puzzle_path) as document:
+        page = document[0]
+        page_height = page.rect.height
+        save(page.get_pixmap(dpi=dpi, alpha=False), 'thumb')
+        for name, (x, y, w, h) in get_layout().items():
+            # レイアウトはPDFの座標（左下原点）、PyMuPDFは左上原点
+            clip = pymupdf.Rect(x, page_height - y - h, x + w, page_height - y) & page.rect
+            save(page.get_pixmap(dpi=dpi, clip=clip, alpha=False), name)
+    return written
+
+
+# ============================================
+# 複数日のブックレット
+# ============================================
+def create_booklet(dates, output_dir, jobs=1, timeout=DEFAULT_GENERATOR_TIMEOUT,
+                   vector_qr=False, use_cache=True, optimize=False, retries=DEFAULT_GENERATOR_RETRIES,
+                   report=None):
+    """
+    複数日分を1つの問題用PDFと1つの解答用PDF（1日1ページ、日付のしおり付き）にまとめる
+    フォント・テンプレート・固定URLのQRコードはPDF内で1回だけ埋め込まれ、全ページで共有される
+    生成が終わった日から日付順にページを書き出し、書き出したパズルはすぐに解放する
+    （並列生成で先に終わった日は、前の日が揃うまでだけ保持する）
 
-    for name in layout:
-        x, y, w, h = layout[name]
-        d = load_svg(name)
-        draw_svg(d, x, y, target_width=w, target_height=h)
+    optimize: 出力サイズを小さくする（optimized_output()・simplify_drawing()）
+    report: 指定すると日付ごとの生成・描画の時間と、保存の時間・出力ファイルのサイズを記録する
+            （new_batch_report()）
 
-    c.save()
-    print(f"PDF created: {output_path}")
-    return output_path
+    戻り値: (問題用PDFのパス, 解答用PDFのパス, 失敗した日付 -> 失敗したパズル名のリスト)
+    """
+    with optimized_output(optimize):
+        return _create_booklet(dates, output_dir, jobs, timeout, vector_qr, use_cache, optimize, retries,
+                               report)
+
+
+def _create_booklet(dates, output_dir, jobs, timeout, vector_qr, use_cache, optimize, retries, report):
+    name = f"{dates[0]}-{dates[-1]}"
+    puzzle_path = os.path.join(output_dir, f"{name}_puzzle.pdf")
+    answer_path = os.path.join(output_dir, f"{name}_answer.pdf")
+    stages = report['stages'] if report is not None else None
+    with timed(stages, 'setup'):
+        puzzle_canvas, answer_canvas = open_canvases(puzzle_path, answer_path)
+    puzzle_canvas.setTitle(f"Brain Decathlon {format_date(dates[0])} - {format_date(dates[-1])}")
+    answer_canvas.setTitle(f"Brain Decathlon {format_date(dates[0])} - {format_date(dates[-1])} Answer")
+    
+    waiting = {}
+    next_index = 0
+    pages = 0
+    
+    def on_day(date_prefix, svgs):
+        nonlocal next_index, pages
+        waiting[date_prefix] = svgs
+        # 日付順に書き出せるところまで書き出す
+        while next_index < len(dates) and dates[next_index] in waiting:
+            day = dates[next_index]
+            day_svgs = waiting.pop(day)
+            next_index += 1
+            if day_svgs is None:
+                continue
+            day_report = report['days'][day] if report is not None else None
+            with timed(day_report['stages'] if day_report else None, 'compose'):
+                draw_pages(puzzle_canvas, answer_canvas, day_svgs, day, vector_qr,
+                           timings=day_report['generators'] if day_report else None, optimize=optimize)
+            for c in (puzzle_canvas, answer_canvas):
+                c.bookmarkPage(day)
+                c.addOutlineEntry(format_date(day), day, level=0)
+                c.showPage()
+            pages += 1
+    
+    failed_dates, _ = run_batch(dates, on_day, jobs=jobs, timeout=timeout, use_cache=use_cache,
+                                retries=retries, report=report)
+    
+    if pages == 0:
+        print("No pages were composed, booklet was not created.")
+        return None, None, failed_dates
+    with timed(stages, 'save'):
+        for c in (puzzle_canvas, answer_canvas):
+            c.showOutline()
+            c.save()
+    if report is not None:
+        for path in (puzzle_path, answer_path):
+            filename = os.path.basename(path)
+            with open(path, 'rb') as f:
+                report['fonts'][filename] = embedded_font_sizes(f.read())
+            report['outputs'][filename] = os.path.getsize(path)
+    print(f"PDF created: {puzzle_path} ({pages} pages)")
+    print(f"PDF created: {answer_path} ({pages} pages)")
+    return puzzle_path, answer_path, failed_dates
+
+
+# ============================================
+# 起動時間の計測
+# ============================================
+def summarize_importtime(stderr_text):
+    """-X importtime の出力をトップレベルのパッケージごとに集計（自己時間の合計、マイクロ秒）"""
+    totals = {}
+    for line in stderr_text.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        package = name.strip().split(".")[0]
+        totals[package] = totals.get(package, 0) + int(self_us)
+    return totals
+
+
+def profile_startup(top=12):
+    """
+    起動時間の内訳を表示
+    1. このスクリプトのimport（別プロセスで -X importtime を取り、パッケージ別に集計）
+    2. 初回使用時に遅延読み込みされる各段階（PDF作成・フォント登録・svglib・各生成モジュール）
+    """
+    import subprocess
+    
+    script_dir = Path(__file__).resolve().parent
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import puzzle_layout"],
+        cwd=script_dir, capture_output=True, text=True,
+    )
+    totals = summarize_importtime(proc.stderr)
+    
+    print("=" * 50)
+    print("Startup profile")
+    print("=" * 50)
+    print(f"\nimport puzzle_layout: {sum(totals.values()) / 1000:.1f} ms")
+    for package, us in sorted(totals.items(), key=lambda item: -item[1])[:top]:
+        print(f"  {package:<28} {us / 1000:8.1f} ms")
+    
+    def measure(label, func):
+        t0 = time.perf_counter()
+        func()
+        print(f"  {label:<28} {(time.perf_counter() - t0) * 1000:8.1f} ms")
+    
+    print("\nLoaded on first use:")
+    measure("reportlab (canvas/renderPDF)",
+            lambda: (importlib.import_module("reportlab.pdfgen.canvas"),
+                     importlib.import_module("reportlab.graphics.renderPDF")))
+    measure("font registration", register_fonts)
+    measure("svglib (SVG input only)", load_svglib)
+    for name in GENERATORS:
+        measure(f"generator: {name}", lambda name=name: load_generator(name))
+    print(f"\nFonts: {FONT_REGULAR} / {FONT_BOLD}")
+
+
+# ============================================
+# 実行レポート
+# ============================================
+# レポートの形式を変えたら上げる（過去のレポートと比較するときの目印）
+REPORT_VERSION = 2
+
+
+def new_run_report(date_prefix, args):
+    """1回の実行の計測結果を入れるレポート（write_run_report()でJSONに書き出す）"""
+    return {
+        'report_version': REPORT_VERSION,
+        'date': date_prefix,
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'options': {
+            'jobs': args.jobs,
+            'timeout': args.timeout,
+            'vector_qr': args.vector_qr,
+            'optimize': args.optimize,
+            'raster': args.raster,
+            'raster_dpi': args.raster_dpi if args.raster else None,
+            'cache': not args.no_cache,
+            'retries': args.retries,
+            'deadline': args.deadline,
+        },
+        'status': None,
+        # 各段階: generate（パズル生成）, setup（フォント登録・Canvas作成）,
+        #         compose（ページの描画）, save（PDFの書き出し）,
+        #         baseline（--optimize時の比較用PDFの作成）, raster（--raster時の画像の書き出し）
+        'stages': {},
+        # パズル名 -> 生成結果, 生成を試みた回数（attempts）, 生成時間（generate）,
+        #             試行回数などのカウンター（stats）,
+        #             SVG解析時間（parse）, 線分をまとめる時間（simplify）, PDF描画時間（render）
+        'generators': {},
+        # ファイル名 -> バイト数（--raster時は画像も含む）
+        'outputs': {},
+        # --optimize時、ファイル名 -> 最適化しなかった場合のバイト数
+        'unoptimized_outputs': {},
+        # ファイル名 -> {フォント名: 埋め込まれたフォントファイルのバイト数}
+        'fonts': {},
+    }
+
+
+def new_batch_report(date_from, date_to, args):
+    """
+    一括生成・ブックレット1回分の計測結果（write_run_report()でJSONに書き出す）
+    new_run_report() と同じ項目に加え、'days' に日付ごとの記録（new_day_report()）を入れる
+    """
+    report = new_run_report(None, args)
+    report.update({'from': date_from, 'to': date_to, 'days': {}})
+    return report
+
+
+def new_day_report(report, date_prefix):
+    """
+    一括生成のレポートに1日分の記録を追加して返す
+    create_pdfs() の report にそのまま渡せる（stages: 日付ごとの setup/compose/save など）
+    """
+    day = {'status': None, 'stages': {}, 'generators': {}, 'outputs': {},
+           'unoptimized_outputs': {}, 'fonts': {}}
+    report['days'][date_prefix] = day
+    return day
+
+
+def record_generation(report, results):
+    """generate_svgs() の結果をレポートに記録"""
+    for name, r in results.items():
+        report['generators'].setdefault(name, {}).update({
+            'status': r['status'],
+            'cached': r['cached'],
+            'error': r['error'],
+            'attempts': r.get('attempts', 0),
+            'generate': r['timing'],
+            'stats': r['stats'],
+            'fallback': r.get('fallback'),
+        })
+
+
+def write_run_report(report, working_dir, total, filename=None):
+    """レポートを filename（省略時は YYYYMMDD_report.json）として書き出し、パスを返す"""
+    report['total'] = total
+    path = os.path.join(working_dir, filename or f"{report['date']}_report.json")
+    
+    def rounded(value):
+        if isinstance(value, float):
+            return round(value, 4)
+        if isinstance(value, dict):
+            return {k: rounded(v) for k, v in value.items()}
+        return value
+    
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(rounded(report), f, ensure_ascii=False, indent=2)
+        f.write("\n")
+    print(f"Report written: {path}")
+    return path
 
 
 # ============================================
@@ -640,43 +2015,279 @@ def create_answer_pdf(working_dir=None, date_override=None):
 def main():
     """
     メイン処理：
-    1. SVGファイルを生成（各パズル生成スクリプトを実行）
-    2. Puzzle PDFを生成
-    3. Answer PDFを生成
-    4. SVGファイルを削除
+    1. パズルを生成（各パズル生成モジュールを呼び出し、Drawingとしてメモリ上で受け取る）
+    2. Puzzle PDFとAnswer PDFを1回のレイアウト走査で生成
+    3. 各段階・各パズルの時間と試行回数、出力サイズをレポート（JSON）に書き出す
     """
-    date_override = sys.argv[1] if len(sys.argv) > 1 else None
+    parser = argparse.ArgumentParser(description="Brain Decathlon PDF Generator")
+    parser.add_argument('date', nargs='?', help="生成する日付（YYYYMMDD、省略時は今日）")
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help="パズル生成を並列実行するプロセス数（デフォルト: 1）")
+    parser.add_argument('--timeout', type=float, default=DEFAULT_GENERATOR_TIMEOUT,
+                        help=f"各パズル生成の制限時間（秒、デフォルト: {DEFAULT_GENERATOR_TIMEOUT}）")
+    parser.add_argument('--retries', type=int, default=DEFAULT_GENERATOR_RETRIES, metavar='N',
+                        help="失敗したパズルを同じシードで作り直す回数（タイムアウトは作り直さない）"
+                             f"（デフォルト: {DEFAULT_GENERATOR_RETRIES}）")
+    parser.add_argument('--vector-qr', action='store_true',
+                        help="QRコードをPNG画像ではなくベクター図形で描画する")
+    parser.add_argument('--optimize', action='store_true',
+                        help="PDFを小さくする（ストリームをバイナリで圧縮、QR画像をグレースケール化、"
+                             "線分の結合）。最適化前後のサイズを表示する")
+    parser.add_argument('--raster', choices=RASTER_FORMATS, default=None,
+                        help="問題用PDFのサムネイルとパズルごとの画像をPDFと同じ場所に書き出す"
+                             "（PyMuPDFが必要）")
+    parser.add_argument('--raster-dpi', type=int, default=DEFAULT_RASTER_DPI, metavar='DPI',
+                        help=f"書き出す画像の解像度（デフォルト: {DEFAULT_RASTER_DPI}）")
+    parser.add_argument('--deadline', type=float, default=None, metavar='SECONDS',
+                        help="パズル生成全体の期限（秒）。間に合わないパズルは最後にキャッシュされた"
+                             "同じ種類のパズルか予備のパズルで代用してPDFを作る（1日分の生成のみ）")
+    parser.add_argument('--make-spares', action='store_true',
+                        help=f"--deadline で使う予備のパズルを {SPARES_DIR} に作成して終了する")
+    parser.add_argument('--from', dest='date_from', metavar='YYYYMMDD',
+                        help="一括生成の開始日（--toと併用）")
+    parser.add_argument('--to', dest='date_to', metavar='YYYYMMDD',
+                        help="一括生成の終了日（--fromと併用）")
+    parser.add_argument('--missing-only', action='store_true',
+                        help="一括生成時、出力先にPDFが揃っていない日付だけを生成する")
+    parser.add_argument('--booklet', metavar='YYYYMMDD:YYYYMMDD',
+                        help="指定期間を1日1ページの問題用・解答用PDF各1冊にまとめる")
+    parser.add_argument('-o', '--output-dir', default=None,
+                        help="PDFの出力先（デフォルト: カレントディレクトリ）")
+    parser.add_argument('--no-cache', action='store_true',
+                        help=f"生成結果のキャッシュ（{CACHE_DIR}）を使わない")
+    parser.add_argument('--profile-startup', action='store_true',
+                        help="起動時間の内訳（import・遅延読み込みの各段階）を表示して終了する")
+    args = parser.parse_args()
+    
+    if args.profile_startup:
+        profile_startup()
+        return
+    
+    if args.make_spares:
+        make_spares()
+        return
+    
+    if args.raster:
+        # 一括生成の途中で全日付が失敗しないよう、PyMuPDFが無ければ最初に止める
+        try:
+            load_pymupdf()
+        except Exception as e:
+            parser.error(str(e))
+    
+    if args.booklet:
+        if args.date or args.date_from or args.date_to:
+            parser.error("--booklet は日付・--from/--to と同時に指定できません")
+        if args.raster:
+            parser.error("--raster は --booklet と同時に指定できません")
+        if args.deadline:
+            parser.error("--deadline は1日分の生成でのみ使えます（--booklet と同時に指定できません）")
+        try:
+            booklet_from, booklet_to = args.booklet.split(":")
+        except ValueError:
+            parser.error("--booklet は YYYYMMDD:YYYYMMDD の形式で指定してください")
+        booklet_main(args, booklet_from, booklet_to)
+        return
+    
+    if args.date_from or args.date_to:
+        if not (args.date_from and args.date_to):
+            parser.error("--from と --to は両方指定してください")
+        if args.date:
+            parser.error("日付と --from/--to は同時に指定できません")
+        if args.deadline:
+            parser.error("--deadline は1日分の生成でのみ使えます（--from/--to と同時に指定できません）")
+        batch_main(args)
+        return
+    
+    date_override = args.date
     date_prefix = date_override if date_override else get_date_prefix()
-    working_dir = os.getcwd()
+    working_dir = args.output_dir or os.getcwd()
+    os.makedirs(working_dir, exist_ok=True)
     
     print("=" * 50)
     print(f"Brain Decathlon PDF Generator")
     print(f"Date: {date_prefix}")
     print("=" * 50)
     
-    # Step 1: SVGファイルを生成
-    print("\n[Step 1] Generating SVG files...")
-    generate_svg_files(working_dir, date_prefix)
-    
-    # Step 2: Puzzle PDFを生成
-    print("\n[Step 2] Creating Puzzle PDF...")
-    create_puzzle_pdf(working_dir, date_override)
+    report = new_run_report(date_prefix, args)
+    if not args.no_cache:
+        # 前回の実行で完了したパズルはキャッシュから読み込み、残りだけを生成する
+        resume_checkpoint(date_prefix)
     
-    # Step 3: Answer PDFを生成
-    print("\n[Step 3] Creating Answer PDF...")
-    create_answer_pdf(working_dir, date_override)
+    with timed() as total:
+        # Step 1: SVGを生成
+        print("\n[Step 1] Generating SVGs...")
+        with timed(report['stages'], 'generate'):
+            if args.deadline:
+                svgs, results = generate_with_deadline(date_prefix, args.deadline, jobs=args.jobs,
+                                                       timeout=args.timeout, use_cache=not args.no_cache,
+                                                       retries=args.retries)
+            else:
+                svgs, results = generate_svgs(date_prefix, jobs=args.jobs, timeout=args.timeout,
+                                              use_cache=not args.no_cache, retries=args.retries)
+        record_generation(report, results)
+        failed = print_generation_summary(results)
+        if not args.no_cache:
+            write_manifest(date_prefix, results)
+        
+        if not failed:
+            # Step 2: Puzzle PDFとAnswer PDFを同時に生成
+            print("\n[Step 2] Creating Puzzle and Answer PDFs...")
+            puzzle_path, _ = create_pdfs(svgs, working_dir, date_override, vector_qr=args.vector_qr,
+                                         report=report, optimize=args.optimize)
+            if args.raster:
+                print(f"\n[Step 3] Exporting {args.raster.upper()} images ({args.raster_dpi} dpi)...")
+                with timed(report['stages'], 'raster'):
+                    images = export_rasters(puzzle_path, date_prefix, working_dir,
+                                            args.raster, args.raster_dpi)
+                report['outputs'].update(images)
+                print(f"  {len(images)} images, {sum(images.values()):,} bytes "
+                      f"({date_prefix}_thumb.{args.raster}: {images[f'{date_prefix}_thumb.{args.raster}']:,} bytes)")
+            if not args.no_cache:
+                outputs = [os.path.join(working_dir, filename) for filename in report['outputs']]
+                write_manifest(date_prefix, results, outputs)
     
-    # Step 4: SVGファイルを削除
-    print("\n[Step 4] Cleaning up SVG files...")
-    delete_svg_files(working_dir, date_prefix)
+    if failed:
+        report['status'] = 'failed'
+    elif any(r['status'] == 'fallback' for r in results.values()):
+        report['status'] = 'fallback'
+    else:
+        report['status'] = 'ok'
+    write_run_report(report, working_dir, total)
+    if failed:
+        # 欠けたパズルのままPDFを作らない
+        print(f"\nAborted: {len(failed)} puzzle(s) failed, PDFs were not created.")
+        sys.exit(1)
     
     print("\n" + "=" * 50)
     print("All done!")
     print(f"Output files:")
     print(f"  - {date_prefix}_puzzle.pdf")
     print(f"  - {date_prefix}_answer.pdf")
+    if args.raster:
+        print(f"  - {date_prefix}_thumb.{args.raster}, {date_prefix}_<puzzle>.{args.raster}")
+    print(f"  - {date_prefix}_report.json")
     print("=" * 50)
 
 
+def batch_main(args):
+    """--from/--to 指定時の一括生成"""
+    output_dir = args.output_dir or os.getcwd()
+    os.makedirs(output_dir, exist_ok=True)
+    dates = plan_dates(args.date_from, args.date_to, output_dir, args.missing_only)
+    
+    print("=" * 50)
+    print(f"Brain Decathlon PDF Generator (batch)")
+    print(f"Range: {args.date_from} - {args.date_to}")
+    print(f"Dates to generate: {len(dates)}")
+    print("=" * 50)
+    
+    if not dates:
+        print("Nothing to do.")
+        return
+    
+    report = new_batch_report(args.date_from, args.date_to, args)
+    
+    # パズル生成と画像の書き出しは1つのプロセスプール（--jobs 個）を共有する
+    # 画像はPDFを作った日から投入し、次の日の組版と並行させる（1プロセスの場合はその場で書き出す）
+    executor = None
+    if args.jobs > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        executor = ProcessPoolExecutor(max_workers=args.jobs)
+    raster_futures = {}
+    raster_failed = {}
+    
+    def on_day(date_prefix, svgs):
+        if svgs is None:
+            return None
+        day = report['days'][date_prefix]
+        puzzle_path, answer_path = create_pdfs(svgs, output_dir, date_prefix, vector_qr=args.vector_qr,
+                                               report=day, optimize=args.optimize)
+        if args.raster and executor is not None:
+            raster_futures[executor.submit(export_rasters, puzzle_path, date_prefix, output_dir,
+                                           args.raster, args.raster_dpi)] = date_prefix
+        elif args.raster:
+            raster_futures[date_prefix] = date_prefix
+            try:
+                with timed(day['stages'], 'raster'):
+                    day['outputs'].update(export_rasters(puzzle_path, date_prefix, output_dir,
+                                                         args.raster, args.raster_dpi))
+            except Exception as e:
+                raster_failed[date_prefix] = e
+        return [puzzle_path, answer_path]
+    
+    unresponsive = False
+    with timed() as total:
+        try:
+            failed_dates, unresponsive = run_batch(dates, on_day, jobs=args.jobs, timeout=args.timeout,
+                                                   use_cache=not args.no_cache, retries=args.retries,
+                                                   executor=executor, report=report)
+            if unresponsive:
+                # 応答しないワーカーがあると終了を待てないため、強制終了して書き出し途中の画像は失敗にする
+                terminate_workers(executor)
+                for future, date_prefix in raster_futures.items():
+                    if not future.done() or future.cancelled():
+                        raster_failed[date_prefix] = "ワーカーが応答しませんでした"
+                    elif future.exception() is not None:
+                        raster_failed[date_prefix] = future.exception()
+            elif executor is not None:
+                from concurrent.futures import as_completed
+                
+                # 生成が終わった後、残りの画像の書き出しを待った時間
+                with timed(report['stages'], 'raster'):
+                    for future in as_completed(raster_futures):
+                        try:
+                            report['days'][raster_futures[future]]['outputs'].update(future.result())
+                        except Exception as e:
+                            raster_failed[raster_futures[future]] = e
+        finally:
+            if executor is not None and not unresponsive:
+                executor.shutdown(cancel_futures=True)
+    
+    report['status'] = 'failed' if failed_dates or (args.raster and raster_failed) else 'ok'
+    write_run_report(report, output_dir, total, f"run_report_{args.date_from}_{args.date_to}.json")
+    
+    print("\n" + "=" * 50)
+    print(f"Created PDFs for {len(dates) - len(failed_dates)}/{len(dates)} days "
+          f"in {total['wall']:.1f}s.")
+    for date_prefix, names in sorted(failed_dates.items()):
+        print(f"  - {date_prefix}: {', '.join(names)}")
+    if args.raster:
+        print(f"Exported {args.raster.upper()} images for {len(raster_futures) - len(raster_failed)}/"
+              f"{len(raster_futures)} days.")
+        for date_prefix, error in sorted(raster_failed.items()):
+            print(f"  - {date_prefix}: {error}")
+    print("=" * 50)
+    if failed_dates or (args.raster and raster_failed):
+        sys.exit(1)
+
+
+def booklet_main(args, date_from, date_to):
+    """--booklet 指定時のブックレット生成"""
+    output_dir = args.output_dir or os.getcwd()
+    os.makedirs(output_dir, exist_ok=True)
+    dates = plan_dates(date_from, date_to, output_dir)
+    
+    print("=" * 50)
+    print(f"Brain Decathlon PDF Generator (booklet)")
+    print(f"Range: {date_from} - {date_to} ({len(dates)} days)")
+    print("=" * 50)
+    
+    report = new_batch_report(date_from, date_to, args)
+    with timed() as total:
+        _, _, failed_dates = create_booklet(dates, output_dir, jobs=args.jobs, timeout=args.timeout,
+                                            vector_qr=args.vector_qr, use_cache=not args.no_cache,
+                                            optimize=args.optimize, retries=args.retries, report=report)
+    report['status'] = 'failed' if failed_dates else 'ok'
+    write_run_report(report, output_dir, total, f"{date_from}-{date_to}_report.json")
+    
+    print("\n" + "=" * 50)
+    print(f"Composed {len(dates) - len(failed_dates)}/{len(dates)} days "
+          f"in {total['wall']:.1f}s.")
+    for date_prefix, names in sorted(failed_dates.items()):
+        print(f"  - {date_prefix} (page omitted): {', '.join(names)}")
+    print("=" * 50)
+    if failed_dates:
+        sys.exit(1)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Brain DecathlonのPDFをHTTPで配信するサーバー（キオスク・イントラネット用）
+
+リクエストのたびに puzzle_layout.py を起動すると1件あたり数秒かかるため、
+生成モジュールと組版処理を1回だけ読み込んだ常駐プロセスとして動かす。
+
+- 作成したPDFは日付ごとにメモリ上のLRUキャッシュ（件数上限あり）に保持する
+- 同じ日付への同時リクエストは1回の作成を共有する
+- キャッシュに無い日付のパズル生成は共有のプロセスプールに振り分ける
+- 生成結果のディスクキャッシュ（.cache/puzzles/）も puzzle_layout.py と共有する
+
+使用方法:
+    $ python puzzle_server.py [--host 127.0.0.1] [--port 8000] [--jobs N] [--max-days N]
+
+    GET /puzzle/YYYYMMDD.pdf  問題用PDF
+    GET /answer/YYYYMMDD.pdf  解答用PDF
+
+必要モジュール: puzzle_layout.py と同じ（Python3標準ライブラリの http.server を使用）
+"""
+
+import os
+import re
+import argparse
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import puzzle_layout
+
+# URLのパス → PDFの種類
+PDF_PATH = re.compile(r'^/(puzzle|answer)/(\d{8})\.pdf$')
+
+# メモリに保持する日数（1日分は問題用・解答用で約200KB）
+DEFAULT_MAX_DAYS = 64
+
+
+# ============================================
+# PDFの作成とキャッシュ
+# ============================================
+class PDFService:
+    """日付ごとのPDFを作成し、LRUキャッシュと作成中の重複排除を管理する"""
+
+    def __init__(self, jobs=None, max_days=DEFAULT_MAX_DAYS,
+                 timeout=puzzle_layout.DEFAULT_GENERATOR_TIMEOUT, use_cache=True, vector_qr=False,
+                 optimize=False):
+        self.jobs = jobs or os.cpu_count() or 1
+        self.max_days = max_days
+        self.timeout = timeout
+        self.use_cache = use_cache
+        self.vector_qr = vector_qr
+        self.optimize = optimize
+        # 日付 -> {'puzzle': bytes, 'answer': bytes}（最近使ったものが末尾）
+        self.pdfs = OrderedDict()
+        # 日付 -> 作成中のFuture（同じ日付のリクエストはこれを待つ）
+        self.building = {}
+        self.lock = threading.Lock()
+        # ReportLabのフォントやテンプレート、--optimize で切り替える設定はプロセス全体で共有されるため、
+        # 組版は1つずつ行う
+        self.compose_lock = threading.Lock()
+        self.executor = ProcessPoolExecutor(max_workers=self.jobs)
+        # ワーカーはリクエスト処理のスレッドからではなく、ここで起動しておく
+        self.executor.submit(os.getpid).result()
+        puzzle_layout.register_fonts()
+
+    def get(self, date_prefix):
+        """日付のPDFを返す（無ければ作成する。作成中なら完了を待つ）"""
+        with self.lock:
+            if date_prefix in self.pdfs:
+                self.pdfs.move_to_end(date_prefix)
+                return self.pdfs[date_prefix]
+            future = self.building.get(date_prefix)
+            owner = future is None
+            if owner:
+                future = Future()
+                self.building[date_prefix] = future
+
+        if not owner:
+            return future.result()
+
+        try:
+            pdfs = self.build(date_prefix)
+        except BaseException as e:
+            # 失敗はキャッシュしない（次のリクエストで作り直す）
+            with self.lock:
+                del self.building[date_prefix]
+            future.set_exception(e)
+            raise
+        with self.lock:
+            del self.building[date_prefix]
+            self.pdfs[date_prefix] = pdfs
+            while len(self.pdfs) > self.max_days:
+                self.pdfs.popitem(last=False)
+        future.set_result(pdfs)
+        return pdfs
+
+    def build(self, date_prefix):
+        """パズルを生成して問題用・解答用PDFを作成"""
+        print(f"=== Building {date_prefix} ===")
+        svgs, results = puzzle_layout.generate_svgs(
+            date_prefix, jobs=self.jobs, timeout=self.timeout,
+            use_cache=self.use_cache, executor=self.executor,
+            retries=puzzle_layout.DEFAULT_GENERATOR_RETRIES,
+        )
+        failed = puzzle_layout.print_generation_summary(results)
+        if failed:
+            raise Exception(f"パズルの生成に失敗しました: {', '.join(failed)}")
+        with self.compose_lock:
+            puzzle_pdf, answer_pdf = puzzle_layout.render_pdf_bytes(svgs, date_prefix, self.vector_qr,
+                                                                  optimize=self.optimize)
+        return {'puzzle': puzzle_pdf, 'answer': answer_pdf}
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+# ============================================
+# HTTPハンドラ
+# ============================================
+class PDFRequestHandler(BaseHTTPRequestHandler):
+    """GET /puzzle/YYYYMMDD.pdf と GET /answer/YYYYMMDD.pdf に応答する"""
+
+    server_version = "BrainDecathlon/1.0"
+
+    def do_GET(self):
+        match = PDF_PATH.match(self.path.split('?', 1)[0])
+        if not match:
+            self.send_error(HTTPStatus.NOT_FOUND, "Use /puzzle/YYYYMMDD.pdf or /answer/YYYYMMDD.pdf")
+            return
+        kind, date_prefix = match.groups()
+        try:
+            datetime.strptime(date_prefix, "%Y%m%d")
+        except ValueError:
+            self.send_error(HTTPStatus.BAD_REQUEST, f"Invalid date: {date_prefix}")
+            return
+
+        try:
+            pdfs = self.server.service.get(date_prefix)
+        except Exception as e:
+            self.log_error("failed to build %s: %s", date_prefix, e)
+            self.send_error(HTTPStatus.INTERNAL_SERVER_ERROR, f"Could not build {date_prefix}")
+            return
+
+        body = pdfs[kind]
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "application/pdf")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Content-Disposition", f'inline; filename="{date_prefix}_{kind}.pdf"')
+        # 同じ日付のPDFは常に同じ内容になる
+        self.send_header("Cache-Control", "public, max-age=86400")
+        self.end_headers()
+        self.wfile.write(body)
+
+
+# ============================================
+# メイン処理
+# ============================================
+def main():
+    parser = argparse.ArgumentParser(description="Brain Decathlon PDF server")
+    parser.add_argument('--host', default="127.0.0.1", help="待ち受けるアドレス（デフォルト: 127.0.0.1）")
+    parser.add_argument('--port', type=int, default=8000, help="待ち受けるポート（デフォルト: 8000）")
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help="パズル生成のプロセス数（デフォルト: CPU数）")
+    parser.add_argument('--max-days', type=int, default=DEFAULT_MAX_DAYS,
+                        help=f"メモリに保持するPDFの日数（デフォルト: {DEFAULT_MAX_DAYS}）")
+    parser.add_argument('--timeout', type=float, default=puzzle_layout.DEFAULT_GENERATOR_TIMEOUT,
+                        help="各パズル生成の制限時間（秒）")
+    parser.add_argument('--vector-qr', action='store_true',
+                        help="QRコードをPNG画像ではなくベクター図形で描画する")
+    parser.add_argument('--optimize', action='store_true',
+                        help="PDFを小さくする（puzzle_layout.py の --optimize と同じ）")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="生成結果のディスクキャッシュを使わない")
+    args = parser.parse_args()
+
+    service = PDFService(jobs=args.jobs, max_days=args.max_days, timeout=args.timeout,
+                         use_cache=not args.no_cache, vector_qr=args.vector_qr,
+                         optimize=args.optimize)
+    httpd = ThreadingHTTPServer((args.host, args.port), PDFRequestHandler)
+    httpd.service = service
+    print(f"Serving on http://{args.host}:{args.port}/ ({service.jobs} workers, "
+          f"up to {service.max_days} days in memory)")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down.")
+    finally:
+        httpd.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    main()